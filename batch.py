@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Streaming batch downloads for YouTube Downloader.
+
+URLs are read lazily from a file or stdin and handed to a fixed pool of
+download workers through a bounded queue, so memory use stays constant no
+matter how long the input is and the first download starts immediately.
+The same streaming pipeline backs the metadata-only mode, which resolves
+URLs concurrently and emits one JSON line per video.
+"""
+
+import sys
+import json
+import queue
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, TypeVar, Union
+
+from concurrency import AdaptiveConcurrency
+from scheduler import estimate_cost, make_queue
+from youtube_downloader_bot import YouTubeDownloaderBot
+
+# Lines starting with one of these are treated as comments (same as yt-dlp's -a)
+COMMENT_PREFIXES = ("#", ";", "]")
+
+# Marker telling a worker there is no more input
+_STOP = object()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+def iter_urls(source: Union[str, TextIO]) -> Iterator[str]:
+    """
+    Lazily yield URLs from a batch source.
+    
+    Args:
+        source: Path to a batch file, "-" for stdin, or an open text file object.
+                Blank lines and comment lines are skipped.
+        
+    Yields:
+        One stripped URL per non-empty line.
+    """
+    if source == "-":
+        yield from _iter_lines(sys.stdin)
+    elif isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as batch_file:
+            yield from _iter_lines(batch_file)
+    else:
+        yield from _iter_lines(source)
+
+def _iter_lines(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        url = line.strip()
+        if url and not url.startswith(COMMENT_PREFIXES):
+            yield url
+
+def bounded_map(func: Callable[[T], R], items: Iterable[T], workers: int = 8,
+                max_pending: Optional[int] = None) -> Iterator[Tuple[T, R]]:
+    """
+    Apply a function to items concurrently, yielding results as they complete.
+    
+    At most max_pending items are in flight at any time, so the input is
+    consumed lazily and results stream out in completion order.
+    
+    Args:
+        func: Function to apply. Exceptions are yielded in place of the result.
+        items: Iterable of inputs.
+        workers: Number of worker threads.
+        max_pending: Maximum items submitted but not yet yielded.
+                     Defaults to twice the number of workers.
+        
+    Yields:
+        Tuples of (item, result_or_exception).
+    """
+    max_pending = max_pending or workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for item in items:
+            pending[executor.submit(func, item)] = item
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from _drain(done, pending)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from _drain(done, pending)
+
+def _drain(done, pending) -> Iterator[Tuple[Any, Any]]:
+    for future in done:
+        item = pending.pop(future)
+        error = future.exception()
+        yield item, error if error is not None else future.result()
+
+def stream_metadata(urls: Iterable[str], bot: YouTubeDownloaderBot, out: TextIO,
+                    workers: int = 8) -> Tuple[int, int]:
+    """
+    Resolve metadata for many URLs concurrently and write it as JSON lines.
+    
+    Every video becomes one JSON object on its own line. URLs that fail to
+    resolve produce a line with "url" and "error" keys instead.
+    
+    Args:
+        urls: Iterable of video, playlist or channel URLs.
+        bot: Bot used for metadata extraction.
+        out: Text stream to write JSON lines to.
+        workers: Number of URLs resolved concurrently.
+        
+    Returns:
+        Tuple containing (resolved_url_count, failed_url_count).
+    """
+    resolved = failed = 0
+    for url, result in bounded_map(lambda u: list(bot.extract_metadata(u)), urls, workers):
+        if isinstance(result, Exception):
+            failed += 1
+            records: List[Dict[str, Any]] = [{'url': url, 'error': str(result)}]
+        else:
+            resolved += 1
+            records = result
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+    return resolved, failed
+
+def _drain_queue(jobs: "queue.Queue") -> None:
+    while True:
+        try:
+            jobs.get_nowait()
+        except queue.Empty:
+            return
+
+class DiskSpaceGuard:
+    """Track disk space still needed by in-flight downloads on one filesystem."""
+    
+    def __init__(self, directory: str, min_free: int = 0):
+        """
+        Initialize the guard.
+        
+        Args:
+            directory: Directory downloads are written to.
+            min_free: Bytes that must stay free after every admitted download.
+        """
+        self.directory = directory
+        self.min_free = min_free
+        self._reservations: Dict[int, Tuple[int, Callable[[], int]]] = {}
+        self._next_token = 0
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of outstanding reservations."""
+        return len(self._reservations)
+    
+    @property
+    def reserved(self) -> int:
+        """
+        Bytes that in-flight downloads have yet to write.
+        
+        Bytes already written are reflected in the free space reported by the
+        filesystem, so only the remainder of each reservation is counted.
+        """
+        return sum(max(0, size - written()) for size, written in self._reservations.values())
+    
+    def available(self) -> int:
+        """
+        Get the bytes that can still be reserved.
+        
+        Returns:
+            Free space minus outstanding reservations and the safety margin.
+        """
+        return shutil.disk_usage(self.directory).free - self.reserved - self.min_free
+    
+    def try_reserve(self, size: int, written: Optional[Callable[[], int]] = None) -> Optional[int]:
+        """
+        Reserve space for a download if it fits.
+        
+        Args:
+            size: Expected size of the download in bytes.
+            written: Callable returning how many bytes the download has written
+                     so far. Defaults to a download that writes nothing.
+            
+        Returns:
+            Reservation token to pass to release(), or None if the size does not fit.
+        """
+        if size > self.available():
+            return None
+        token = self._next_token
+        self._next_token += 1
+        self._reservations[token] = (size, written or (lambda: 0))
+        return token
+    
+    def release(self, token: int) -> None:
+        """
+        Release a reservation once its download has finished or failed.
+        
+        Args:
+            token: Token returned by try_reserve().
+        """
+        self._reservations.pop(token, None)
+
+class _Job:
+    """A URL along with what was resolved about it before it runs."""
+    
+    __slots__ = ("url", "info", "size", "duration", "token")
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.info: Optional[Dict[str, Any]] = None
+        self.size: Optional[int] = None
+        self.duration: Optional[float] = None
+        self.token = None
+    
+    @property
+    def cost(self) -> float:
+        """Expected bytes to transfer, used by the scheduling policies."""
+        return estimate_cost(self.size, self.duration)
+
+class BatchDownloader:
+    """Download a stream of URLs with a fixed-size pool of worker threads."""
+    
+    # Seconds a worker waits for space to be released before re-checking deferred jobs
+    DEFER_POLL_INTERVAL = 1.0
+    
+    def __init__(self, bot_factory: Callable[[], YouTubeDownloaderBot], workers: int = 2,
+                 queue_size: Optional[int] = None,
+                 on_result: Optional[Callable[[str, bool, str], None]] = None,
+                 disk_guard: Optional[DiskSpaceGuard] = None, policy: str = "fifo",
+                 resolvers: int = 0, controller: Optional[AdaptiveConcurrency] = None):
+        """
+        Initialize the batch downloader.
+        
+        Args:
+            bot_factory: Callable returning a new YouTubeDownloaderBot. Each worker
+                         gets its own bot since a bot tracks the progress of one job.
+            workers: Number of concurrent downloads.
+            queue_size: Maximum number of URLs buffered ahead of the workers.
+                        Defaults to twice the number of workers.
+            on_result: Optional callback invoked with (url, success, result)
+                       after every job, from the worker thread.
+            disk_guard: Optional admission control. When set, each URL is resolved
+                        first and only started once its expected size fits in the
+                        free space left by in-flight downloads; otherwise it is
+                        deferred while workers move on to other jobs.
+            policy: Scheduling policy, one of scheduler.POLICIES: "fifo", "sjf"
+                    (shortest job first) or "aging" (shortest first, with waiting
+                    jobs gaining priority). Anything but "fifo" resolves each URL
+                    before queueing it, and reorders jobs within the queue.
+            resolvers: Number of threads resolving URLs (metadata, format choice
+                       and size estimate) ahead of the download workers. Resolved
+                       jobs are queued with their info, so downloads skip the
+                       extraction step. 0 resolves nothing ahead of time, except
+                       that other policies than "fifo" use one resolver thread.
+            controller: Optional adaptive concurrency. When set, workers is
+                        ignored: controller.max_jobs workers are started, but
+                        only as many run jobs at once as the controller allows,
+                        and each job uses the controller's fragment count. The
+                        controller is fed the aggregate speed of running jobs
+                        and every result.
+        """
+        self.bot_factory = bot_factory
+        self.controller = controller
+        self.workers = controller.max_jobs if controller is not None else max(1, workers)
+        self.queue_size = queue_size or self.workers * 2
+        self.on_result = on_result
+        self.disk_guard = disk_guard
+        self.policy = policy
+        self.resolvers = resolvers
+        # Fail fast on an unknown policy
+        make_queue(policy)
+        
+        self.succeeded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._space_released = threading.Condition(self._lock)
+        self._deferred = deque()
+        self._cancelled = threading.Event()
+        self._running: Dict[str, YouTubeDownloaderBot] = {}
+        self._cancelled_urls = set()
+    
+    def cancel(self, url: str) -> bool:
+        """
+        Cancel a job, whether it is running or still waiting.
+        
+        Args:
+            url: URL of the job.
+            
+        Returns:
+            Boolean indicating if the job was running (False means it will be
+            skipped when dequeued).
+        """
+        with self._lock:
+            bot = self._running.get(url)
+            if bot is None:
+                self._cancelled_urls.add(url)
+                return False
+        bot.cancel()
+        return True
+    
+    def pause(self, url: str) -> bool:
+        """
+        Pause a running job at its next chunk.
+        
+        Args:
+            url: URL of the job.
+            
+        Returns:
+            Boolean indicating if the job was running.
+        """
+        with self._lock:
+            bot = self._running.get(url)
+        if bot is not None:
+            bot.pause()
+        return bot is not None
+    
+    def resume(self, url: str) -> bool:
+        """
+        Resume a paused job.
+        
+        Args:
+            url: URL of the job.
+            
+        Returns:
+            Boolean indicating if the job was running.
+        """
+        with self._lock:
+            bot = self._running.get(url)
+        if bot is not None:
+            bot.resume()
+        return bot is not None
+    
+    def run(self, urls: Iterable[str]) -> Tuple[int, int]:
+        """
+        Download every URL from an iterable, blocking until all jobs are done.
+        
+        The iterable is consumed lazily: when the queue is full the producer
+        blocks until a worker picks up the next job.
+        
+        Args:
+            urls: Iterable of URLs, typically from iter_urls().
+            
+        Returns:
+            Tuple containing (succeeded_count, failed_count).
+        """
+        jobs = make_queue(self.policy, maxsize=self.queue_size)
+        # Policies other than FIFO need the size of a job before it is queued
+        resolvers = self.resolvers or (1 if self.policy != "fifo" else 0)
+        threads = [
+            threading.Thread(target=self._worker, args=(jobs,), daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        finished = threading.Event()
+        if self.controller is not None:
+            monitor = threading.Thread(target=self._monitor, args=(finished,), daemon=True)
+            monitor.start()
+        
+        try:
+            source = self._resolved_jobs(urls, resolvers) if resolvers else (_Job(url) for url in urls)
+            for job in source:
+                jobs.put(job)
+        except BaseException:
+            # Interrupted (e.g. Ctrl-C): drop queued jobs so only running downloads finish
+            self._cancelled.set()
+            _drain_queue(jobs)
+            raise
+        finally:
+            for _ in threads:
+                jobs.put(_STOP)
+            for thread in threads:
+                thread.join()
+            finished.set()
+        
+        return self.succeeded, self.failed
+    
+    def _monitor(self, finished: threading.Event) -> None:
+        """Feed the controller the aggregate speed of running jobs and let it adjust."""
+        # Several samples per adjustment interval smooth out per-chunk noise
+        period = max(0.05, self.controller.interval / 10)
+        while not finished.wait(period):
+            with self._lock:
+                bots = list(self._running.values())
+            self.controller.record_speed(sum(bot.download_speed or 0 for bot in bots))
+            self.controller.update()
+    
+    def _resolved_jobs(self, urls: Iterable[str], resolvers: int) -> Iterator[_Job]:
+        """
+        Resolve URLs on a pool of threads, yielding jobs as they are resolved.
+        
+        Extraction is bound by request latency and downloads by bandwidth, so
+        resolving ahead on several threads keeps the download workers busy.
+        bounded_map keeps at most twice as many URLs in flight as there are
+        resolvers, and the caller blocking on the full job queue stops it
+        from reading further input.
+        """
+        local = threading.local()
+        
+        def resolve(job: _Job) -> bool:
+            # YoutubeDL instances are not thread-safe, so every resolver has its own bot
+            if not hasattr(local, "bot"):
+                local.bot = self.bot_factory()
+            return not self._cancelled.is_set() and self._resolve(local.bot, job)
+        
+        for job, resolved in bounded_map(resolve, (_Job(url) for url in urls), workers=resolvers):
+            if isinstance(resolved, Exception):
+                self._record(job.url, False, f"Download failed: {str(resolved)}")
+            elif resolved:
+                yield job
+    
+    def _worker(self, jobs: "queue.Queue") -> None:
+        bot = self.bot_factory()
+        stopping = False
+        while True:
+            job = self._admit_deferred(bot)
+            if job is None:
+                # Keep the deferred backlog bounded like the input queue
+                if stopping or len(self._deferred) >= self.queue_size:
+                    if not self._wait_for_space():
+                        return
+                    continue
+                job = jobs.get()
+                if job is _STOP:
+                    stopping = True
+                    continue
+                if self._cancelled.is_set():
+                    continue
+                if self.disk_guard is not None and job.info is None and not self._resolve(bot, job):
+                    continue
+                if not self._admit(bot, job):
+                    continue
+            self._run(bot, job)
+    
+    def _resolve(self, bot: YouTubeDownloaderBot, job: _Job) -> bool:
+        """Fill in the info, expected size and duration of a job. Records a failure on error."""
+        try:
+            job.info = bot.resolve(job.url)
+        except Exception as e:
+            self._record(job.url, False, f"Download failed: {str(e)}")
+            return False
+        job.size = bot.estimate_size(job.info)
+        job.duration = job.info.get('duration')
+        return True
+    
+    def _reserve(self, bot: YouTubeDownloaderBot, job: _Job) -> bool:
+        """Reserve space for a job on behalf of the bot that will run it. Caller holds the lock."""
+        # Unknown sizes are admitted without a reservation
+        job.token = self.disk_guard.try_reserve(job.size or 0, lambda: bot.job_downloaded_bytes)
+        return job.token is not None
+    
+    def _admit(self, bot: YouTubeDownloaderBot, job: _Job) -> bool:
+        """Reserve space for a job, deferring it if it does not fit right now."""
+        if self.disk_guard is None:
+            return True
+        with self._lock:
+            if self._reserve(bot, job):
+                return True
+            if not self.disk_guard.in_flight:
+                # Nothing in flight will free space, so the job can never start
+                rejected = True
+            else:
+                self._deferred.append(job)
+                rejected = False
+        if rejected:
+            self._record(job.url, False, "Not enough disk space")
+        return False
+    
+    def _admit_deferred(self, bot: YouTubeDownloaderBot) -> Optional[_Job]:
+        """Take the first deferred job that fits now, failing jobs that never will."""
+        if self.disk_guard is None or self._cancelled.is_set():
+            return None
+        rejected = []
+        admitted = None
+        with self._lock:
+            for job in list(self._deferred):
+                if self._reserve(bot, job):
+                    self._deferred.remove(job)
+                    admitted = job
+                    break
+            else:
+                if not self.disk_guard.in_flight:
+                    rejected = list(self._deferred)
+                    self._deferred.clear()
+        for job in rejected:
+            self._record(job.url, False, "Not enough disk space")
+        return admitted
+    
+    def _wait_for_space(self) -> bool:
+        """Wait for a running job to release space. Returns False once nothing is deferred."""
+        with self._space_released:
+            if not self._deferred or self._cancelled.is_set():
+                return False
+            self._space_released.wait(self.DEFER_POLL_INTERVAL)
+            return True
+    
+    def _run(self, bot: YouTubeDownloaderBot, job: _Job) -> None:
+        if self.controller is not None:
+            # Wait until the controller allows another job, then use its current fragment count
+            self.controller.acquire()
+            bot.concurrent_fragments = self.controller.fragments
+        with self._lock:
+            skip = job.url in self._cancelled_urls
+            self._cancelled_urls.discard(job.url)
+            if not skip:
+                self._running[job.url] = bot
+        try:
+            if skip:
+                success, result = False, "Download cancelled"
+            else:
+                success, result = bot.download(job.url, info=job.info)
+        except Exception as e:
+            success, result = False, f"Download failed: {str(e)}"
+        finally:
+            with self._lock:
+                self._running.pop(job.url, None)
+            if self.controller is not None:
+                self.controller.release()
+            if self.disk_guard is not None:
+                with self._space_released:
+                    self.disk_guard.release(job.token)
+                    self._space_released.notify_all()
+        self._record(job.url, success, result)
+    
+    def _record(self, url: str, success: bool, result: str) -> None:
+        with self._lock:
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        if self.controller is not None:
+            self.controller.record_result(success, None if success else result)
+        if self.on_result:
+            self.on_result(url, success, result)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Adaptive concurrency for batch downloads.
+
+AdaptiveConcurrency tunes how many jobs run at once, and how many fragments
+each new job downloads in parallel, from what the batch observes: the
+aggregate download speed reported by the progress hooks and the share of
+jobs that fail. It follows AIMD: while throughput keeps rising it adds one
+job (and once the job limit is reached, one fragment) per interval; a step
+that brings no gain is taken back and probing pauses for a while; a rate
+of throttling failures (HTTP 429 or 403, timeouts) above the threshold
+halves both. Cancelled jobs and videos that are private or gone say
+nothing about the site's load and are left out of the rate. Every decision is kept, logged and exposed through metrics().
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job errors that mean the site is pushing back rather than that the video is unavailable
+_THROTTLING_ERROR = re.compile(r"HTTP Error (?:429|403)|Too Many Requests|timed? ?out|rate.?limit", re.IGNORECASE)
+
+
+def is_throttling_error(error: str) -> bool:
+    """
+    Check whether a job error looks like throttling.
+
+    Args:
+        error: Error message of a failed job.
+
+    Returns:
+        Boolean indicating if the error is an HTTP 429 or 403, a rate limit
+        or a timeout.
+    """
+    return bool(_THROTTLING_ERROR.search(error))
+
+
+class Decision(NamedTuple):
+    """One adjustment made by the controller."""
+    time: float
+    action: str
+    reason: str
+    jobs: int
+    fragments: int
+    throughput: float
+    error_rate: float
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of active jobs and fragments per job."""
+
+    def __init__(self, min_jobs: int = 1, max_jobs: int = 8, min_fragments: int = 1, max_fragments: int = 1,
+                 initial_jobs: Optional[int] = None, interval: float = 5.0, min_gain: float = 0.05,
+                 max_error_rate: float = 0.2, hold_intervals: int = 6, decrease_factor: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the controller.
+
+        Args:
+            min_jobs: Fewest concurrent jobs.
+            max_jobs: Most concurrent jobs.
+            min_fragments: Fewest fragments downloaded in parallel per job.
+            max_fragments: Most fragments downloaded in parallel per job.
+            initial_jobs: Starting job limit. Defaults to min_jobs.
+            interval: Seconds between adjustments.
+            min_gain: Relative throughput increase an added job or fragment
+                      must bring to be kept.
+            max_error_rate: Share of failed jobs in an interval above which
+                            concurrency is cut.
+            hold_intervals: Intervals to wait after a step that brought no gain
+                            before probing again.
+            decrease_factor: Factor applied to both limits on a cut.
+            clock: Time source, replaceable in tests.
+        """
+        if not 1 <= min_jobs <= max_jobs or not 1 <= min_fragments <= max_fragments:
+            raise ValueError("Concurrency bounds must satisfy 1 <= min <= max")
+        self.min_jobs = min_jobs
+        self.max_jobs = max_jobs
+        self.min_fragments = min_fragments
+        self.max_fragments = max_fragments
+        self.interval = interval
+        self.min_gain = min_gain
+        self.max_error_rate = max_error_rate
+        self.hold_intervals = hold_intervals
+        self.decrease_factor = decrease_factor
+        self.clock = clock
+
+        self.jobs = min(max(initial_jobs or min_jobs, min_jobs), max_jobs)
+        self.fragments = min_fragments
+        self.active = 0
+        self.decisions: deque = deque(maxlen=1000)
+
+        self._cond = threading.Condition()
+        self._window_start = clock()
+        self._speed_sum = 0.0
+        self._speed_samples = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._baseline: Optional[float] = None
+        self._last_step: Optional[str] = None
+        self._hold = 0
+        self._counts = {"increase": 0, "decrease": 0, "revert": 0, "hold": 0}
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a job slot under the current limit.
+
+        Args:
+            timeout: Seconds to wait at most. None waits indefinitely.
+
+        Returns:
+            Boolean indicating if a slot was taken.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.active < self.jobs, timeout):
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        """Give back a job slot."""
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def record_speed(self, bytes_per_second: float) -> None:
+        """
+        Add a sample of the aggregate download speed of all running jobs.
+
+        Args:
+            bytes_per_second: Sum of the current speeds reported by the progress hooks.
+        """
+        with self._cond:
+            self._speed_sum += bytes_per_second
+            self._speed_samples += 1
+
+    def record_result(self, success: bool, error: Optional[str] = None) -> None:
+        """
+        Count a finished job for the error rate.
+
+        Args:
+            success: Whether the job succeeded.
+            error: Error message of a failed job. Failures that do not look
+                   like throttling (see is_throttling_error) are not counted
+                   at all. Without a message the failure counts.
+        """
+        if not success and error is not None and not is_throttling_error(error):
+            return
+        with self._cond:
+            if success:
+                self._succeeded += 1
+            else:
+                self._failed += 1
+
+    def update(self) -> Optional[Decision]:
+        """
+        Adjust the limits if an interval has passed since the last adjustment.
+
+        Returns:
+            The decision taken, or None if the interval has not passed yet.
+        """
+        with self._cond:
+            now = self.clock()
+            if now - self._window_start < self.interval:
+                return None
+            throughput = self._speed_sum / self._speed_samples if self._speed_samples else 0.0
+            finished = self._succeeded + self._failed
+            error_rate = self._failed / finished if finished else 0.0
+            self._window_start = now
+            self._speed_sum = 0.0
+            self._speed_samples = 0
+            self._succeeded = self._failed = 0
+
+            action, reason = self._decide(throughput, error_rate)
+            self._counts[action] += 1
+            decision = Decision(now, action, reason, self.jobs, self.fragments, throughput, error_rate)
+            self.decisions.append(decision)
+            # Raising the limit may free waiting workers
+            self._cond.notify_all()
+
+        if action != "hold":
+            logger.info("Concurrency %s (%s): %d jobs, %d fragments, %.0f B/s, %.0f%% errors",
+                        action, reason, decision.jobs, decision.fragments, throughput, error_rate * 100)
+        return decision
+
+    def _decide(self, throughput: float, error_rate: float):
+        """Apply one AIMD step. Caller holds the lock."""
+        if error_rate > self.max_error_rate:
+            self.jobs = max(self.min_jobs, int(self.jobs * self.decrease_factor))
+            self.fragments = max(self.min_fragments, int(self.fragments * self.decrease_factor))
+            self._last_step = None
+            self._baseline = None
+            self._hold = self.hold_intervals
+            return "decrease", f"error rate {error_rate:.0%}"
+
+        if self._last_step is not None and self._baseline is not None \
+                and throughput < self._baseline * (1 + self.min_gain):
+            # The last step did not pay off: take it back and wait before probing again
+            step, self._last_step = self._last_step, None
+            if step == "jobs":
+                self.jobs = max(self.min_jobs, self.jobs - 1)
+            else:
+                self.fragments = max(self.min_fragments, self.fragments - 1)
+            self._hold = self.hold_intervals
+            return "revert", f"no gain from more {step}"
+
+        self._last_step = None
+        self._baseline = throughput
+        if self._hold > 0:
+            self._hold -= 1
+            return "hold", "waiting before probing"
+        if not self.active and not throughput:
+            return "hold", "idle"
+        if self.jobs < self.max_jobs:
+            self.jobs += 1
+            self._last_step = "jobs"
+        elif self.fragments < self.max_fragments:
+            self.fragments += 1
+            self._last_step = "fragments"
+        else:
+            return "hold", "at maximum"
+        return "increase", "probing"
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Current limits, last observations and decision counts.
+
+        Returns:
+            Dictionary of metrics.
+        """
+        with self._cond:
+            last = self.decisions[-1] if self.decisions else None
+            return {
+                "jobs": self.jobs,
+                "fragments": self.fragments,
+                "active": self.active,
+                "throughput": last.throughput if last else 0.0,
+                "error_rate": last.error_rate if last else 0.0,
+                "decisions": dict(self._counts),
+            }
+
+    def history(self) -> List[Decision]:
+        """
+        Recent decisions, oldest first.
+
+        Returns:
+            Up to the last 1000 decisions.
+        """
+        with self._cond:
+            return list(self.decisions)
@@ -4,9 +4,24 @@ Environment configuration loader for YouTube Downloader.
 """
 
 import os
+import json
+import time
+import queue
+import atexit
 import logging
+import logging.handlers
 from typing import Dict, Any, Optional
-from dotenv import load_dotenv
+
+try:
+    from dotenv import load_dotenv
+except ImportError:  # python-dotenv is optional; environment variables still apply
+    load_dotenv = None
+
+# Record attributes that are not copied into JSON log lines
+_STANDARD_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+# Listener of the active logging pipeline, replaced by each setup_logging() call
+_listener: Optional[logging.handlers.QueueListener] = None
 
 def load_config() -> Dict[str, Any]:
     """
@@ -16,7 +31,8 @@ def load_config() -> Dict[str, Any]:
         Dictionary containing configuration settings.
     """
     # Load .env file if it exists
-    load_dotenv()
+    if load_dotenv is not None:
+        load_dotenv()
     
     # Define default values
     defaults = {
@@ -30,6 +46,10 @@ def load_config() -> Dict[str, Any]:
         "HTTPS_PROXY": None,
         "LOG_LEVEL": "INFO",
         "LOG_FILE": os.path.join("logs", "youtube_downloader.log"),
+        "LOG_FORMAT": "text",
+        "LOG_MAX_BYTES": 10 * 1024 * 1024,
+        "LOG_ROTATE_HOURS": 24.0,
+        "LOG_BACKUP_COUNT": 5,
         "AUTO_CHECK_UPDATES": True,
     }
     
@@ -44,9 +64,9 @@ def load_config() -> Dict[str, Any]:
             # Convert string values to appropriate types
             if isinstance(default_value, bool):
                 config[key] = env_value.lower() in ("true", "yes", "1", "t", "y")
-            elif isinstance(default_value, int):
+            elif isinstance(default_value, (int, float)):
                 try:
-                    config[key] = int(env_value)
+                    config[key] = type(default_value)(env_value)
                 except ValueError:
                     config[key] = default_value
             else:
@@ -60,36 +80,159 @@ def load_config() -> Dict[str, Any]:
     
     return config
 
-def setup_logging(config: Dict[str, Any]) -> None:
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Format a record as JSON.
+        
+        Args:
+            record: Log record.
+            
+        Returns:
+            JSON line with time, level, logger, message and any extra fields.
+        """
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        # Fields passed with extra={...}
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RotatingLogFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler that rolls over by size and by age, whichever comes first."""
+    
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0,
+                 rotate_seconds: float = 0, encoding: Optional[str] = "utf-8"):
+        """
+        Initialize the handler.
+        
+        Args:
+            filename: Log file path.
+            max_bytes: Roll over once the file would exceed this size. 0 disables.
+            backup_count: Number of rotated files kept (.1 is the newest).
+            rotate_seconds: Roll over once the file has been written to for this
+                            long. 0 disables.
+            encoding: File encoding.
+        """
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.rotate_seconds = rotate_seconds
+        # Count from when the existing file was started, so that short runs
+        # appending to the same file still rotate it once it is old enough
+        self.rollover_at = self._started_at() + rotate_seconds if rotate_seconds else None
+    
+    def _started_at(self) -> float:
+        """
+        Estimate when the current log file was started.
+        
+        Returns:
+            Its creation time where the OS records one, otherwise when the
+            newest rotated file was last written (the last rollover), otherwise
+            the file's own mtime as TimedRotatingFileHandler uses. The current
+            time if there is no file yet.
+        """
+        try:
+            stat = os.stat(self.baseFilename)
+        except OSError:
+            return time.time()
+        if getattr(stat, "st_birthtime", None):
+            return stat.st_birthtime
+        try:
+            return os.stat(self.baseFilename + ".1").st_mtime
+        except OSError:
+            return stat.st_mtime
+    
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+    
+    def doRollover(self) -> None:
+        super().doRollover()
+        if self.rollover_at is not None:
+            self.rollover_at = time.time() + self.rotate_seconds
+
+def setup_logging(config: Dict[str, Any]) -> logging.handlers.QueueListener:
     """
     Configure logging based on configuration.
     
+    Log calls only put the record on an in-memory queue; a background
+    listener thread formats it and writes it to the console and the log
+    file. Download threads therefore never wait on disk I/O or file
+    rotation. The listener is stopped, flushing queued records, at exit.
+    
     Args:
-        config: Configuration dictionary.
+        config: Configuration dictionary. LOG_FORMAT "json" writes the log
+                file as JSON lines; LOG_MAX_BYTES and LOG_ROTATE_HOURS set
+                when it is rotated, and LOG_BACKUP_COUNT how many old files
+                are kept.
+        
+    Returns:
+        The started listener, which setup_logging() also stops at exit.
     """
+    global _listener
+    
     log_level_name = config["LOG_LEVEL"].upper()
     log_level = getattr(logging, log_level_name, logging.INFO)
+    text_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                                       datefmt="%Y-%m-%d %H:%M:%S")
     
-    # Configure basic logging
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    # Set console output level based on CONSOLE_OUTPUT setting
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(log_level if config["CONSOLE_OUTPUT"] else logging.ERROR)
+    console_handler.setFormatter(text_formatter)
+    handlers = [console_handler]
     
     # Add file handler if log file is specified
     if config["LOG_FILE"]:
-        file_handler = logging.FileHandler(config["LOG_FILE"])
+        file_handler = RotatingLogFileHandler(
+            config["LOG_FILE"],
+            max_bytes=config.get("LOG_MAX_BYTES", 0),
+            backup_count=config.get("LOG_BACKUP_COUNT", 0),
+            rotate_seconds=config.get("LOG_ROTATE_HOURS", 0) * 3600,
+        )
         file_handler.setLevel(log_level)
-        file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-        file_handler.setFormatter(file_formatter)
-        logging.getLogger().addHandler(file_handler)
+        if config.get("LOG_FORMAT", "text").lower() == "json":
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(text_formatter)
+        handlers.append(file_handler)
     
-    # Set console output level based on CONSOLE_OUTPUT setting
-    if not config["CONSOLE_OUTPUT"]:
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.ERROR)  # Only show errors in console
-        logging.getLogger().handlers[0].setLevel(logging.ERROR)
+    if _listener is not None:
+        _stop_listener()
+    
+    # Unbounded, so putting a record never blocks the logging thread
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(log_level)
+    
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def _stop_listener() -> None:
+    """Flush and stop the active logging listener."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(_stop_listener)
 
 def get_system_info() -> Dict[str, str]:
     """
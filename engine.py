@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Download engine shared by the GUI and the bot.
+
+Both front-ends describe a download as a DownloadJob, run it with
+run_download(), and receive a DownloadResult. Option building, the
+extractor cache, audio handling, cancel/pause and output path logic live
+here once, so changes to them apply to every front-end. Progress is
+reported to sinks: plain callables that receive yt-dlp progress dictionaries.
+"""
+
+import os
+import shutil
+import threading
+import contextlib
+import yt_dlp
+from yt_dlp.cache import Cache
+from typing import Optional, Dict, Any, Callable, Iterable, List, NamedTuple, Tuple
+from size_budget import FitToSizePP, SizeBudgetSelector
+
+# Where downloads go when no save directory is given
+DEFAULT_SAVE_DIRECTORY = os.path.join(os.path.expanduser("~"), "Downloads")
+# Audio format selection per target codec. Preferring a stream that already
+# has the target codec lets FFmpegExtractAudio stream-copy instead of transcoding.
+AUDIO_FORMATS = {
+    "mp3": "bestaudio/best",                        # No MP3 streams exist; always transcodes
+    "m4a": "bestaudio[ext=m4a]/bestaudio/best",     # AAC, copied into an .m4a container
+    "opus": "bestaudio[acodec=opus]/bestaudio/best",  # Opus, copied into an .opus container
+    "native": "bestaudio/best",                     # Whatever the best stream is, never transcoded
+}
+
+# Audio streams a size-budgeted selection prefers per target codec, matching AUDIO_FORMATS
+BUDGET_AUDIO_PREFERENCES = {
+    "mp3": {},
+    "m4a": {'audio_ext': "m4a"},
+    "opus": {'audio_codec': "opus"},
+    "native": {},
+}
+
+# File extension FFmpegExtractAudio gives a stream-copied audio codec
+AUDIO_CODEC_EXTENSIONS = {"aac": "m4a", "mp4a": "m4a", "opus": "opus", "vorbis": "ogg", "mp3": "mp3", "flac": "flac"}
+
+def build_audio_options(audio_codec: str = "mp3", quality: str = "192") -> Dict[str, Any]:
+    """
+    Build yt-dlp options for an audio-only download.
+    
+    Args:
+        audio_codec: Target codec: "mp3", "m4a", "opus", or "native" to keep the
+                     codec of the best audio stream and only remux it.
+        quality: Bitrate in kbit/s, used only when transcoding.
+        
+    Returns:
+        Dictionary with 'format' and 'postprocessors' options.
+        
+    Raises:
+        ValueError: If the codec is not supported.
+    """
+    if audio_codec not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio codec: {audio_codec}")
+    return {
+        'format': AUDIO_FORMATS[audio_codec],
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            # 'best' keeps the source codec; FFmpegExtractAudio also copies when it already matches
+            'preferredcodec': 'best' if audio_codec == "native" else audio_codec,
+            'preferredquality': quality,
+        }],
+    }
+
+def parse_time_range(start_time: Optional[Any] = None,
+                     end_time: Optional[Any] = None) -> Optional[Tuple[float, Optional[float]]]:
+    """
+    Parse the bounds of a section download.
+    
+    Args:
+        start_time: Start as seconds or a string such as "90", "1:30" or "1h2m".
+                    Defaults to the beginning of the video.
+        end_time: End in the same forms. Defaults to the end of the video.
+        
+    Returns:
+        (start, end) in seconds with end None for "until the end", or None when
+        neither bound is given.
+        
+    Raises:
+        ValueError: If a bound cannot be parsed or the range is empty.
+    """
+    if start_time is None and end_time is None:
+        return None
+    
+    def to_seconds(value, name):
+        seconds = value if isinstance(value, (int, float)) else yt_dlp.utils.parse_duration(str(value))
+        if seconds is None or seconds < 0:
+            raise ValueError(f"Invalid {name} time: {value}")
+        return float(seconds)
+    
+    start = to_seconds(start_time, "start") if start_time is not None else 0.0
+    end = to_seconds(end_time, "end") if end_time is not None else None
+    if end is not None and end <= start:
+        raise ValueError("End time must be after start time")
+    return start, end
+
+def audio_output_path(media_path: str, video: Dict[str, Any], audio_codec: str) -> str:
+    """
+    Predict where FFmpegExtractAudio leaves an audio file.
+    
+    Args:
+        media_path: Path of the downloaded stream.
+        video: Info dictionary of the video.
+        audio_codec: Codec passed to build_audio_options().
+        
+    Returns:
+        Path of the extracted audio file.
+    """
+    base, ext = os.path.splitext(media_path)
+    if audio_codec != "native":
+        return f"{base}.{audio_codec}"
+    acodec = (video.get('acodec') or '').split('.')[0]
+    return f"{base}.{AUDIO_CODEC_EXTENSIONS.get(acodec, ext.lstrip('.'))}"
+
+class SharedCache(Cache):
+    """
+    yt-dlp cache that is safe to share between concurrent processes.
+    
+    Each entry has a lock file next to it: writers hold it exclusively while
+    replacing the entry, readers hold it shared while reading, so a reader
+    never sees a half-written or briefly missing entry (on Windows, yt-dlp
+    deletes the old file before renaming the new one into place).
+    """
+    
+    def _lock_path(self, section: str, key: str, dtype: str) -> str:
+        return self._get_cache_fn(section, key, dtype) + ".lock"
+    
+    def store(self, section, key, data, dtype='json'):
+        if not self.enabled:
+            return
+        lock_path = self._lock_path(section, key, dtype)
+        try:
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            with yt_dlp.utils.locked_file(lock_path, 'ab'):
+                super().store(section, key, data, dtype)
+        except OSError as e:
+            self._ydl.report_warning(f'Locking cache entry {lock_path!r} failed: {e}')
+    
+    def load(self, section, key, dtype='json', default=None, *, min_ver=None):
+        if not self.enabled:
+            return default
+        try:
+            lock = yt_dlp.utils.locked_file(self._lock_path(section, key, dtype), 'rb')
+        except OSError:
+            # Never written by a SharedCache, so no writer to wait for
+            lock = contextlib.nullcontext()
+        with lock:
+            return super().load(section, key, dtype, default, min_ver=min_ver)
+
+def open_youtube_dl(ydl_opts: Dict[str, Any]) -> yt_dlp.YoutubeDL:
+    """
+    Create a YoutubeDL instance whose cache can be shared between processes.
+    
+    The player JS and signature functions yt-dlp caches are then computed
+    once and reused by every worker pointing at the same 'cachedir'.
+    
+    Args:
+        ydl_opts: yt-dlp options.
+        
+    Returns:
+        The YoutubeDL instance, usable as a context manager.
+    """
+    ydl = yt_dlp.YoutubeDL(ydl_opts)
+    ydl.cache = SharedCache(ydl)
+    return ydl
+
+class JobCancelled(yt_dlp.utils.DownloadCancelled):
+    """Raised from a progress hook to stop a download that was cancelled."""
+    msg = "Download cancelled"
+
+class JobControl:
+    """
+    Cancel and pause switches for one download.
+    
+    The switches are checked by checkpoint(), which progress hooks call on
+    every chunk, so a request takes effect within one chunk. Partial files
+    are left in place so a later download of the same URL resumes them.
+    """
+    
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+    
+    def cancel(self) -> None:
+        """Stop the download at the next chunk, waking it if paused."""
+        self._cancelled.set()
+        self._running.set()
+    
+    def pause(self) -> None:
+        """Hold the download at the next chunk until resume() or cancel()."""
+        self._running.clear()
+    
+    def resume(self) -> None:
+        """Let a paused download continue."""
+        self._running.set()
+    
+    def reset(self) -> None:
+        """Clear both switches, ready for the next download."""
+        self._cancelled.clear()
+        self._running.set()
+    
+    def checkpoint(self) -> None:
+        """
+        Block while paused and raise if cancelled.
+        
+        Raises:
+            JobCancelled: If cancel() was called.
+        """
+        # is_set() is a plain attribute read; only take the lock when paused
+        if not self._running.is_set():
+            self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+
+# Output templates relative to the save directory. "flat" keeps every file in
+# one directory named by title. The others use stable ID-based names and
+# spread files over subdirectories so no directory grows too large: "id"
+# shards by the first two ID characters (4096 shards for YouTube IDs),
+# "date" by upload year and month.
+OUTPUT_LAYOUTS = {
+    "flat": "%(title)s.%(ext)s",
+    "id": os.path.join("%(id).2s", "%(id)s.%(ext)s"),
+    "date": os.path.join("%(upload_date>%Y)s", "%(upload_date>%m)s", "%(id)s.%(ext)s"),
+}
+
+INVALID_URL_MESSAGE = "Invalid YouTube URL. URL must contain 'youtube.com' or 'youtu.be'"
+
+def format_size(bytes_size: float) -> str:
+    """
+    Convert bytes to a human-readable format.
+    
+    Args:
+        bytes_size: Size in bytes.
+        
+    Returns:
+        Human-readable size string (e.g., "10.5 MB").
+    """
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_size < 1024.0:
+            return f"{bytes_size:.2f} {unit}"
+        bytes_size /= 1024.0
+    return f"{bytes_size:.2f} TB"
+
+def is_valid_youtube_url(url: str) -> bool:
+    """
+    Basic validation for YouTube URLs.
+    
+    Args:
+        url: URL to validate.
+        
+    Returns:
+        Boolean indicating if URL appears to be a valid YouTube URL.
+    """
+    return ("youtube.com" in url or "youtu.be" in url) and "://" in url
+
+# A progress sink receives every yt-dlp progress dictionary of a job
+ProgressSink = Callable[[Dict[str, Any]], None]
+
+class DownloadResult(NamedTuple):
+    """Outcome of run_download()."""
+    success: bool
+    path: Optional[str] = None
+    error: Optional[str] = None
+    info: Optional[Dict[str, Any]] = None
+    cancelled: bool = False
+
+class DownloadJob:
+    """One download: what to fetch, where to put it, and its cancel/pause switches."""
+    
+    def __init__(self, url: str, save_directory: Optional[str] = None, format_type: str = "MP4",
+                 audio_codec: str = "mp3", audio_quality: str = "192",
+                 section: Optional[Tuple[float, Optional[float]]] = None, precise_cuts: bool = True,
+                 staging_directory: Optional[str] = None, cache_directory: Optional[str] = None,
+                 info: Optional[Dict[str, Any]] = None, control: Optional[JobControl] = None,
+                 quiet: bool = False, output_layout: str = "flat", fragments: int = 1,
+                 max_filesize: Optional[int] = None):
+        """
+        Describe a download.
+        
+        Args:
+            url: YouTube URL to download.
+            save_directory: Directory for finished files. Defaults to ~/Downloads.
+            format_type: "MP4" for video or "MP3" for audio only.
+            audio_codec: Codec for audio downloads, see build_audio_options().
+            audio_quality: Bitrate in kbit/s used when transcoding audio.
+            section: (start, end) seconds from parse_time_range() to download
+                     only part of the video.
+            precise_cuts: Re-encode around section cuts so they are exact.
+            staging_directory: Directory on the same filesystem to download into
+                               before finished files are renamed into place.
+            cache_directory: yt-dlp cache directory for player and signature data.
+            info: Info dictionary already resolved for the URL, if any.
+            control: Cancel/pause switches. A new JobControl by default.
+            quiet: Suppress yt-dlp's own console output.
+            output_layout: Name of an OUTPUT_LAYOUTS entry.
+            fragments: Fragments of DASH/HLS formats downloaded in parallel.
+            max_filesize: Size budget in bytes. Formats are chosen to fit it
+                          (see size_budget.py) and a download that still
+                          exceeds it is re-encoded.
+            
+        Raises:
+            ValueError: If the output layout is unknown.
+        """
+        if output_layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"Unknown output layout: {output_layout}")
+        self.url = url
+        self.save_directory = save_directory or DEFAULT_SAVE_DIRECTORY
+        self.format_type = format_type
+        self.audio_codec = audio_codec
+        self.audio_quality = audio_quality
+        self.section = section
+        self.precise_cuts = precise_cuts
+        self.staging_directory = staging_directory
+        self.cache_directory = cache_directory
+        self.info = info
+        self.control = control or JobControl()
+        self.quiet = quiet
+        self.output_layout = output_layout
+        self.fragments = fragments
+        self.max_filesize = max_filesize
+    
+    def ydl_options(self, progress_hooks: List[ProgressSink]) -> Dict[str, Any]:
+        """
+        Build the yt-dlp options for this job.
+        
+        Args:
+            progress_hooks: yt-dlp progress hooks to install.
+            
+        Returns:
+            Dictionary of yt-dlp options.
+        """
+        template = OUTPUT_LAYOUTS[self.output_layout]
+        ydl_opts = {
+            'outtmpl': os.path.join(self.save_directory, template),
+            'progress_hooks': progress_hooks,
+        }
+        if self.format_type == "MP4":
+            ydl_opts['format'] = 'best'  # Best quality that includes video and audio
+        else:  # MP3 - audio only, transcoded only if the target codec requires it
+            ydl_opts.update(build_audio_options(self.audio_codec, self.audio_quality))
+            if self.audio_codec == "native" and not shutil.which("ffmpeg"):
+                # Without ffmpeg, keep the downloaded stream as-is (preferring .m4a)
+                ydl_opts.pop('postprocessors')
+        
+        if self.max_filesize:
+            # Best formats whose estimated size fits, falling back to lower resolutions and audio only
+            audio_only = self.format_type != "MP4"
+            preferences = BUDGET_AUDIO_PREFERENCES.get(self.audio_codec, {}) if audio_only else {}
+            ydl_opts['format'] = SizeBudgetSelector(self.max_filesize, audio_only=audio_only, **preferences)
+        
+        if self.quiet:
+            ydl_opts['quiet'] = True
+            ydl_opts['no_warnings'] = True
+        
+        if self.staging_directory:
+            # Stage into the same filesystem; yt-dlp renames finished files into home
+            ydl_opts['paths'] = {'home': self.save_directory, 'temp': self.staging_directory}
+            ydl_opts['outtmpl'] = template
+        
+        if self.cache_directory:
+            ydl_opts['cachedir'] = self.cache_directory
+        
+        if self.fragments > 1:
+            ydl_opts['concurrent_fragment_downloads'] = self.fragments
+        
+        if self.section:
+            start, end = self.section
+            ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(
+                None, [(start, end if end is not None else float('inf'))])
+            ydl_opts['force_keyframes_at_cuts'] = self.precise_cuts
+            # Keep clips from overwriting a full download of the same video
+            base, ext = os.path.splitext(ydl_opts['outtmpl'])
+            ydl_opts['outtmpl'] = f"{base} [%(section_start)s-%(section_end)s]{ext}"
+        
+        return ydl_opts
+
+def run_download(job: DownloadJob, sinks: Iterable[ProgressSink] = (),
+                 process: Optional[Callable[[yt_dlp.YoutubeDL, DownloadJob, Dict[str, Any]], Dict[str, Any]]] = None
+                 ) -> DownloadResult:
+    """
+    Run a download job.
+    
+    Every progress event first passes the job's cancel/pause checkpoint and
+    is then handed to each sink in order.
+    
+    Args:
+        job: The job to run.
+        sinks: Progress sinks.
+        process: Replaces the default extract-and-download step. Called with
+                 (ydl, job, ydl_opts); returns the processed info dictionary.
+                 
+    Returns:
+        The result. Errors are reported in it rather than raised.
+    """
+    sinks = list(sinks)
+    
+    def hook(d):
+        if d['status'] == 'downloading':
+            job.control.checkpoint()
+        for sink in sinks:
+            sink(d)
+    
+    ydl_opts = job.ydl_options([hook])
+    try:
+        with open_youtube_dl(ydl_opts) as ydl:
+            if job.max_filesize:
+                # Runs after audio extraction, on the final file, and only re-encodes when over budget
+                ydl.add_post_processor(FitToSizePP(ydl, job.max_filesize), when='post_process')
+            if process is not None:
+                info = process(ydl, job, ydl_opts)
+            elif job.info is not None:
+                info = ydl.process_ie_result(job.info, download=True)
+            else:
+                info = ydl.extract_info(job.url, download=True)
+            
+            # Only the first video of a playlist is reported
+            video = info['entries'][0] if 'entries' in info else info
+            
+            # Sections are named from their own info dict, which carries the bounds
+            downloads = video.get('requested_downloads') or [video]
+            filename = ydl.prepare_filename(downloads[0] if job.section else video)
+            
+            # For audio, yt-dlp extracts the audio into the target container
+            if job.format_type == "MP3" and 'postprocessors' in ydl_opts:
+                filename = audio_output_path(filename, video, job.audio_codec)
+            
+            return DownloadResult(True, filename, info=info)
+    except yt_dlp.utils.DownloadCancelled:
+        return DownloadResult(False, error=JobCancelled.msg, cancelled=True)
+    except Exception as e:
+        return DownloadResult(False, error=str(e))
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Shared job queue for downloader workers on several machines.
+
+Jobs live in an SQLite database on storage every node can reach. A worker
+claims a job by taking a lease that expires after a fixed time and renews
+it while the download runs. If a node crashes, its leases expire and other
+workers pick the jobs up again. Every lease carries a random token, and a
+job can only be renewed or completed with the token of its current lease,
+so a worker whose lease was taken over cannot record a result for it.
+
+SQLite relies on file locking, so the shared storage must support POSIX
+locks (local disks, SMB, NFSv4 with locking enabled).
+"""
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+# How long a claimed job stays leased without renewal
+DEFAULT_LEASE_SECONDS = 300
+
+# Claims after which a job that keeps losing its lease is marked failed
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    token TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+"""
+
+
+class Lease(NamedTuple):
+    """A claimed job."""
+    job_id: int
+    url: str
+    token: str
+    expires: float
+
+
+class JobQueue:
+    """Lease-based job queue stored in an SQLite database."""
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, clock: Callable[[], float] = time.time):
+        """
+        Open or create a queue.
+
+        Args:
+            path: Path of the database file on shared storage.
+            lease_seconds: Lease duration; a job whose lease is not renewed
+                           within this time is handed to another worker.
+            max_attempts: Number of claims after which a job is marked failed
+                          instead of being handed out again.
+            clock: Wall-clock time source shared by all nodes.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._local = threading.local()
+
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection())
+
+    def add(self, urls: Iterable[str]) -> int:
+        """
+        Add jobs, skipping URLs already in the queue.
+
+        Args:
+            urls: URLs to download.
+
+        Returns:
+            Number of jobs added.
+        """
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO jobs (url) VALUES (?)", ((url,) for url in urls))
+            return db.total_changes - before
+
+    def claim(self, owner: str) -> Optional[Lease]:
+        """
+        Lease the oldest pending job, or a job whose lease has expired.
+
+        Args:
+            owner: Name of the claiming worker, recorded for diagnostics.
+
+        Returns:
+            The lease, or None if no job is available.
+        """
+        now = self.clock()
+        with self._transaction() as db:
+            # Jobs whose owners crashed on their last attempt will not be retried
+            db.execute(
+                "UPDATE jobs SET state = 'failed', result = 'Lease expired too many times', token = NULL "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, url FROM jobs WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            lease = Lease(row[0], row[1], uuid.uuid4().hex, now + self.lease_seconds)
+            db.execute(
+                "UPDATE jobs SET state = 'leased', owner = ?, token = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (owner, lease.token, lease.expires, lease.job_id),
+            )
+            return lease
+
+    def renew(self, lease: Lease) -> Optional[Lease]:
+        """
+        Extend a lease that is still held.
+
+        Args:
+            lease: Lease returned by claim() or an earlier renew().
+
+        Returns:
+            The extended lease, or None if it expired and was taken over.
+        """
+        now = self.clock()
+        expires = now + self.lease_seconds
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND token = ? AND state = 'leased' "
+                "AND lease_expires >= ?",
+                (expires, lease.job_id, lease.token, now),
+            )
+            if cursor.rowcount != 1:
+                return None
+        return lease._replace(expires=expires)
+
+    def complete(self, lease: Lease, success: bool, result: str = "") -> bool:
+        """
+        Record the outcome of a leased job.
+
+        Args:
+            lease: The lease the job was downloaded under.
+            success: Whether the download succeeded.
+            result: File path or error message.
+
+        Returns:
+            True if recorded, False if the lease had been lost.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = ?, result = ?, token = NULL, lease_expires = NULL "
+                "WHERE id = ? AND token = ? AND state = 'leased'",
+                ("done" if success else "failed", result, lease.job_id, lease.token),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, lease: Lease) -> bool:
+        """
+        Give a job back without an outcome, e.g. when a worker shuts down.
+
+        Args:
+            lease: Lease to give up.
+
+        Returns:
+            True if released, False if the lease had been lost.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = 'pending', owner = NULL, token = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1 WHERE id = ? AND token = ? AND state = 'leased'",
+                (lease.job_id, lease.token),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count jobs by state.
+
+        Returns:
+            Dictionary mapping "pending", "leased", "done" and "failed" to counts.
+        """
+        counts = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+        rows = self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        counts.update(dict(rows.fetchall()))
+        return counts
+
+    def close(self) -> None:
+        """Close this thread's database connection."""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class _Transaction:
+    """Write transaction that takes the database lock up front."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        # IMMEDIATE avoids two workers reading the same job before either writes
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def default_worker_id() -> str:
+    """
+    Build a worker name that is unique across nodes.
+
+    Returns:
+        "host:pid:thread" for the calling thread.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def run_worker(job_queue: JobQueue, bot: Any, owner: Optional[str] = None,
+               stop: Optional[threading.Event] = None,
+               on_result: Optional[Callable[[str, bool, str], None]] = None) -> int:
+    """
+    Download jobs from the queue until it is empty or stop is set.
+
+    The lease is renewed in the background at a third of its duration. If a
+    renewal fails, another worker now owns the job, so the download is
+    cancelled through the bot and its result is discarded. The bot's
+    control is reset afterwards, so the cancel only affects that job.
+
+    Args:
+        job_queue: Queue to take jobs from.
+        bot: YouTubeDownloaderBot (or compatible) that performs downloads.
+        owner: Worker name. Defaults to default_worker_id().
+        stop: Event that ends the loop after the current job.
+        on_result: Called with (url, success, result) for every recorded job.
+
+    Returns:
+        Number of jobs whose outcome this worker recorded.
+    """
+    owner = owner or default_worker_id()
+    stop = stop or threading.Event()
+    recorded = 0
+    while not stop.is_set():
+        lease = job_queue.claim(owner)
+        if lease is None:
+            return recorded
+
+        done = threading.Event()
+        holder = [lease]
+        lost = threading.Event()
+
+        def keep_alive():
+            while not done.wait(job_queue.lease_seconds / 3):
+                renewed = job_queue.renew(holder[0])
+                if renewed is None:
+                    print(f"Lease lost for {lease.url}, cancelling", flush=True)
+                    lost.set()
+                    bot.cancel()
+                    return
+                holder[0] = renewed
+
+        renewer = threading.Thread(target=keep_alive, daemon=True)
+        renewer.start()
+        try:
+            success, result = bot.download(lease.url)
+        except BaseException:
+            done.set()
+            job_queue.release(holder[0])
+            raise
+        done.set()
+        renewer.join()
+        if lost.is_set():
+            # The cancel may have landed after the bot reset its control at the
+            # end of download(); clear it so the next job does not inherit it
+            bot.control.reset()
+
+        if job_queue.complete(holder[0], success, result):
+            recorded += 1
+            if on_result:
+                on_result(lease.url, success, result)
+    return recorded
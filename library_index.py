@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Persistent, incrementally updated index of a download directory.
+
+The index maps video IDs to the files saved for them (path, size, mtime and
+SHA-256) in an SQLite database inside the save directory, so lookups by ID
+are a single indexed query instead of a directory walk.
+
+update() only rescans directories whose mtime changed since the last run.
+Downloads are moved into place by rename, which always updates the
+directory's mtime, so unchanged directories can be skipped without listing
+them. Files are only rehashed when their size or mtime changed. On Linux,
+watch() follows changes through inotify without scanning at all.
+"""
+
+import os
+import re
+import sys
+import json
+import ctypes
+import ctypes.util
+import struct
+import sqlite3
+import hashlib
+import argparse
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from youtube_downloader_bot import STAGING_DIRNAME
+
+# Database file, kept in the indexed directory
+INDEX_FILENAME = ".ytd-index.sqlite"
+
+# Files of this tool in the save directory (index, sync state) start with this
+_INTERNAL_PREFIX = ".ytd-"
+
+# Names that are never indexed: in-progress files and database side files
+_IGNORED_SUFFIXES = (".part", ".ytdl", ".tmp", "-journal", "-wal", "-shm")
+
+# YouTube video IDs are 11 characters of URL-safe base64
+_ID_NAME = re.compile(r"^([0-9A-Za-z_-]{11})(?:\.|$)")
+_ID_IN_BRACKETS = re.compile(r"\[([0-9A-Za-z_-]{11})\]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    video_id TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_video_id ON files (video_id);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+class IndexedFile(NamedTuple):
+    """One file in the index. path is relative to the indexed directory."""
+    path: str
+    video_id: Optional[str]
+    size: int
+    mtime_ns: int
+    sha256: Optional[str]
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a file without reading it into memory at once.
+
+    Args:
+        path: File to hash.
+        chunk_size: Bytes read per call.
+
+    Returns:
+        Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LibraryIndex:
+    """Index of the files in one save directory, keyed by video ID."""
+
+    def __init__(self, directory: str, db_path: Optional[str] = None, hash_files: bool = True):
+        """
+        Open or create the index.
+
+        Args:
+            directory: Directory to index.
+            db_path: Database file. Defaults to INDEX_FILENAME inside directory.
+            hash_files: Compute SHA-256 for new and changed files.
+        """
+        self.directory = os.path.abspath(directory)
+        self.db_path = db_path or os.path.join(self.directory, INDEX_FILENAME)
+        self.hash_files = hash_files
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            # Keep the journal file between transactions: creating and deleting
+            # it would bump the directory mtime and force a rescan every time
+            db.execute("PRAGMA journal_mode=PERSIST")
+            self._local.db = db
+        return db
+
+    def close(self) -> None:
+        """Close this thread's database connection."""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def lookup(self, video_id: str) -> List[IndexedFile]:
+        """
+        Find the files saved for a video.
+
+        Args:
+            video_id: YouTube video ID.
+
+        Returns:
+            Indexed files for the video (media and sidecars), possibly empty.
+        """
+        rows = self._connection().execute(
+            "SELECT path, video_id, size, mtime_ns, sha256 FROM files WHERE video_id = ? ORDER BY path",
+            (video_id,),
+        )
+        return [IndexedFile(*row) for row in rows]
+
+    def by_hash(self, sha256: str) -> List[IndexedFile]:
+        """
+        Find files with the given content hash, e.g. to detect duplicates.
+
+        Args:
+            sha256: Hex SHA-256 digest.
+
+        Returns:
+            Indexed files with that hash.
+        """
+        rows = self._connection().execute(
+            "SELECT path, video_id, size, mtime_ns, sha256 FROM files WHERE sha256 = ? ORDER BY path",
+            (sha256,),
+        )
+        return [IndexedFile(*row) for row in rows]
+
+    def update(self, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date with the directory.
+
+        Args:
+            full: Also check files in directories whose mtime did not change,
+                  to catch files modified in place.
+
+        Returns:
+            Counts of "scanned" directories and "added", "changed" and
+            "removed" files.
+        """
+        db = self._connection()
+        known_dirs = dict(db.execute("SELECT path, mtime_ns FROM directories"))
+        counts = dict.fromkeys(("scanned", "added", "changed", "removed"), 0)
+        seen_dirs = set()
+
+        with db:
+            for rel_dir, mtime_ns in self._walk_directories():
+                seen_dirs.add(rel_dir)
+                if not full and known_dirs.get(rel_dir) == mtime_ns:
+                    continue
+                counts["scanned"] += 1
+                self._scan_directory(db, rel_dir, counts)
+                db.execute("INSERT OR REPLACE INTO directories (path, mtime_ns) VALUES (?, ?)",
+                           (rel_dir, mtime_ns))
+
+            for rel_dir in set(known_dirs) - seen_dirs:
+                # The whole directory is gone
+                counts["removed"] += self._forget_directory(db, rel_dir)
+                db.execute("DELETE FROM directories WHERE path = ?", (rel_dir,))
+        return counts
+
+    def refresh(self, path: str, video_id: Optional[str] = None) -> Optional[IndexedFile]:
+        """
+        Index, re-index or drop a single file, e.g. right after a download.
+
+        Args:
+            path: File path, absolute or relative to the indexed directory.
+            video_id: ID to record when it is already known. Otherwise it is
+                      worked out from the file name or info JSON.
+
+        Returns:
+            The indexed entry, or None if the file no longer exists or is ignored.
+        """
+        rel_path = os.path.relpath(os.path.join(self.directory, path), self.directory)
+        db = self._connection()
+        with db:
+            return self._refresh_file(db, rel_path, video_id=video_id)
+
+    def _walk_directories(self) -> Iterator:
+        """Yield (relative_path, mtime_ns) for the directory and its subdirectories."""
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            full_dir = os.path.join(self.directory, rel_dir)
+            try:
+                mtime_ns = os.stat(full_dir).st_mtime_ns
+                # Subdirectories must be listed even when this directory is unchanged
+                subdirs = [entry.name for entry in os.scandir(full_dir)
+                           if entry.is_dir(follow_symlinks=False) and entry.name != STAGING_DIRNAME]
+            except OSError:
+                continue
+            yield rel_dir, mtime_ns
+            stack.extend(os.path.join(rel_dir, name) for name in subdirs)
+
+    def _scan_directory(self, db: sqlite3.Connection, rel_dir: str, counts: Dict[str, int]) -> None:
+        full_dir = os.path.join(self.directory, rel_dir)
+        present = set()
+        for entry in os.scandir(full_dir):
+            if not entry.is_file(follow_symlinks=False) or self._ignored(entry.name):
+                continue
+            rel_path = os.path.join(rel_dir, entry.name)
+            present.add(rel_path)
+            known = db.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (rel_path,)).fetchone()
+            stat = entry.stat(follow_symlinks=False)
+            if known == (stat.st_size, stat.st_mtime_ns):
+                continue
+            self._refresh_file(db, rel_path, stat)
+            counts["changed" if known else "added"] += 1
+
+        stale = [path for (path,) in db.execute("SELECT path FROM files WHERE path GLOB ?",
+                                                (_glob_children(rel_dir),))
+                 if os.path.dirname(path) == rel_dir and path not in present]
+        db.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in stale))
+        counts["removed"] += len(stale)
+
+    def _forget_directory(self, db: sqlite3.Connection, rel_dir: str) -> int:
+        return db.execute("DELETE FROM files WHERE path GLOB ?", (_glob_children(rel_dir),)).rowcount
+
+    def _refresh_file(self, db: sqlite3.Connection, rel_path: str, stat: Optional[os.stat_result] = None,
+                      video_id: Optional[str] = None) -> Optional[IndexedFile]:
+        full_path = os.path.join(self.directory, rel_path)
+        try:
+            if self._ignored(os.path.basename(rel_path)):
+                raise FileNotFoundError(rel_path)
+            stat = stat or os.stat(full_path)
+            sha256 = file_sha256(full_path) if self.hash_files else None
+        except OSError:
+            db.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+            return None
+        video_id = video_id or self._video_id(full_path)
+        if video_id is None:
+            # Keep an ID recorded earlier through refresh(path, video_id)
+            known = db.execute("SELECT video_id FROM files WHERE path = ?", (rel_path,)).fetchone()
+            video_id = known[0] if known else None
+        entry = IndexedFile(rel_path, video_id, stat.st_size, stat.st_mtime_ns, sha256)
+        db.execute("INSERT OR REPLACE INTO files (path, video_id, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)",
+                   entry)
+        return entry
+
+    def _ignored(self, name: str) -> bool:
+        return name.startswith(_INTERNAL_PREFIX) or name.endswith(_IGNORED_SUFFIXES)
+
+    def _video_id(self, full_path: str) -> Optional[str]:
+        """
+        Work out the video ID from the file's location, its .info.json or its name.
+
+        A bare 11-character name is only taken for an ID inside an id or
+        date layout shard, since a flat-layout title can look the same.
+        """
+        name = os.path.basename(full_path)
+        match = _ID_NAME.match(name)
+        if match and self._in_shard(full_path, match.group(1)):
+            return match.group(1)
+
+        # Title-named (flat layout) files: read the ID from the sidecar info JSON
+        base = full_path
+        while True:
+            base, ext = os.path.splitext(base)
+            if not ext:
+                break
+            try:
+                with open(base + ".info.json", encoding="utf-8") as f:
+                    return json.load(f).get('id')
+            except (OSError, ValueError, AttributeError):
+                continue
+
+        # yt-dlp's default "Title [ID].ext" names
+        match = _ID_IN_BRACKETS.search(name)
+        return match.group(1) if match else None
+
+    def _in_shard(self, full_path: str, video_id: str) -> bool:
+        """Whether a file sits where the id ("dQ/dQw4w9WgXcQ") or date ("2024/05/...") layout puts it."""
+        parts = os.path.relpath(full_path, self.directory).split(os.sep)[:-1]
+        if parts == [video_id[:2]]:
+            return True
+        # Year and month directories of the date layout
+        return [len(part) for part in parts] == [4, 2] and all(part.isdigit() for part in parts)
+
+    def watch(self, stop: Optional[threading.Event] = None, timeout: float = 1.0) -> None:
+        """
+        Keep the index up to date from inotify events until stop is set.
+
+        Only available on Linux. Runs update() first so that changes made
+        while nothing was watching are picked up.
+
+        Args:
+            stop: Event that ends watching.
+            timeout: Seconds between checks of stop.
+
+        Raises:
+            OSError: If inotify is unavailable.
+        """
+        import select
+
+        watcher = _Inotify()
+        stop = stop or threading.Event()
+        try:
+            watches = {}
+            self.update()
+            for rel_dir, _ in self._walk_directories():
+                watches[watcher.add_watch(os.path.join(self.directory, rel_dir))] = rel_dir
+            db = self._connection()
+            while not stop.is_set():
+                ready, _, _ = select.select([watcher.fd], [], [], timeout)
+                if not ready:
+                    continue
+                with db:
+                    for wd, mask, name in watcher.read_events():
+                        rel_dir = watches.get(wd)
+                        if rel_dir is None or not name:
+                            continue
+                        rel_path = os.path.join(rel_dir, name)
+                        if mask & _Inotify.IN_ISDIR:
+                            if mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO) and name != STAGING_DIRNAME:
+                                watches[watcher.add_watch(os.path.join(self.directory, rel_path))] = rel_path
+                                # Files may have landed before the watch was added
+                                self._scan_directory(db, rel_path, dict.fromkeys(("added", "changed", "removed"), 0))
+                            elif mask & (_Inotify.IN_DELETE | _Inotify.IN_MOVED_FROM):
+                                self._forget_directory(db, rel_path)
+                        else:
+                            self._refresh_file(db, rel_path)
+        finally:
+            watcher.close()
+
+
+def _glob_children(rel_dir: str) -> str:
+    # GLOB is case-sensitive and treats only *?[ as special
+    escaped = re.sub(r"([*?\[])", r"[\1]", rel_dir)
+    return os.path.join(escaped, "*") if rel_dir else "*"
+
+
+class _Inotify:
+    """Minimal inotify(7) binding through ctypes."""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(sys.getfilesystemencoding(), "surrogateescape")
+            offset += length
+            yield wd, mask, name
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update or query the library index of a download directory")
+    parser.add_argument("directory", help="Download directory to index")
+    parser.add_argument("--full", action="store_true", help="Check every file, not only changed directories")
+    parser.add_argument("--no-hash", action="store_true", help="Do not compute SHA-256 of new files")
+    parser.add_argument("--watch", action="store_true", help="Keep the index updated with inotify (Linux)")
+    parser.add_argument("--lookup", metavar="VIDEO_ID", help="Print the files indexed for a video")
+    args = parser.parse_args()
+
+    index = LibraryIndex(args.directory, hash_files=not args.no_hash)
+    if args.lookup:
+        for indexed in index.lookup(args.lookup):
+            print(json.dumps(indexed._asdict()))
+        sys.exit(0)
+    if args.watch:
+        try:
+            index.watch()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    counts = index.update(full=args.full)
+    print(f"Scanned {counts['scanned']} directories: {counts['added']} added, "
+          f"{counts['changed']} changed, {counts['removed']} removed")
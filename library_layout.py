@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+One-time migration of a flat download directory to a sharded layout.
+
+Flat directories name files by title, so the video ID needed for the new
+name comes from each video's .info.json (saved with --write-info-json).
+Every file that shares the base name of an info JSON (the media file,
+thumbnail, subtitles and the info JSON itself) is renamed to the same base
+under the new layout. Videos without an info JSON, and those whose target
+already exists, are left in place and reported.
+
+Usage:
+    python library_layout.py ~/Downloads --layout id --dry-run
+    python library_layout.py ~/Downloads --layout id
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Tuple
+
+import yt_dlp
+
+from engine import OUTPUT_LAYOUTS
+
+INFO_JSON_SUFFIX = ".info.json"
+
+
+def plan_migration(directory: str, layout: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Work out the renames that move a flat directory to a layout.
+
+    Args:
+        directory: Flat download directory.
+        layout: Name of an OUTPUT_LAYOUTS entry.
+
+    Returns:
+        Tuple of ((source, target) path pairs, skipped file names).
+
+    Raises:
+        ValueError: If the layout is unknown.
+    """
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unknown output layout: {layout}")
+
+    names = sorted(entry.name for entry in os.scandir(directory) if entry.is_file())
+    bases = {name[:-len(INFO_JSON_SUFFIX)] for name in names if name.endswith(INFO_JSON_SUFFIX)}
+
+    # Assign each file to the longest base it extends, so "A.B.mp4" belongs
+    # to video "A.B" rather than being taken for a sidecar of video "A"
+    groups: Dict[str, List[str]] = {}
+    skipped = []
+    for name in names:
+        base = name
+        while "." in base:
+            base = base.rsplit(".", 1)[0]
+            if base in bases:
+                groups.setdefault(base, []).append(name)
+                break
+        else:
+            skipped.append(name)
+
+    renames = []
+    with yt_dlp.YoutubeDL({'outtmpl': OUTPUT_LAYOUTS[layout], 'quiet': True}) as ydl:
+        for base, members in sorted(groups.items()):
+            try:
+                with open(os.path.join(directory, base + INFO_JSON_SUFFIX), encoding="utf-8") as f:
+                    info = json.load(f)
+                target_base = os.path.splitext(ydl.prepare_filename(info))[0]
+            except (OSError, ValueError, KeyError):
+                skipped.extend(members)
+                continue
+
+            pairs = [
+                (os.path.join(directory, name), os.path.join(directory, target_base + name[len(base):]))
+                for name in members
+            ]
+            # Never overwrite, and move a video's files together or not at all
+            if any(os.path.exists(target) and source != target for source, target in pairs):
+                skipped.extend(members)
+                continue
+            renames.extend((source, target) for source, target in pairs if source != target)
+    return renames, skipped
+
+
+def migrate(directory: str, layout: str, dry_run: bool = False) -> Tuple[int, List[str]]:
+    """
+    Move a flat download directory to a layout.
+
+    Args:
+        directory: Flat download directory.
+        layout: Name of an OUTPUT_LAYOUTS entry.
+        dry_run: Only print the renames.
+
+    Returns:
+        Tuple of (number of files moved, skipped file names).
+    """
+    renames, skipped = plan_migration(directory, layout)
+    for source, target in renames:
+        print(f"{os.path.relpath(source, directory)} -> {os.path.relpath(target, directory)}")
+        if not dry_run:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Same filesystem, so each file moves atomically
+            os.rename(source, target)
+    return (0 if dry_run else len(renames)), skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move a flat download directory to a sharded layout")
+    parser.add_argument("directory", help="Directory with title-named downloads and their .info.json files")
+    parser.add_argument("--layout", choices=[name for name in OUTPUT_LAYOUTS if name != "flat"], default="id",
+                        help="Target layout (default: id)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the renames without moving anything")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    moved, skipped = migrate(args.directory, args.layout, dry_run=args.dry_run)
+    print(f"Moved {moved} files, left {len(skipped)} in place")
+    for name in skipped:
+        print(f"  skipped: {name}")
+    sys.exit(0)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Live stream recording for YouTube Downloader.
+
+Instead of downloading a live stream into one file that grows for as long as
+the stream runs, the recorder hands the stream URL to ffmpeg's segment muxer,
+which writes fixed-duration MPEG-TS segments. Oldest segments are deleted
+once the retained total exceeds a size cap, and recording can stop after a
+set duration. ffmpeg copies the streams without re-encoding, so memory and
+CPU use per recording stay flat however long it runs.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+from typing import Any, Dict, List, Optional
+
+from engine import open_youtube_dl
+
+# Segment container; MPEG-TS stays playable if a segment is cut off mid-write
+SEGMENT_EXTENSION = "ts"
+
+
+class LiveRecorder:
+    """Records a live stream as rotating, size-capped segments."""
+
+    def __init__(self, url: str, output_directory: str, segment_seconds: int = 300,
+                 max_total_bytes: Optional[int] = None, duration: Optional[float] = None,
+                 format_spec: str = "best", poll_interval: float = 5.0, ffmpeg: str = "ffmpeg"):
+        """
+        Initialize the recorder.
+
+        Args:
+            url: URL of the live stream.
+            output_directory: Directory the segments are written to.
+            segment_seconds: Duration of each segment.
+            max_total_bytes: Delete the oldest segments once the retained segments
+                             exceed this size. None keeps every segment.
+            duration: Stop recording after this many seconds. None records
+                      until the stream ends or stop() is called.
+            format_spec: yt-dlp format selector for the recorded stream.
+            poll_interval: Seconds between checks of the size cap.
+            ffmpeg: ffmpeg executable name or path.
+        """
+        self.url = url
+        self.output_directory = output_directory
+        self.segment_seconds = segment_seconds
+        self.max_total_bytes = max_total_bytes
+        self.duration = duration
+        self.format_spec = format_spec
+        self.poll_interval = poll_interval
+        self.ffmpeg = ffmpeg
+        self.prefix = ""
+
+        self._process: Optional[subprocess.Popen] = None
+        self._stopped = threading.Event()
+
+        os.makedirs(self.output_directory, exist_ok=True)
+
+    def resolve(self) -> Dict[str, Any]:
+        """
+        Extract the live stream without downloading it.
+
+        Returns:
+            Info dictionary of the selected format.
+
+        Raises:
+            ValueError: If the URL is not a live stream.
+        """
+        ydl_opts = {
+            'format': self.format_spec,
+            'quiet': True,
+            'no_warnings': True,
+        }
+        with open_youtube_dl(ydl_opts) as ydl:
+            info = ydl.extract_info(self.url, download=False)
+        if not info.get('is_live'):
+            raise ValueError(f"Not a live stream: {self.url}")
+        return info
+
+    def build_command(self, info: Dict[str, Any]) -> List[str]:
+        """
+        Build the ffmpeg command that records the stream.
+
+        Args:
+            info: Info dictionary returned by resolve().
+
+        Returns:
+            ffmpeg argument list.
+        """
+        command = [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin"]
+
+        headers = info.get('http_headers') or {}
+        if headers:
+            command += ["-headers", "".join(f"{key}: {value}\r\n" for key, value in headers.items())]
+        if info.get('protocol', '').startswith("m3u8"):
+            # Start at the newest playlist segment, i.e. the live edge
+            command += ["-live_start_index", "-1"]
+
+        command += ["-i", info['url']]
+        if self.duration:
+            command += ["-t", str(self.duration)]
+
+        command += [
+            "-map", "0", "-c", "copy",
+            "-f", "segment",
+            "-segment_time", str(self.segment_seconds),
+            "-segment_format", "mpegts",
+            "-reset_timestamps", "1",
+            "-strftime", "1",
+            os.path.join(self.output_directory, f"{self.prefix}%Y%m%d-%H%M%S.{SEGMENT_EXTENSION}"),
+        ]
+        return command
+
+    def record(self, info: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Record until the stream ends, the duration is reached, or stop() is called.
+
+        Args:
+            info: Info dictionary from resolve(). Resolved here when not given.
+
+        Returns:
+            Paths of the retained segments, oldest first.
+
+        Raises:
+            RuntimeError: If ffmpeg is missing or exits with an error.
+        """
+        if shutil.which(self.ffmpeg) is None:
+            raise RuntimeError("ffmpeg is required to record live streams")
+        if info is None:
+            info = self.resolve()
+        self.prefix = f"{info.get('id', 'live')}-"
+
+        self._stopped.clear()
+        self._process = subprocess.Popen(self.build_command(info), stdin=subprocess.DEVNULL)
+        print(f"Recording {info.get('title', self.url)} to {self.output_directory}", flush=True)
+        try:
+            while self._process.poll() is None:
+                self.prune()
+                self._stopped.wait(self.poll_interval)
+                if self._stopped.is_set():
+                    self._process.terminate()
+                    self._process.wait()
+        except KeyboardInterrupt:
+            self._stopped.set()
+            self._process.terminate()
+            self._process.wait()
+            raise
+        finally:
+            self.prune()
+
+        returncode = self._process.returncode
+        if returncode != 0 and not self._stopped.is_set():
+            raise RuntimeError(f"ffmpeg exited with status {returncode}")
+        return self.segments()
+
+    def stop(self) -> None:
+        """Stop a running recording. The segment being written is kept."""
+        self._stopped.set()
+
+    def segments(self) -> List[str]:
+        """
+        List the recorded segments.
+
+        Returns:
+            Segment paths, oldest first.
+        """
+        suffix = f".{SEGMENT_EXTENSION}"
+        # Timestamped names sort chronologically
+        names = sorted(
+            name for name in os.listdir(self.output_directory)
+            if name.startswith(self.prefix) and name.endswith(suffix)
+        )
+        return [os.path.join(self.output_directory, name) for name in names]
+
+    def prune(self) -> List[str]:
+        """
+        Delete the oldest segments while the total exceeds max_total_bytes.
+
+        The newest segment is never deleted, since ffmpeg may still be writing it.
+
+        Returns:
+            Paths of the deleted segments.
+        """
+        if self.max_total_bytes is None:
+            return []
+
+        segments = self.segments()
+        sizes = {path: os.path.getsize(path) for path in segments}
+        total = sum(sizes.values())
+        removed = []
+        for path in segments[:-1]:
+            if total <= self.max_total_bytes:
+                break
+            os.remove(path)
+            total -= sizes[path]
+            removed.append(path)
+        return removed
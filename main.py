@@ -5,7 +5,9 @@ YouTube Downloader Package Setup and Main Entry Point.
 
 import os
 import sys
-from youtube_downloader_bot import YouTubeDownloaderBot
+
+# Arguments that must run in this process rather than in a warm server
+LOCAL_ONLY_ARGS = {"-g", "--gui", "--server", "--no-server"}
 
 def check_dependencies():
     """Check if required dependencies are installed."""
@@ -48,11 +50,94 @@ def cli_mode(args=None):
     import argparse
     
     parser = argparse.ArgumentParser(description="YouTube Downloader")
-    parser.add_argument("url", nargs="?", help="YouTube video URL to download")
+    parser.add_argument("url", nargs="?", help="YouTube video URL to download ('-' to read URLs from stdin)")
+    parser.add_argument("-a", "--batch-file", help="File containing URLs to download, one per line ('-' for stdin)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Number of concurrent downloads in batch mode")
     parser.add_argument("-d", "--directory", help="Directory to save the downloaded file")
     parser.add_argument("-f", "--format", choices=["MP4", "MP3"], default="MP4",
                         help="Download format (MP4 or MP3)")
     parser.add_argument("-q", "--quality", help="Video quality (highest, 1080p, 720p, 480p, lowest) or audio quality (320, 192, 128, 64)")
+    parser.add_argument("--audio-codec", choices=["mp3", "m4a", "opus", "native"], default="mp3",
+                        help="Audio codec for MP3 downloads; m4a, opus and native copy the best audio "
+                             "stream without re-encoding when possible (default: mp3, always transcoded)")
+    parser.add_argument("--max-size", help="Keep each download under this size (e.g. 25M): pick the best formats "
+                                           "whose estimated size fits, then a lower resolution, then audio only, "
+                                           "and re-encode only if nothing fits")
+    parser.add_argument("--start", help="Download only from this time on (seconds or [HH:]MM:SS)")
+    parser.add_argument("--end", help="Download only up to this time (seconds or [HH:]MM:SS)")
+    parser.add_argument("--keyframe-cuts", action="store_false", dest="precise_cuts",
+                        help="With --start/--end, copy streams and cut at the nearest keyframes "
+                             "instead of re-encoding for exact cuts")
+    parser.add_argument("--record-live", action="store_true",
+                        help="Record a live stream from the live edge as rotating segments")
+    parser.add_argument("--segment-time", type=int, default=300,
+                        help="With --record-live, seconds per segment (default: 300)")
+    parser.add_argument("--max-total-size", help="With --record-live, delete the oldest segments "
+                                                 "once they exceed this size (e.g. 20G)")
+    parser.add_argument("--duration", help="With --record-live, stop after this long (seconds or [HH:]MM:SS)")
+    parser.add_argument("-m", "--metadata-only", action="store_true",
+                        help="Print video metadata as JSON lines instead of downloading")
+    parser.add_argument("-o", "--output", help="File to write metadata JSON lines to (default: stdout)")
+    parser.add_argument("--write-thumbnail", action="store_true", help="Also save the video thumbnail")
+    parser.add_argument("--write-subs", action="store_true", help="Also save subtitles")
+    parser.add_argument("--sub-langs", default="en", help="Comma-separated subtitle languages (default: en)")
+    parser.add_argument("--write-info-json", action="store_true", help="Also save video metadata as .info.json")
+    parser.add_argument("--atomic-writes", action="store_true",
+                        help="Stage downloads in a temporary directory and move finished files into place")
+    parser.add_argument("--layout", choices=["flat", "id", "date"], default="flat",
+                        help="Output layout: title-named files in one directory (flat), or ID-named files "
+                             "sharded by ID prefix (id) or by upload year/month (date)")
+    parser.add_argument("--cache-dir", help="yt-dlp cache directory for player and signature data; "
+                                            "point concurrent workers at the same one to share it")
+    parser.add_argument("--index", action="store_true",
+                        help="Record finished downloads in the library index of the save directory "
+                             "(see library_index.py)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Treat the URLs as playlists or channels and download only the entries that are "
+                             "new since the last sync (implies --index; see playlist_sync.py)")
+    parser.add_argument("--sync-state", help="With --sync, state file recording the last seen entry of each "
+                                             "listing (default: .ytd-sync.json in the save directory)")
+    parser.add_argument("--sync-full", action="store_true",
+                        help="With --sync, walk whole listings instead of stopping at the last seen entry, "
+                             "for playlists that are not newest-first")
+    parser.add_argument("--upload", metavar="S3_URL",
+                        help="Upload finished downloads to s3://bucket/prefix (requires boto3)")
+    parser.add_argument("--s3-endpoint", help="Endpoint URL of an S3-compatible store for --upload")
+    parser.add_argument("--delete-after-upload", action="store_true",
+                        help="With --upload, delete each local file once it is uploaded")
+    parser.add_argument("--min-free", help="In batch mode, defer downloads that would leave less than this much "
+                                           "free space in the save directory (e.g. 500M)")
+    parser.add_argument("--schedule", choices=["fifo", "sjf", "aging"], default="fifo",
+                        help="Batch scheduling policy: input order, shortest job first, "
+                             "or shortest first with aging (default: fifo)")
+    parser.add_argument("--lookahead", type=int,
+                        help="Number of resolved jobs the scheduler chooses from (default: twice --jobs)")
+    parser.add_argument("--resolvers", type=int, default=4,
+                        help="In batch mode, number of URLs resolved concurrently ahead of the "
+                             "downloads (default: 4, 0 to resolve each URL when it is downloaded)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="In batch mode, tune the number of concurrent downloads (up to --jobs) and "
+                             "fragments per download (up to --max-fragments) from observed throughput and errors")
+    parser.add_argument("--max-fragments", type=int, default=4,
+                        help="With --adaptive, most fragments downloaded in parallel per job (default: 4)")
+    parser.add_argument("--processes", action="store_true",
+                        help="In batch mode, run each download in a pool of --jobs worker processes")
+    parser.add_argument("--recycle-after", type=int, default=100,
+                        help="With --processes, replace a worker after this many jobs (default: 100)")
+    parser.add_argument("--max-worker-memory",
+                        help="With --processes, replace a worker whose memory exceeds this size (e.g. 1G)")
+    parser.add_argument("--queue", metavar="DB",
+                        help="Shared job queue database: with URLs, add them to the queue; "
+                             "without, download jobs from it with --jobs workers")
+    parser.add_argument("--server", action="store_true",
+                        help="Start a warm server on a Unix socket; later runs of this command forward "
+                             "their arguments to it and skip the import and extractor start-up cost")
+    parser.add_argument("--server-socket", help="Socket for --server (default: $YTD_SERVER_SOCKET or a "
+                                                "per-user socket in $XDG_RUNTIME_DIR or a private "
+                                                "directory in /tmp)")
+    parser.add_argument("--server-idle-timeout", type=float, default=1800,
+                        help="Seconds without requests after which --server exits (default: 1800)")
+    parser.add_argument("--no-server", action="store_true", help="Do not forward to a running warm server")
     parser.add_argument("-g", "--gui", action="store_true", help="Start the graphical user interface")
     parser.add_argument("-v", "--version", action="store_true", help="Show version information")
     
@@ -72,6 +157,208 @@ def cli_mode(args=None):
         gui_mode()
         return
     
+    if args.server:
+        from warm_server import serve
+        
+        try:
+            serve(args.server_socket, idle_timeout=args.server_idle_timeout)
+        except RuntimeError as e:
+            parser.error(str(e))
+        return
+    
+    # Imported here so that forwarding to a warm server does not pay for yt-dlp
+    from youtube_downloader_bot import DEFAULT_SAVE_DIRECTORY, YouTubeDownloaderBot
+    
+    if args.batch_file and args.batch_file != "-" and not os.path.isfile(args.batch_file):
+        parser.error(f"batch file not found: {args.batch_file}")
+    
+    # Options shared by every bot created below
+    bot_options = {
+        "save_directory": args.directory or DEFAULT_SAVE_DIRECTORY,
+        "format_type": args.format,
+        "write_thumbnail": args.write_thumbnail,
+        "write_subtitles": args.write_subs,
+        "write_info_json": args.write_info_json,
+        "subtitle_langs": [lang.strip() for lang in args.sub_langs.split(",") if lang.strip()],
+        "atomic_writes": args.atomic_writes,
+        "audio_codec": args.audio_codec,
+        "precise_cuts": args.precise_cuts,
+        "cache_directory": args.cache_dir,
+        "output_layout": args.layout,
+        # Sync tells new entries from the library index, so it has to stay current
+        "index_library": args.index or args.sync,
+    }
+    if args.upload:
+        from object_store import ObjectStore
+        
+        try:
+            bot_options["object_store"] = ObjectStore.from_url(args.upload, endpoint_url=args.s3_endpoint,
+                                                               keep_local=not args.delete_after_upload)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.max_size:
+        from yt_dlp.utils import parse_bytes
+        
+        bot_options["max_filesize"] = parse_bytes(args.max_size)
+        if not bot_options["max_filesize"]:
+            parser.error(f"invalid size for --max-size: {args.max_size}")
+    if args.format == "MP3" and args.quality and args.quality.isdigit():
+        bot_options["audio_quality"] = args.quality
+    
+    # Batch mode: stream URLs from a file or stdin into the worker pool
+    batch_source = args.batch_file or (args.url if args.url == "-" else None)
+    
+    if (args.start or args.end) and (batch_source or args.metadata_only or args.sync):
+        parser.error("--start and --end apply to a single URL download")
+    if args.sync and (args.metadata_only or args.queue or args.processes or args.record_live):
+        parser.error("--sync cannot be combined with --metadata-only, --queue, --processes or --record-live")
+    if args.sync and not (batch_source or args.url):
+        parser.error("a playlist or channel URL or --batch-file is required with --sync")
+    
+    # Live recording: segment the stream with ffmpeg instead of one unbounded file
+    if args.record_live:
+        from yt_dlp.utils import DownloadError, parse_bytes, parse_duration
+        from live_recorder import LiveRecorder
+        
+        if not args.url or batch_source:
+            parser.error("--record-live needs a single live stream URL")
+        max_total_bytes = parse_bytes(args.max_total_size) if args.max_total_size else None
+        if args.max_total_size and max_total_bytes is None:
+            parser.error(f"invalid size for --max-total-size: {args.max_total_size}")
+        duration = parse_duration(args.duration) if args.duration else None
+        if args.duration and not duration:
+            parser.error(f"invalid duration: {args.duration}")
+        
+        recorder = LiveRecorder(args.url, bot_options["save_directory"],
+                                segment_seconds=args.segment_time,
+                                max_total_bytes=max_total_bytes, duration=duration)
+        try:
+            segments = recorder.record()
+        except (RuntimeError, ValueError, DownloadError) as e:
+            print(f"Recording failed: {e}")
+            sys.exit(1)
+        print(f"Recording finished: {len(segments)} segments kept")
+        sys.exit(0)
+    
+    # Metadata-only mode: resolve without downloading and emit JSON lines
+    if args.metadata_only:
+        from batch import iter_urls, stream_metadata
+        
+        if batch_source:
+            urls = iter_urls(batch_source)
+        elif args.url:
+            urls = [args.url]
+        else:
+            parser.error("a URL or --batch-file is required with --metadata-only")
+        
+        downloader = YouTubeDownloaderBot(**bot_options)
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            resolved, failed = stream_metadata(urls, downloader, out,
+                                               # Extraction is latency-bound, so allow more workers
+                                               workers=max(args.jobs, 8))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        sys.exit(0 if failed == 0 else 1)
+    
+    # Shared queue: several nodes take jobs from one database on shared storage
+    if args.queue:
+        import threading
+        from job_queue import JobQueue, run_worker
+        
+        job_queue = JobQueue(args.queue)
+        if batch_source or args.url:
+            from batch import iter_urls
+            
+            added = job_queue.add(iter_urls(batch_source) if batch_source else [args.url])
+            print(f"Added {added} jobs to {args.queue}")
+            sys.exit(0)
+        
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=run_worker, args=(job_queue, YouTubeDownloaderBot(**bot_options)),
+                             kwargs={"stop": stop}, daemon=True)
+            for _ in range(args.jobs)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            # Leases of interrupted jobs expire and other nodes pick them up
+            stop.set()
+            raise
+        counts = job_queue.counts()
+        print(f"Queue empty: {counts['done']} done, {counts['failed']} failed, {counts['leased']} in progress elsewhere")
+        sys.exit(0)
+    
+    if batch_source and args.processes:
+        from yt_dlp.utils import parse_bytes
+        from batch import iter_urls
+        from process_pool import ProcessWorkerPool, ProgressSummary
+        
+        if args.min_free or args.adaptive or args.schedule != "fifo":
+            parser.error("--processes cannot be combined with --min-free, --adaptive or --schedule")
+        max_memory = parse_bytes(args.max_worker_memory) if args.max_worker_memory else None
+        if args.max_worker_memory and max_memory is None:
+            parser.error(f"invalid size for --max-worker-memory: {args.max_worker_memory}")
+        summary = ProgressSummary()
+        pool = ProcessWorkerPool(bot_options, workers=args.jobs,
+                                 max_jobs_per_worker=args.recycle_after, max_memory_bytes=max_memory,
+                                 on_result=summary.on_result, on_progress=summary.on_progress)
+        succeeded, failed = pool.run(iter_urls(batch_source))
+        print(f"Batch finished: {succeeded} succeeded, {failed} failed")
+        sys.exit(0 if failed == 0 else 1)
+    
+    if batch_source or args.sync:
+        from batch import BatchDownloader, DiskSpaceGuard, iter_urls
+        
+        disk_guard = None
+        if args.min_free:
+            from yt_dlp.utils import parse_bytes
+            
+            min_free = parse_bytes(args.min_free)
+            if min_free is None:
+                parser.error(f"invalid size for --min-free: {args.min_free}")
+            disk_guard = DiskSpaceGuard(bot_options["save_directory"], min_free)
+        
+        controller = None
+        if args.adaptive:
+            from concurrency import AdaptiveConcurrency
+            
+            controller = AdaptiveConcurrency(max_jobs=max(1, args.jobs), max_fragments=max(1, args.max_fragments))
+        
+        batch = BatchDownloader(
+            lambda: YouTubeDownloaderBot(**bot_options),
+            workers=args.jobs,
+            queue_size=args.lookahead,
+            disk_guard=disk_guard,
+            policy=args.schedule,
+            resolvers=args.resolvers,
+            controller=controller,
+        )
+        if args.sync:
+            from playlist_sync import PlaylistSync, SyncState
+            
+            try:
+                state = SyncState(args.sync_state) if args.sync_state else None
+                sync = PlaylistSync(YouTubeDownloaderBot(**bot_options), state, full=args.sync_full)
+            except ValueError as e:
+                parser.error(str(e))
+            succeeded, failed = sync.sync(iter_urls(batch_source) if batch_source else [args.url], batch)
+            print(f"Sync finished: {succeeded} new downloads succeeded, {failed} failed")
+        else:
+            succeeded, failed = batch.run(iter_urls(batch_source))
+            print(f"Batch finished: {succeeded} succeeded, {failed} failed")
+        if controller is not None:
+            metrics = controller.metrics()
+            print(f"Concurrency settled at {metrics['jobs']} jobs x {metrics['fragments']} fragments "
+                  f"(decisions: {metrics['decisions']})")
+        sys.exit(0 if failed == 0 else 1)
+    
     # Check if URL is provided for CLI mode
     if not args.url:
         parser.print_help()
@@ -80,23 +367,56 @@ def cli_mode(args=None):
         sys.exit(1)
     
     # Create downloader and download the video
-    downloader = YouTubeDownloaderBot(
-        save_directory=args.directory,
-        format_type=args.format
-    )
+    downloader = YouTubeDownloaderBot(**bot_options)
     
     print(f"Downloading {args.url} as {args.format}...")
-    success, result = downloader.download(args.url)
+    success, result = downloader.download(args.url, start_time=args.start, end_time=args.end)
     
     # Exit with appropriate status code
     sys.exit(0 if success else 1)
 
+def forward_to_server(argv):
+    """
+    Run a command line in a warm server started with --server, if one is listening.
+    
+    Args:
+        argv: Command-line arguments, without the program name.
+        
+    Returns:
+        Exit status of the command, or None if it has to run in this process.
+    """
+    if os.name != "posix" or LOCAL_ONLY_ARGS.intersection(argv):
+        return None
+    socket_path = None
+    for i, arg in enumerate(argv):
+        if arg == "--server-socket" and i + 1 < len(argv):
+            socket_path = argv[i + 1]
+        elif arg.startswith("--server-socket="):
+            socket_path = arg.split("=", 1)[1]
+    
+    from warm_server import run_client
+    return run_client(argv, socket_path)
+
 def main():
     """Main entry point."""
+    # A warm server has everything imported already, so try it before anything else
+    code = forward_to_server(sys.argv[1:]) if len(sys.argv) > 1 else None
+    if code is not None:
+        sys.exit(code)
+    
     # Check dependencies
     if not check_dependencies():
         sys.exit(1)
     
+    # Log through a background thread so downloads never wait on the log file
+    from config import load_config, setup_logging
+    
+    config = load_config()
+    if len(sys.argv) > 1:
+        # The command line already prints progress and results; only errors go to the console log
+        config["CONSOLE_OUTPUT"] = False
+    setup_logging(config)
+    
     # Check for command-line arguments
     if len(sys.argv) > 1:
         cli_mode()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Upload downloads to S3-compatible object storage.
+
+Files are sent as multipart uploads: parts are buffered in memory up to a
+fixed number at a time and uploaded on a small thread pool. While yt-dlp
+writes a single-stream download, ObjectStoreSink follows the growing file
+and uploads each part as soon as it is complete, so the upload finishes
+shortly after the download instead of starting when it ends. Downloads
+that are merged or converted afterwards are uploaded from the final file.
+
+boto3 is only needed to create a real client; anything with the same four
+multipart methods works, e.g. a stand-in in tests.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+# S3 rejects parts smaller than 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+class MultipartUpload:
+    """A multipart upload fed by write(), with bounded buffering and parallel parts."""
+
+    def __init__(self, client: Any, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE,
+                 workers: int = 4, max_buffered_parts: Optional[int] = None):
+        """
+        Start the upload.
+
+        Args:
+            client: S3 client (boto3 or compatible).
+            bucket: Target bucket.
+            key: Target object key.
+            part_size: Bytes per part, at least MIN_PART_SIZE.
+            workers: Parts uploaded concurrently.
+            max_buffered_parts: Parts held in memory at once, including those
+                                being uploaded. write() blocks while the limit
+                                is reached. Defaults to twice workers.
+
+        Raises:
+            ValueError: If part_size is below MIN_PART_SIZE.
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.bytes_written = 0
+
+        self._buffer = bytearray()
+        self._parts: Dict[int, str] = {}
+        self._futures = []
+        self._slots = threading.Semaphore(max_buffered_parts or workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+
+    def write(self, data: bytes) -> None:
+        """
+        Append data, uploading every full part.
+
+        Args:
+            data: Bytes to append.
+
+        Raises:
+            Exception: The error of a part upload that already failed.
+        """
+        self._raise_failure()
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+
+    def complete(self) -> None:
+        """
+        Upload the remaining bytes and complete the upload.
+
+        Raises:
+            Exception: If any part failed; the upload is aborted first.
+        """
+        try:
+            # An upload needs at least one part, even an empty one
+            if self._buffer or not self._futures:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            for future in self._futures:
+                future.result()
+            parts = [{'ETag': etag, 'PartNumber': number} for number, etag in sorted(self._parts.items())]
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._closed = True
+            self._executor.shutdown(wait=False)
+
+    def abort(self) -> None:
+        """Abandon the upload so the store discards its parts."""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"Warning: could not abort upload of {self.key}: {str(e)}", file=sys.stderr)
+
+    def _submit(self, part: bytes) -> None:
+        # Blocks while the buffered parts are at the limit, bounding memory use
+        self._slots.acquire()
+        self._raise_failure()
+        number = len(self._futures) + 1
+        self._futures.append(self._executor.submit(self._upload_part, number, part))
+
+    def _upload_part(self, number: int, part: bytes) -> None:
+        try:
+            response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                               PartNumber=number, Body=part)
+            self._parts[number] = response['ETag']
+        except BaseException as e:
+            self._error = e
+            raise
+        finally:
+            self._slots.release()
+
+    def _raise_failure(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+
+class ObjectStore:
+    """Where uploads go: a bucket, a key prefix and how to reach the store."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 part_size: int = DEFAULT_PART_SIZE, workers: int = 4, keep_local: bool = True,
+                 client: Any = None):
+        """
+        Describe the target.
+
+        Args:
+            bucket: Target bucket.
+            prefix: Key prefix, e.g. "videos/".
+            endpoint_url: Endpoint of an S3-compatible store (MinIO, Ceph, ...).
+                          None uses AWS.
+            part_size: Bytes per part.
+            workers: Parts uploaded concurrently per file.
+            keep_local: Keep the local file after it is uploaded.
+            client: Client to use instead of creating a boto3 one.
+        """
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.part_size = part_size
+        self.workers = workers
+        self.keep_local = keep_local
+        self._client = client
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "ObjectStore":
+        """
+        Create a target from an "s3://bucket/prefix" URL.
+
+        Args:
+            url: Target URL.
+            **kwargs: Further ObjectStore arguments.
+
+        Returns:
+            The target.
+
+        Raises:
+            ValueError: If the URL is not an s3:// URL with a bucket.
+        """
+        if not url.startswith("s3://") or not url[5:].split("/", 1)[0]:
+            raise ValueError(f"Not an s3://bucket/prefix URL: {url}")
+        bucket, _, prefix = url[5:].partition("/")
+        return cls(bucket, prefix, **kwargs)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Clients are not picklable; worker processes create their own
+        state = self.__dict__.copy()
+        state['_client'] = None
+        return state
+
+    @property
+    def client(self) -> Any:
+        """The S3 client, created with boto3 on first use."""
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("boto3 is required for uploads to object storage: pip install boto3") from None
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def key_for(self, path: str, root: str) -> str:
+        """
+        Object key of a local file.
+
+        Args:
+            path: Local file path.
+            root: Directory the key is relative to.
+
+        Returns:
+            prefix followed by the path relative to root, with "/" separators.
+        """
+        relative = os.path.relpath(path, root).replace(os.sep, "/")
+        return self.prefix.rstrip("/") + "/" + relative if self.prefix.strip("/") else relative
+
+    def url_for(self, key: str) -> str:
+        """s3:// URL of an object key."""
+        return f"s3://{self.bucket}/{key}"
+
+    def start_upload(self, key: str) -> MultipartUpload:
+        """
+        Start a multipart upload with this target's settings.
+
+        Args:
+            key: Object key.
+
+        Returns:
+            The started upload.
+        """
+        return MultipartUpload(self.client, self.bucket, key, part_size=self.part_size, workers=self.workers)
+
+    def upload_file(self, path: str, key: str) -> str:
+        """
+        Upload a finished file.
+
+        Args:
+            path: Local file.
+            key: Object key.
+
+        Returns:
+            s3:// URL of the object.
+        """
+        upload = self.start_upload(key)
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.part_size), b""):
+                    upload.write(chunk)
+        except BaseException:
+            upload.abort()
+            raise
+        upload.complete()
+        return self.url_for(key)
+
+
+class _FollowedFile:
+    """A file being written by yt-dlp, streamed into an upload by a thread."""
+
+    def __init__(self, store: ObjectStore, tmpfilename: str, filename: str, key: str, poll_interval: float):
+        # Opened before yt-dlp renames the file, and kept open so the rename does not matter
+        self.file = open(tmpfilename, "rb")
+        self.store = store
+        self.filename = filename
+        self.key = key
+        self.upload: Optional[MultipartUpload] = None
+        self.finished = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.poll_interval = poll_interval
+        self.thread = threading.Thread(target=self._follow, daemon=True)
+        self.thread.start()
+
+    def _follow(self) -> None:
+        try:
+            # Started here so the download thread never waits on the store
+            self.upload = self.store.start_upload(self.key)
+            while True:
+                # Check before reading, so the read after "finished" gets the last bytes
+                done = self.finished.is_set()
+                chunk = self.file.read(self.upload.part_size)
+                if chunk:
+                    self.upload.write(chunk)
+                elif done:
+                    return
+                else:
+                    self.finished.wait(self.poll_interval)
+                if os.fstat(self.file.fileno()).st_size < self.upload.bytes_written:
+                    raise IOError("File was truncated while it was uploaded")
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.file.close()
+
+
+class ObjectStoreSink:
+    """
+    Progress sink that streams downloads into an object store while they are written.
+
+    Pass it to run_download() with the other sinks, then call finish() with
+    the final path. Streaming needs POSIX rename semantics (the file stays
+    readable after yt-dlp renames it), so on Windows every file is uploaded
+    by finish() instead.
+    """
+
+    def __init__(self, store: ObjectStore, root: str, staging_directory: Optional[str] = None,
+                 stream: bool = True, poll_interval: float = 0.2):
+        """
+        Initialize the sink.
+
+        Args:
+            store: Upload target.
+            root: Save directory; object keys are relative to it.
+            staging_directory: Directory files are downloaded into before they
+                               are moved to root, if any.
+            stream: Follow files while they are downloaded. Disable when the
+                    download will be postprocessed into a different file.
+            poll_interval: Seconds the follower waits for more data.
+        """
+        self.store = store
+        self.roots = [directory for directory in (staging_directory, root) if directory]
+        self.stream = stream and os.name == "posix"
+        self.poll_interval = poll_interval
+        self._followed: Dict[str, Optional[_FollowedFile]] = {}
+
+    def key_for(self, path: str) -> str:
+        """
+        Object key of a file in the save or staging directory.
+
+        Args:
+            path: Local file path.
+
+        Returns:
+            The key, the same for a file in staging and after it is moved.
+        """
+        for root in self.roots:
+            if not os.path.relpath(path, root).startswith(os.pardir):
+                return self.store.key_for(path, root)
+        return self.store.key_for(path, self.roots[-1])
+
+    def __call__(self, d: Dict[str, Any]) -> None:
+        """Start following a file on its first progress event, stop at the finished event."""
+        if not self.stream:
+            return
+        filename = d.get('filename')
+        if d['status'] == 'downloading':
+            if filename in self._followed or not d.get('tmpfilename'):
+                return
+            # Formats that are merged afterwards are intermediate files
+            if (d.get('info_dict') or {}).get('requested_formats'):
+                self._followed[filename] = None
+                return
+            try:
+                self._followed[filename] = _FollowedFile(
+                    self.store, d['tmpfilename'], filename, self.key_for(filename), self.poll_interval)
+            except OSError as e:
+                # Uploaded from the final file by finish() instead
+                print(f"Warning: cannot stream {os.path.basename(filename)}: {str(e)}", file=sys.stderr)
+                self._followed[filename] = None
+        elif d['status'] in ('finished', 'error'):
+            followed = self._followed.get(filename)
+            if followed is not None:
+                followed.finished.set()
+
+    def finish(self, path: Optional[str]) -> Optional[str]:
+        """
+        Complete the upload of a finished download.
+
+        A streamed upload is completed only if it holds exactly the final
+        file; otherwise it is aborted and the final file is uploaded.
+
+        Args:
+            path: Final path of the download, or None if it failed, which
+                  aborts any streamed upload.
+
+        Returns:
+            s3:// URL of the uploaded object, or None if path is None.
+        """
+        url = None
+        try:
+            for followed in self._followed.values():
+                if followed is None:
+                    continue
+                followed.finished.set()
+                followed.thread.join()
+                if followed.upload is None:
+                    continue
+                usable = (path is not None and followed.error is None
+                          and followed.key == self.key_for(path)
+                          and os.path.getsize(path) == followed.upload.bytes_written)
+                if usable:
+                    followed.upload.complete()
+                    url = self.store.url_for(followed.key)
+            if path is not None and url is None:
+                url = self.store.upload_file(path, self.key_for(path))
+        finally:
+            # Abandon every streamed upload that was not completed
+            for followed in self._followed.values():
+                if followed is not None and followed.upload is not None:
+                    followed.upload.abort()
+            self._followed.clear()
+        return url
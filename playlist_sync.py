@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Incremental sync of playlists and channels.
+
+A full walk of a channel with thousands of videos costs one request per
+page of entries on every run, even when nothing was uploaded. Sync walks
+each listing newest-first with yt-dlp's flat, lazy iteration, so pages
+are only fetched as entries are consumed, and stops at the first entry
+it already knows. Only the entries above that point are downloaded.
+
+What is known is kept per listing in a JSON state file (SYNC_FILENAME in
+the save directory): the newest entry up to which everything was
+archived ("last seen") and the IDs just below it, in case that entry
+disappears from the listing. A listing without state stops at the first
+entry already in the library index instead. Entries that fail to
+download keep the mark below them, so they are retried on the next run.
+
+Channel tabs and uploads playlists list their newest videos first.
+Playlists that get new entries appended at the end need a full walk
+(full=True), which still downloads only what is not archived.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from engine import INVALID_URL_MESSAGE, is_valid_youtube_url, open_youtube_dl
+from youtube_downloader_bot import YouTubeDownloaderBot
+
+logger = logging.getLogger(__name__)
+
+# State file, kept in the save directory next to the library index
+SYNC_FILENAME = ".ytd-sync.json"
+
+# IDs below the last seen entry remembered per listing
+KNOWN_IDS = 50
+
+
+class Listing(NamedTuple):
+    """Result of walking one playlist or channel tab down to what is already known."""
+    key: str
+    title: Optional[str]
+    walked: List[str]
+    new: List[Dict[str, Any]]
+
+
+class SyncState:
+    """Last seen entries per listing, persisted as a JSON file."""
+
+    def __init__(self, path: str):
+        """
+        Load the state file, starting empty if it does not exist yet.
+
+        Args:
+            path: State file.
+
+        Raises:
+            ValueError: If the file exists but is not a sync state file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.listings: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        if not isinstance(data, dict) or not isinstance(data.get('listings'), dict):
+            raise ValueError(f"Not a sync state file: {path}")
+        self.listings = data['listings']
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of a listing.
+
+        Args:
+            key: URL of the listing.
+
+        Returns:
+            Dictionary with last_seen, known and synced_at, or None if the
+            listing was never synced.
+        """
+        with self._lock:
+            return self.listings.get(key)
+
+    def update(self, listing: Listing, failed: Iterable[str] = ()) -> Optional[str]:
+        """
+        Move the mark of a listing past the entries that are now archived.
+
+        The new mark is the newest walked entry with no failed entry below
+        it, so failures are walked over again on the next run.
+
+        Args:
+            listing: The walked listing.
+            failed: IDs of new entries that failed to download.
+
+        Returns:
+            The last seen ID now recorded, or None if there is none yet.
+        """
+        failed = set(failed)
+        walked = listing.walked
+        oldest_failure = max((i for i, video_id in enumerate(walked) if video_id in failed), default=-1)
+        complete = walked[oldest_failure + 1:]
+        with self._lock:
+            previous = self.listings.get(listing.key) or {}
+            if not complete:
+                return previous.get('last_seen')
+            # A walk ends at known entries or at the end of the listing, so all below is complete
+            known = complete + previous.get('known', [])
+            self.listings[listing.key] = {
+                'title': listing.title,
+                'last_seen': complete[0],
+                'known': list(dict.fromkeys(known))[:KNOWN_IDS],
+                'synced_at': time.time(),
+            }
+            return complete[0]
+
+    def save(self) -> None:
+        """Write the state file, replacing the old one only once complete."""
+        with self._lock:
+            data = json.dumps({'listings': self.listings}, ensure_ascii=False, indent=1)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+
+
+class PlaylistSync:
+    """Download only what is new in playlists and channels since the last run."""
+
+    def __init__(self, bot: YouTubeDownloaderBot, state: Optional[SyncState] = None, full: bool = False):
+        """
+        Initialize the sync.
+
+        Args:
+            bot: Bot used for the listings; its save directory and library
+                 index tell which videos are already archived.
+            state: Sync state. Defaults to SYNC_FILENAME in the bot's save directory.
+            full: Walk every listing to the end instead of stopping at the
+                  last seen entry, for listings that are not newest-first.
+        """
+        self.bot = bot
+        self.state = state or SyncState(os.path.join(bot.save_directory, SYNC_FILENAME))
+        self.full = full
+
+    def scan(self, url: str) -> List[Listing]:
+        """
+        Walk a playlist or channel down to the entries already known.
+
+        A channel URL that lists tabs (Videos, Shorts, Live) is walked one
+        tab at a time, since every tab is newest-first on its own.
+
+        Args:
+            url: YouTube playlist or channel URL.
+
+        Returns:
+            One Listing per walked playlist or tab.
+
+        Raises:
+            ValueError: If the URL is empty or not a YouTube URL.
+        """
+        if not url:
+            raise ValueError("URL cannot be empty")
+        if not is_valid_youtube_url(url):
+            raise ValueError(INVALID_URL_MESSAGE)
+
+        ydl_opts = {
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+            'skip_download': True,
+            'quiet': True,
+            'no_warnings': True,
+        }
+        if self.bot.cache_directory:
+            ydl_opts['cachedir'] = self.bot.cache_directory
+
+        with open_youtube_dl(ydl_opts) as ydl:
+            # Unprocessed, so the entries stay the extractor's lazy page-by-page generator
+            info = ydl.extract_info(url, download=False, process=False)
+            return list(self._walk(ydl, info, url))
+
+    def _walk(self, ydl, info: Dict[str, Any], url: str) -> Iterator[Listing]:
+        """Follow redirects to tabs and yield a Listing per playlist of videos."""
+        if _is_tab(info):
+            target = info['url']
+            yield from self._walk(ydl, ydl.extract_info(target, download=False, process=False), target)
+            return
+        if info.get('_type') != 'playlist' and 'entries' not in info:
+            raise ValueError("Not a playlist or channel URL")
+
+        entries = (entry for entry in info.get('entries') or [] if entry)
+        first = next(entries, None)
+        if first is not None and _is_tab(first):
+            for tab in [first, *entries]:
+                yield from self._walk(ydl, ydl.extract_info(tab['url'], download=False, process=False), tab['url'])
+            return
+        key = info.get('webpage_url') or url
+        yield self._walk_entries(key, info.get('title'), [first] if first is not None else [], entries)
+
+    def _walk_entries(self, key: str, title: Optional[str], head: List[Dict[str, Any]],
+                      entries: Iterator[Dict[str, Any]]) -> Listing:
+        """Consume entries until the first known one. Nothing further is fetched."""
+        state = self.state.get(key)
+        known = set(state['known']) | {state['last_seen']} if state else set()
+        walked: List[str] = []
+        new: List[Dict[str, Any]] = []
+        for entry in (entry for part in (head, entries) for entry in part):
+            video_id = entry.get('id')
+            if not video_id:
+                continue
+            if not self.full and video_id in known:
+                break
+            archived = bool(self.bot.find_downloaded(video_id))
+            if archived and not self.full and state is None:
+                # First sync of this listing: the library tells where the archive ends
+                break
+            walked.append(video_id)
+            if not archived:
+                new.append(entry)
+        return Listing(key, title, walked, new)
+
+    def sync(self, urls: Iterable[str], batch) -> Tuple[int, int]:
+        """
+        Scan every listing, download the new entries and record the progress.
+
+        The state file is only written after the downloads, so an
+        interrupted sync walks the same entries again next time.
+
+        Args:
+            urls: Playlist or channel URLs.
+            batch: BatchDownloader that runs the downloads. Its on_result
+                   callback, if any, is still called.
+
+        Returns:
+            Tuple containing (succeeded_count, failed_count). Listings that
+            fail to scan count as failures.
+        """
+        # Pick up files that reached the library outside this tool
+        self.bot.library.update()
+
+        listings: List[Listing] = []
+        downloads: Dict[str, str] = {}
+        scan_failures = 0
+        for url in urls:
+            try:
+                scanned = self.scan(url)
+            except Exception as e:
+                print(f"Sync failed for {url}: {str(e)}")
+                logger.warning("Sync scan of %s failed: %s", url, e)
+                scan_failures += 1
+                continue
+            for listing in scanned:
+                print(f"{listing.title or listing.key}: {len(listing.new)} new "
+                      f"({len(listing.walked)} entries walked)")
+                listings.append(listing)
+                for entry in listing.new:
+                    downloads.setdefault(_entry_url(entry), entry['id'])
+
+        failed_ids = set()
+        callback = batch.on_result
+
+        def on_result(url: str, success: bool, result: str) -> None:
+            if not success:
+                failed_ids.add(downloads.get(url))
+            if callback:
+                callback(url, success, result)
+
+        batch.on_result = on_result
+        try:
+            # Oldest first, so the archive fills in upload order
+            succeeded, failed = batch.run(reversed(list(downloads)))
+        finally:
+            batch.on_result = callback
+
+        for listing in listings:
+            last_seen = self.state.update(listing, failed_ids)
+            logger.info("Synced %s: %d new, last seen %s", listing.key, len(listing.new), last_seen)
+        self.state.save()
+        return succeeded, failed + scan_failures
+
+
+def _is_tab(info: Dict[str, Any]) -> bool:
+    """Whether an unprocessed result points at another listing (a channel tab or a playlist)."""
+    return info.get('_type') in ('url', 'url_transparent') and info.get('ie_key') == 'YoutubeTab'
+
+
+def _entry_url(entry: Dict[str, Any]) -> str:
+    url = entry.get('url') or ''
+    if url.startswith(('http://', 'https://')):
+        return url
+    return f"https://www.youtube.com/watch?v={entry['id']}"
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Process-isolated worker pool for long-running batches.
+
+Each worker is a separate process with its own YouTubeDownloaderBot, so
+extraction and postprocessing do not contend for one GIL, and memory that
+yt-dlp accumulates is returned to the system when a worker exits. Workers
+are recycled after a fixed number of jobs or once their resident memory
+crosses a threshold. Progress and results travel back to the parent as
+small tuples on a multiprocessing queue.
+"""
+
+import os
+import sys
+import time
+import queue
+import multiprocessing
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from engine import format_size
+from youtube_downloader_bot import YouTubeDownloaderBot
+
+# Minimum change in percent between forwarded progress events for one job
+PROGRESS_STEP = 1.0
+
+# Seconds between lines printed by ProgressSummary
+SUMMARY_INTERVAL = 5.0
+
+# Seconds the parent waits for events before checking for dead workers
+_POLL_INTERVAL = 0.5
+
+
+def _rss_bytes() -> Optional[int]:
+    """
+    Get the resident memory of the current process.
+
+    Returns:
+        Resident set size in bytes, or None where it cannot be measured.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current usage, which is the closest portable figure (KiB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _worker_main(bot_class: Callable[..., Any], bot_options: Dict[str, Any],
+                 tasks: "multiprocessing.connection.Connection", events: "multiprocessing.Queue",
+                 max_jobs: int, max_memory: Optional[int]) -> None:
+    """Run jobs in a worker process until told to stop or due for recycling."""
+    pid = os.getpid()
+    bot = bot_class(**bot_options)
+    current = {"url": None, "percent": -PROGRESS_STEP}
+
+    # The bot builds its yt-dlp options per download, so wrapping the bound
+    # hook on the instance is enough to forward progress
+    hook = bot.download_progress_hook
+
+    def forward_progress(d):
+        hook(d)
+        if d.get('status') != 'downloading':
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        percent = downloaded * 100 / total if total else 0
+        if percent - current["percent"] >= PROGRESS_STEP:
+            current["percent"] = percent
+            events.put(("progress", pid, current["url"], downloaded, total))
+
+    bot.download_progress_hook = forward_progress
+
+    reason = "stopped"
+    jobs_done = 0
+    while True:
+        try:
+            url = tasks.recv()
+        except EOFError:
+            break
+        if url is None:
+            break
+        current.update(url=url, percent=-PROGRESS_STEP)
+        try:
+            success, result = bot.download(url)
+        except Exception as e:
+            success, result = False, f"Download failed: {e}"
+
+        jobs_done += 1
+        rss = _rss_bytes()
+        if jobs_done >= max_jobs:
+            reason = "job limit"
+        elif max_memory and rss and rss > max_memory:
+            reason = "memory limit"
+        else:
+            events.put(("result", pid, url, success, result))
+            continue
+        # Announce retirement before the result so the parent assigns no new job
+        events.put(("retire", pid))
+        events.put(("result", pid, url, success, result))
+        break
+    events.put(("exit", pid, reason))
+
+
+class _WorkerHandle:
+    """Parent-side state of one worker process."""
+
+    __slots__ = ("process", "tasks", "url", "retiring")
+
+    def __init__(self, process: Any, tasks: Any):
+        self.process = process
+        self.tasks = tasks
+        self.url: Optional[str] = None
+        self.retiring = False
+
+
+class ProcessWorkerPool:
+    """Runs batch download jobs in recycled worker processes."""
+
+    def __init__(self, bot_options: Optional[Dict[str, Any]] = None, workers: int = 2,
+                 max_jobs_per_worker: int = 100, max_memory_bytes: Optional[int] = None,
+                 on_result: Optional[Callable[[str, bool, str], None]] = None,
+                 on_progress: Optional[Callable[[str, int, int], None]] = None,
+                 bot_class: Callable[..., Any] = YouTubeDownloaderBot, start_method: str = "spawn"):
+        """
+        Initialize the pool.
+
+        Args:
+            bot_options: Keyword arguments for the bot created in each worker.
+            workers: Number of worker processes.
+            max_jobs_per_worker: Jobs after which a worker is replaced.
+            max_memory_bytes: Resident memory above which a worker is replaced
+                              after its current job. None disables the check.
+            on_result: Called in the parent with (url, success, result).
+            on_progress: Called in the parent with (url, downloaded_bytes, total_bytes).
+            bot_class: Picklable bot factory called in each worker with bot_options.
+            start_method: multiprocessing start method. "spawn" gives workers a
+                          fresh interpreter and works on every platform.
+        """
+        self.bot_options = bot_options or {}
+        self.workers = workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_memory_bytes = max_memory_bytes
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.bot_class = bot_class
+        self.context = multiprocessing.get_context(start_method)
+
+        self.succeeded = 0
+        self.failed = 0
+        self.recycled = 0
+
+    def run(self, urls: Iterable[str]) -> Tuple[int, int]:
+        """
+        Download every URL and wait for all jobs to finish.
+
+        Each worker is handed one URL at a time over its own pipe, so URLs
+        are consumed lazily and the parent always knows which job a worker
+        holds. A job whose worker dies is reported as failed.
+
+        Args:
+            urls: Iterable of URLs.
+
+        Returns:
+            Tuple containing (succeeded_count, failed_count).
+        """
+        events = self.context.Queue()
+        workers: Dict[int, _WorkerHandle] = {}
+        pending = iter(urls)
+        exhausted = False
+
+        def spawn():
+            receiver, sender = self.context.Pipe(duplex=False)
+            process = self.context.Process(
+                target=_worker_main,
+                args=(self.bot_class, self.bot_options, receiver, events,
+                      self.max_jobs_per_worker, self.max_memory_bytes),
+                daemon=True,
+            )
+            process.start()
+            receiver.close()
+            workers[process.pid] = _WorkerHandle(process, sender)
+
+        def assign():
+            nonlocal exhausted
+            for worker in workers.values():
+                if worker.url is not None or worker.retiring:
+                    continue
+                url = None if exhausted else next(pending, None)
+                if url is None:
+                    exhausted = True
+                    return
+                worker.url = url
+                worker.tasks.send(url)
+
+        def busy():
+            return any(worker.url is not None for worker in workers.values())
+
+        try:
+            for _ in range(self.workers):
+                spawn()
+            assign()
+            def handle(event):
+                kind, pid = event[0], event[1]
+                worker = workers.get(pid)
+                if kind == "progress":
+                    if self.on_progress:
+                        self.on_progress(*event[2:])
+                elif kind == "result":
+                    if worker is not None:
+                        worker.url = None
+                    self._record(*event[2:])
+                    assign()
+                elif kind == "retire":
+                    # The worker exits after its current job instead of taking another
+                    if worker is not None:
+                        worker.retiring = True
+                elif kind == "exit":
+                    worker = workers.pop(pid, None)
+                    if worker is None:
+                        # Already reaped and replaced
+                        return
+                    worker.process.join()
+                    worker.tasks.close()
+                    self.recycled += 1
+                    print(f"Recycled worker {pid} ({event[2]})", flush=True)
+                    if not exhausted and len(workers) < self.workers:
+                        spawn()
+                        assign()
+
+            while busy() or not exhausted:
+                try:
+                    event = events.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    dead = [pid for pid, worker in workers.items() if not worker.process.is_alive()]
+                    if dead:
+                        # A worker may have sent its result just before dying: handle
+                        # what it sent first, so its job is not also failed here
+                        while True:
+                            try:
+                                handle(events.get_nowait())
+                            except queue.Empty:
+                                break
+                        self._reap_dead(workers, dead)
+                    if not exhausted:
+                        while len(workers) < self.workers:
+                            spawn()
+                    assign()
+                    continue
+                handle(event)
+        finally:
+            for worker in workers.values():
+                try:
+                    worker.tasks.send(None)
+                except OSError:
+                    pass
+            for worker in workers.values():
+                worker.process.join(5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+                worker.tasks.close()
+        return self.succeeded, self.failed
+
+    def _reap_dead(self, workers: Dict[int, "_WorkerHandle"], dead: Iterable[int]) -> None:
+        """Drop workers that died without saying so and fail the jobs they still held."""
+        for pid in dead:
+            worker = workers.pop(pid, None)
+            if worker is None:
+                continue
+            worker.tasks.close()
+            if worker.url is not None:
+                self._record(worker.url, False,
+                             f"Worker process exited with code {worker.process.exitcode}")
+
+    def _record(self, url: str, success: bool, result: str) -> None:
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if self.on_result:
+            self.on_result(url, success, result)
+
+
+class ProgressSummary:
+    """Prints the combined progress of the jobs running in a pool's workers every few seconds."""
+
+    def __init__(self, interval: float = SUMMARY_INTERVAL):
+        """
+        Initialize the summary.
+
+        Args:
+            interval: Seconds between printed lines.
+        """
+        self.interval = interval
+        self.jobs: Dict[str, Tuple[int, int]] = {}
+        self._last_report = time.monotonic()
+
+    def on_progress(self, url: str, downloaded: int, total: int) -> None:
+        """ProcessWorkerPool on_progress callback."""
+        self.jobs[url] = (downloaded, total)
+        now = time.monotonic()
+        if now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        downloaded = sum(done for done, _ in self.jobs.values())
+        total = sum(size for _, size in self.jobs.values())
+        print(f"Workers: {len(self.jobs)} downloads running, "
+              f"{format_size(downloaded)} of {format_size(total)}", flush=True)
+
+    def on_result(self, url: str, success: bool, result: str) -> None:
+        """ProcessWorkerPool on_result callback."""
+        self.jobs.pop(url, None)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Size-budgeted format selection for capped destinations.
+
+Chat services and mail gateways reject files above a fixed size, and a
+download that is rejected downstream has cost its bandwidth for nothing.
+SizeBudgetSelector is a yt-dlp format selector that picks the best
+formats whose estimated size fits a budget. The estimate is the size
+yt-dlp reports or, failing that, bitrate times duration. In order of
+preference it picks the best video (merged with the best audio that
+still fits, or a combined format), then a lower resolution, then audio
+only. Only when not even that fits does FitToSizePP re-encode the
+finished file down to the budget.
+"""
+
+import os
+import shutil
+import statistics
+from typing import Any, Dict, Iterator, List, Optional
+
+from yt_dlp.postprocessor import FFmpegPostProcessor
+from yt_dlp.utils import determine_protocol, format_bytes, get_compatible_ext, prepend_extension
+
+# Share of the budget the estimated size may use: estimates of fragmented
+# formats are approximate and merging adds container overhead
+SIZE_MARGIN = 0.95
+
+# Audio bitrate in kbit/s kept when re-encoding a video to fit
+REENCODE_AUDIO_KBPS = 96
+
+# Audio extension that merges into each video container without a remux
+_AUDIO_FOR_VIDEO_EXT = {"mp4": "m4a", "webm": "webm"}
+
+# Encoders used to re-encode, by file extension
+_VIDEO_ENCODERS = {"webm": ("libvpx-vp9", "libopus")}
+_DEFAULT_VIDEO_ENCODERS = ("libx264", "aac")
+_AUDIO_ENCODERS = {"mp3": "libmp3lame", "m4a": "aac", "mp4": "aac", "opus": "libopus",
+                   "ogg": "libvorbis", "webm": "libopus"}
+
+
+def estimate_format_size(fmt: Dict[str, Any], duration: Optional[float] = None) -> Optional[int]:
+    """
+    Estimate the size of a format.
+
+    Args:
+        fmt: yt-dlp format dictionary.
+        duration: Duration of the video in seconds, used with the bitrate
+                  when the format has no size.
+
+    Returns:
+        Size in bytes, or None if neither a size nor bitrate and duration are known.
+    """
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+
+def infer_duration(formats: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Work out the duration from formats that report both size and bitrate.
+
+    yt-dlp hands format selectors only the formats, so this recovers the
+    duration needed to estimate formats that report only a bitrate.
+
+    Args:
+        formats: yt-dlp format dictionaries.
+
+    Returns:
+        Median duration in seconds, or None if no format reports both.
+    """
+    durations = [(f.get('filesize') or f.get('filesize_approx')) * 8 / (f['tbr'] * 1000)
+                 for f in formats if f.get('tbr') and (f.get('filesize') or f.get('filesize_approx'))]
+    return statistics.median(durations) if durations else None
+
+
+def _has_video(fmt: Dict[str, Any]) -> bool:
+    return fmt.get('vcodec') not in (None, 'none')
+
+
+def _has_audio(fmt: Dict[str, Any]) -> bool:
+    return fmt.get('acodec') not in (None, 'none')
+
+
+def _merge(video: Dict[str, Any], audio: Dict[str, Any], size: int) -> Dict[str, Any]:
+    """Describe a video-only and an audio-only format downloaded together, as yt-dlp does for "bv+ba"."""
+    return {
+        'requested_formats': [video, audio],
+        'format': '+'.join(filter(None, (video.get('format'), audio.get('format')))),
+        'format_id': f"{video['format_id']}+{audio['format_id']}",
+        'ext': get_compatible_ext(vcodecs=[video.get('vcodec')], acodecs=[audio.get('acodec')],
+                                  vexts=[video['ext']], aexts=[audio['ext']]),
+        'protocol': f"{determine_protocol(video)}+{determine_protocol(audio)}",
+        'filesize_approx': size,
+        'tbr': (video.get('tbr') or 0) + (audio.get('tbr') or 0),
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'resolution': video.get('resolution'),
+        'fps': video.get('fps'),
+        'dynamic_range': video.get('dynamic_range'),
+        'vcodec': video.get('vcodec'),
+        'vbr': video.get('vbr'),
+        'aspect_ratio': video.get('aspect_ratio'),
+        'acodec': audio.get('acodec'),
+        'abr': audio.get('abr'),
+        'asr': audio.get('asr'),
+        'audio_channels': audio.get('audio_channels'),
+    }
+
+
+class SizeBudgetSelector:
+    """yt-dlp format selector (the 'format' option) that keeps the download within a size budget."""
+
+    def __init__(self, max_bytes: int, audio_only: bool = False, audio_ext: Optional[str] = None,
+                 audio_codec: Optional[str] = None, can_merge: Optional[bool] = None,
+                 duration: Optional[float] = None, margin: float = SIZE_MARGIN):
+        """
+        Initialize the selector.
+
+        Args:
+            max_bytes: Largest acceptable file size.
+            audio_only: Select audio formats only.
+            audio_ext: Preferred extension of audio formats (e.g. "m4a"), used
+                       as long as one fits.
+            audio_codec: Preferred audio codec (e.g. "opus"), likewise.
+            can_merge: Whether separate video and audio formats can be merged.
+                       Defaults to whether ffmpeg is installed.
+            duration: Duration in seconds, if known. Otherwise it is inferred
+                      from the formats when needed.
+            margin: Share of max_bytes the estimate may use.
+        """
+        self.max_bytes = max_bytes
+        self.audio_only = audio_only
+        self.audio_ext = audio_ext
+        self.audio_codec = audio_codec
+        self.can_merge = shutil.which("ffmpeg") is not None if can_merge is None else can_merge
+        self.duration = duration
+        self.margin = margin
+        # How the last selection was made: "fits", "audio only" or "over budget"
+        self.outcome: Optional[str] = None
+
+    def __call__(self, ctx: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        formats = [f for f in ctx['formats'] if f.get('format_id')]
+        duration = self.duration or infer_duration(formats)
+        budget = self.max_bytes * self.margin
+        sized = [(f, estimate_format_size(f, duration)) for f in formats]
+        # Formats of unknown size cannot be shown to fit
+        sized = [(f, size) for f, size in sized if size is not None]
+
+        audio = sorted(((f, size) for f, size in sized if _has_audio(f) and not _has_video(f)),
+                       key=lambda item: self._audio_rank(item[0]), reverse=True)
+        if not self.audio_only:
+            videos = self._video_candidates(sized, audio)
+            fitting = [candidate for candidate in videos if candidate[1] <= budget]
+            if fitting:
+                self.outcome = "fits"
+                yield self._describe(max(fitting, key=lambda item: self._video_rank(item[0])))
+                return
+
+        fitting_audio = [(f, size) for f, size in audio if size <= budget]
+        if fitting_audio:
+            self.outcome = "fits" if self.audio_only else "audio only"
+            yield fitting_audio[0][0]
+            return
+
+        # Nothing fits: the smallest download, to be re-encoded by FitToSizePP
+        fallback = audio if self.audio_only else (self._video_candidates(sized, audio) or audio)
+        if fallback:
+            self.outcome = "over budget"
+            yield self._describe(min(fallback, key=lambda item: item[1]))
+
+    def _video_candidates(self, sized, audio):
+        """Combined formats, and video-only formats merged with the best audio that fits alongside."""
+        budget = self.max_bytes * self.margin
+        candidates = [(f, size, None) for f, size in sized if _has_video(f) and _has_audio(f)]
+        if self.can_merge and audio:
+            for f, size in sized:
+                if not _has_video(f) or _has_audio(f):
+                    continue
+                # Best audio that still fits next to this video, or the smallest if none does.
+                # Audio of the video's own container family is preferred, so no remux to MKV is needed
+                family = _AUDIO_FOR_VIDEO_EXT.get(f.get('ext'))
+                partners = sorted(audio, key=lambda item: item[0].get('ext') == family, reverse=True)
+                partner = next(((a, a_size) for a, a_size in partners if size + a_size <= budget),
+                               min(audio, key=lambda item: item[1]))
+                candidates.append((f, size + partner[1], partner[0]))
+        return candidates
+
+    def _describe(self, candidate) -> Dict[str, Any]:
+        if len(candidate) == 3 and candidate[2] is not None:
+            video, size, audio = candidate
+            return _merge(video, audio, size)
+        return candidate[0]
+
+    def _video_rank(self, fmt: Dict[str, Any]):
+        return (fmt.get('height') or 0, fmt.get('fps') or 0, fmt.get('tbr') or 0)
+
+    def _audio_rank(self, fmt: Dict[str, Any]):
+        preferred = ((self.audio_ext is None or fmt.get('ext') == self.audio_ext)
+                     and (self.audio_codec is None or (fmt.get('acodec') or '').startswith(self.audio_codec)))
+        return (preferred, fmt.get('abr') or fmt.get('tbr') or 0)
+
+
+class FitToSizePP(FFmpegPostProcessor):
+    """Re-encode a finished download that is larger than the budget, keeping its name and container."""
+
+    def __init__(self, downloader=None, max_bytes: int = 0, margin: float = SIZE_MARGIN):
+        super().__init__(downloader)
+        self.max_bytes = max_bytes
+        self.margin = margin
+
+    def run(self, info):
+        path = info['filepath']
+        size = os.path.getsize(path)
+        if size <= self.max_bytes:
+            return [], info
+        duration = info.get('duration')
+        if not duration or not self.available:
+            self.report_warning(f'{format_bytes(size)} exceeds the size budget of {format_bytes(self.max_bytes)}, '
+                                f'but {"the duration is unknown" if not duration else "ffmpeg is not available"}; '
+                                'keeping it as is')
+            return [], info
+
+        ext = os.path.splitext(path)[1].lstrip('.').lower()
+        total_kbps = self.max_bytes * self.margin * 8 / duration / 1000
+        if not _has_video(info) or ext in ('mp3', 'm4a', 'opus', 'ogg', 'flac', 'wav'):
+            encoder = _AUDIO_ENCODERS.get(ext)
+            if encoder is None:
+                self.report_warning(f'Cannot re-encode .{ext} files to a bitrate; keeping {path} as is')
+                return [], info
+            options = ['-vn', '-c:a', encoder, '-b:a', f'{max(8, int(total_kbps))}k']
+        else:
+            video_encoder, audio_encoder = _VIDEO_ENCODERS.get(ext, _DEFAULT_VIDEO_ENCODERS)
+            audio_kbps = min(REENCODE_AUDIO_KBPS, total_kbps / 4)
+            video_kbps = max(16, int(total_kbps - audio_kbps))
+            options = ['-c:v', video_encoder, '-b:v', f'{video_kbps}k', '-maxrate', f'{video_kbps}k',
+                       '-bufsize', f'{video_kbps * 2}k', '-c:a', audio_encoder, '-b:a', f'{max(8, int(audio_kbps))}k']
+
+        self.to_screen(f'Re-encoding "{path}" ({format_bytes(size)}) to fit {format_bytes(self.max_bytes)}')
+        temp_path = prepend_extension(path, 'temp')
+        self.run_ffmpeg(path, temp_path, options)
+        os.replace(temp_path, path)
+        return [], info
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Slim frozen build support for YouTube Downloader.
+
+yt-dlp finds its extractors through yt_dlp/extractor/lazy_extractors.py, a
+generated module with a light stand-in class for each of its extractors
+that imports the real extractor module only when it is first used. The
+default build bundles that module and every extractor module behind it.
+
+The slim build (youtube_downloader_slim.spec) uses the helpers here to
+bundle a lazy_extractors trimmed to the YouTube extractors and to leave
+all other extractor modules out. The YouTube extractors stay lazy, so
+nothing of them is imported until the first download.
+
+Run this module to compare startup times of the extractor sets from
+source, and of frozen builds when their paths are given.
+"""
+
+import os
+import ast
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+# Extractor modules whose extractors the slim build keeps
+SLIM_EXTRACTOR_MODULES = ('yt_dlp.extractor.youtube',)
+
+# The extractor lookup modules: lazy_extractors is replaced, _extractors imports every extractor
+_LOOKUP_MODULES = ('yt_dlp.extractor.extractors', 'yt_dlp.extractor.lazy_extractors', 'yt_dlp.extractor._extractors')
+
+# Code timed by compare(): import yt-dlp and get the YouTube extractor, as a first download does
+_STARTUP_CODE = (
+    "import yt_dlp\n"
+    "with yt_dlp.YoutubeDL({'quiet': True}) as ydl:\n"
+    "    ydl.get_info_extractor('Youtube')\n"
+)
+
+# Prefix that puts a trimmed lazy_extractors in place before yt-dlp looks for it
+_PRELOAD_CODE = (
+    "import sys, importlib.util, yt_dlp.extractor\n"
+    "spec = importlib.util.spec_from_file_location('yt_dlp.extractor.lazy_extractors', {path!r})\n"
+    "module = importlib.util.module_from_spec(spec)\n"
+    "sys.modules[spec.name] = module\n"
+    "spec.loader.exec_module(module)\n"
+)
+
+
+def _in_modules(module: Optional[str], modules: Iterable[str]) -> bool:
+    return module is not None and any(module == m or module.startswith(m + '.') for m in modules)
+
+
+def _class_module(node: ast.ClassDef) -> Optional[str]:
+    """Value of the _module attribute of a lazy extractor class."""
+    for stmt in node.body:
+        if isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.Constant) \
+                and any(isinstance(t, ast.Name) and t.id == '_module' for t in stmt.targets):
+            return stmt.value.value
+    return None
+
+
+def _is_class_lookup(node: ast.stmt) -> bool:
+    return isinstance(node, ast.Assign) and any(
+        isinstance(t, ast.Name) and t.id == '_CLASS_LOOKUP' for t in node.targets)
+
+
+def trim_lazy_extractors(source: str, modules: Sequence[str] = SLIM_EXTRACTOR_MODULES) -> str:
+    """
+    Trim yt-dlp's lazy_extractors source to the extractors of some modules.
+
+    Base classes the kept extractors derive from, such as the shared
+    LazyLoadExtractor, are kept as well.
+
+    Args:
+        source: Source of yt_dlp/extractor/lazy_extractors.py.
+        modules: Extractor modules (or packages) whose extractors to keep.
+
+    Returns:
+        Source of the trimmed module.
+
+    Raises:
+        ValueError: If the source has no extractor lookup or no extractor
+                    of the given modules.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    lookup = next((node for node in tree.body if _is_class_lookup(node)), None)
+    if lookup is None or not isinstance(lookup.value, ast.Dict):
+        raise ValueError("Not a lazy_extractors module: no _CLASS_LOOKUP")
+
+    names = [key.value for key in lookup.value.keys if isinstance(key, ast.Constant)]
+    wanted = [name for name in names if name in classes and _in_modules(_class_module(classes[name]), modules)]
+    if not wanted:
+        raise ValueError(f"No extractors found in {', '.join(modules)}")
+
+    # The kept classes and everything they derive from
+    keep = set()
+    pending = list(wanted)
+    while pending:
+        name = pending.pop()
+        if name in keep or name not in classes:
+            continue
+        keep.add(name)
+        node = classes[name]
+        pending.extend(base.id for base in node.bases if isinstance(base, ast.Name))
+        pending.extend(k.value.id for k in node.keywords if isinstance(k.value, ast.Name))
+
+    parts = [f"# Trimmed by slim_build.py to the extractors of: {', '.join(modules)}"]
+    for node in tree.body:
+        if _is_class_lookup(node) or (isinstance(node, ast.ClassDef) and node.name not in keep):
+            continue
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        parts.append("\n".join(lines[start - 1:node.end_lineno]))
+    parts.append("_CLASS_LOOKUP = {%s}" % ", ".join(f"{name!r}: {name}" for name in wanted))
+    return "\n\n\n".join(parts) + "\n"
+
+
+def write_lazy_extractors(path: str, modules: Sequence[str] = SLIM_EXTRACTOR_MODULES) -> str:
+    """
+    Write a trimmed lazy_extractors module built from the installed yt-dlp.
+
+    Args:
+        path: File to write.
+        modules: Extractor modules (or packages) whose extractors to keep.
+
+    Returns:
+        The path written.
+
+    Raises:
+        FileNotFoundError: If the installed yt-dlp has no lazy_extractors
+                           module (a source checkout that was never built).
+    """
+    import yt_dlp.extractor
+
+    source_path = os.path.join(os.path.dirname(yt_dlp.extractor.__file__), 'lazy_extractors.py')
+    with open(source_path, encoding='utf-8') as f:
+        trimmed = trim_lazy_extractors(f.read(), modules)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(trimmed)
+    return path
+
+
+def _imported_modules(path: str, module: str) -> Set[str]:
+    """Absolute names of the modules a source file imports, at any depth in the file."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    package = module if os.path.basename(path) == '__init__.py' else module.rpartition('.')[0]
+    imported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = package.rsplit('.', node.level - 1)[0] if node.level else ''
+            target = '.'.join(filter(None, [base, node.module]))
+            imported.add(target)
+            imported.update(f'{target}.{alias.name}' for alias in node.names)
+    return imported
+
+
+def required_extractor_modules(modules: Sequence[str] = SLIM_EXTRACTOR_MODULES) -> Set[str]:
+    """
+    Extractor modules the slim build must keep.
+
+    Besides the given modules, yt-dlp imports a few extractor modules from
+    outside the extractor lookup (the downloaders and YoutubeDL use helpers
+    from them), and those import others in turn. These are found by
+    following the imports in the installed yt-dlp's source.
+
+    Args:
+        modules: Extractor modules (or packages) whose extractors are kept.
+
+    Returns:
+        Names of the top-level modules in yt_dlp.extractor to keep.
+    """
+    import yt_dlp
+
+    root = os.path.dirname(yt_dlp.__file__)
+    extractor_dir = os.path.join(root, 'extractor')
+    sources = {}
+    for directory, _, files in os.walk(root):
+        for file in files:
+            if file.endswith('.py'):
+                path = os.path.join(directory, file)
+                name = os.path.splitext(os.path.relpath(path, os.path.dirname(root)))[0].replace(os.sep, '.')
+                sources[name[:-len('.__init__')] if name.endswith('.__init__') else name] = path
+
+    def top_level(name):
+        return '.'.join(name.split('.')[:3])
+
+    # Start from everything outside yt_dlp.extractor and the kept extractors
+    pending = [name for name in sources if not name.startswith('yt_dlp.extractor.') or _in_modules(name, modules)]
+    seen = set()
+    required = set(_LOOKUP_MODULES[:2]) | {top_level(m) for m in modules}
+    while pending:
+        name = pending.pop()
+        if name in seen or name in _LOOKUP_MODULES:
+            continue
+        seen.add(name)
+        for imported in _imported_modules(sources[name], name):
+            if imported.startswith('yt_dlp.extractor.') and imported not in _LOOKUP_MODULES:
+                module = top_level(imported)
+                if os.path.exists(os.path.join(extractor_dir, module.split('.')[2] + '.py')) \
+                        or os.path.isdir(os.path.join(extractor_dir, module.split('.')[2])):
+                    required.add(module)
+            if imported in sources:
+                pending.append(imported)
+    return required
+
+
+def excluded_extractor_modules(modules: Sequence[str] = SLIM_EXTRACTOR_MODULES) -> List[str]:
+    """
+    Extractor modules the slim build leaves out.
+
+    Args:
+        modules: Extractor modules (or packages) whose extractors are kept.
+
+    Returns:
+        Names of every module in yt_dlp.extractor that is not required,
+        including the module that imports all extractors at once.
+    """
+    import yt_dlp.extractor
+
+    required = required_extractor_modules(modules)
+    directory = os.path.dirname(yt_dlp.extractor.__file__)
+    excluded = []
+    for entry in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(entry)
+        is_package = os.path.isfile(os.path.join(directory, entry, '__init__.py'))
+        if (ext != '.py' and not is_package) or name == '__init__':
+            continue
+        module = f'yt_dlp.extractor.{name}'
+        if module not in required:
+            excluded.append(module)
+    return excluded
+
+
+def time_command(command: List[str], runs: int = 5, env: Optional[Dict[str, str]] = None) -> List[float]:
+    """
+    Time how long a command takes to run to completion.
+
+    Args:
+        command: Command and arguments.
+        runs: Number of timed runs, after one untimed run to warm the disk cache.
+        env: Extra environment variables.
+
+    Returns:
+        Wall-clock seconds of each timed run.
+
+    Raises:
+        subprocess.CalledProcessError: If the command fails.
+    """
+    full_env = dict(os.environ, **(env or {}))
+    timings = []
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run(command, env=full_env, check=True, stdout=subprocess.DEVNULL)
+        if i:
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def compare(runs: int = 5, frozen: Optional[Dict[str, str]] = None, work_dir: str = "build") -> Dict[str, List[float]]:
+    """
+    Compare startup times of the full and trimmed extractor sets.
+
+    Args:
+        runs: Number of timed runs of each variant.
+        frozen: Frozen executables to time as well, by label. They run
+                with YTD_STARTUP_PROBE set, so the GUI exits once ready.
+        work_dir: Directory for the trimmed lazy_extractors.
+
+    Returns:
+        Timings in seconds by variant label.
+    """
+    slim_path = write_lazy_extractors(os.path.join(work_dir, 'slim_lazy_extractors.py'))
+    variants = {
+        'all extractors, eager': ([sys.executable, '-c', _STARTUP_CODE], {'YTDLP_NO_LAZY_EXTRACTORS': '1'}),
+        'all extractors, lazy': ([sys.executable, '-c', _STARTUP_CODE], None),
+        'YouTube only, lazy': ([sys.executable, '-c', _PRELOAD_CODE.format(path=slim_path) + _STARTUP_CODE], None),
+    }
+    for label, path in (frozen or {}).items():
+        variants[label] = ([path], {'YTD_STARTUP_PROBE': '1'})
+    return {label: time_command(command, runs, env) for label, (command, env) in variants.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare startup times of the full and slim extractor sets")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per variant (default: 5)")
+    parser.add_argument("--frozen", action="append", default=[], metavar="LABEL=PATH",
+                        help="Also time a frozen executable, e.g. default='dist/YouTube Downloader'")
+    parser.add_argument("--write-lazy-extractors", metavar="PATH",
+                        help="Only write the trimmed lazy_extractors module to PATH")
+    args = parser.parse_args()
+
+    if args.write_lazy_extractors:
+        print(write_lazy_extractors(args.write_lazy_extractors))
+        sys.exit(0)
+    frozen = {}
+    for item in args.frozen:
+        label, sep, path = item.partition("=")
+        if not sep or not path:
+            parser.error(f"--frozen expects LABEL=PATH, got {item!r}")
+        frozen[label] = path
+
+    results = compare(args.runs, frozen)
+    width = max(len(label) for label in results)
+    for label, timings in results.items():
+        print(f"{label:<{width}}  median {statistics.median(timings) * 1000:7.1f} ms"
+              f"  min {min(timings) * 1000:7.1f} ms")
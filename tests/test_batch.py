@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming batch downloads.
+"""
+
+import io
+import os
+import json
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch import BatchDownloader, DiskSpaceGuard, bounded_map, iter_urls, stream_metadata
+
+class TestIterUrls(unittest.TestCase):
+    """Test cases for iter_urls."""
+    
+    def test_skips_blank_and_comment_lines(self):
+        """Test that blank lines and comments are ignored."""
+        source = io.StringIO("https://youtu.be/a\n\n# comment\n  https://youtu.be/b  \n; other\n")
+        self.assertEqual(list(iter_urls(source)), ["https://youtu.be/a", "https://youtu.be/b"])
+    
+    def test_is_lazy(self):
+        """Test that lines are only read as URLs are consumed."""
+        source = MagicMock()
+        source.__iter__.return_value = iter(["https://youtu.be/a\n", "https://youtu.be/b\n"])
+        urls = iter_urls(source)
+        source.__iter__.assert_not_called()
+        self.assertEqual(next(urls), "https://youtu.be/a")
+
+class TestBatchDownloader(unittest.TestCase):
+    """Test cases for BatchDownloader."""
+    
+    def test_run_counts_results(self):
+        """Test that every URL is downloaded and results are counted."""
+        bot = MagicMock()
+        bot.download.side_effect = lambda url, info=None: (not url.endswith("bad"), url)
+        results = []
+        batch = BatchDownloader(lambda: bot, workers=3,
+                                on_result=lambda url, ok, res: results.append(url))
+        
+        urls = [f"https://youtu.be/{i}" for i in range(20)] + ["https://youtu.be/bad"]
+        self.assertEqual(batch.run(iter(urls)), (20, 1))
+        self.assertEqual(sorted(results), sorted(urls))
+    
+    def test_backpressure(self):
+        """Test that the producer never runs more than the queue size ahead."""
+        release = threading.Event()
+        consumed = []
+        
+        def slow_download(url, info=None):
+            release.wait()
+            return True, url
+        
+        def producer():
+            for i in range(100):
+                consumed.append(i)
+                yield f"https://youtu.be/{i}"
+        
+        bot = MagicMock()
+        bot.download.side_effect = slow_download
+        batch = BatchDownloader(lambda: bot, workers=2, queue_size=3)
+        runner = threading.Thread(target=batch.run, args=(producer(),))
+        runner.start()
+        
+        # Two jobs held by workers, three queued, one blocked in put()
+        runner.join(0.2)
+        self.assertLessEqual(len(consumed), 6)
+        
+        release.set()
+        runner.join()
+        self.assertEqual(len(consumed), 100)
+        self.assertEqual(batch.succeeded, 100)
+    
+    def test_interrupt_drops_queued_jobs(self):
+        """Test that an interrupted producer does not wait for queued jobs."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        started = []
+        
+        def slow_download(url, info=None):
+            started.append(url)
+            release.wait(5)
+            return True, url
+        
+        def producer():
+            for i in range(4):
+                yield f"https://youtu.be/{i}"
+            # Both workers are busy and the queue is full when the interrupt arrives
+            threading.Timer(0.2, release.set).start()
+            raise KeyboardInterrupt
+        
+        bot = MagicMock()
+        bot.download.side_effect = slow_download
+        batch = BatchDownloader(lambda: bot, workers=2, queue_size=2)
+        
+        with self.assertRaises(KeyboardInterrupt):
+            batch.run(producer())
+        self.assertEqual(len(started), 2)
+    
+    def test_cancel_running_and_queued_jobs(self):
+        """Test that running jobs are cancelled through their bot and queued ones are skipped."""
+        running = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        bot = MagicMock()
+        
+        def download(url, info=None):
+            running.set()
+            release.wait(5)
+            return False, "Download cancelled"
+        
+        bot.download.side_effect = download
+        bot.cancel.side_effect = release.set
+        results = {}
+        batch = BatchDownloader(lambda: bot, workers=1,
+                                on_result=lambda url, ok, res: results.update({url: res}))
+        
+        runner = threading.Thread(target=batch.run, args=(["https://youtu.be/a", "https://youtu.be/b"],),
+                                  daemon=True)
+        runner.start()
+        self.assertTrue(running.wait(5))
+        self.assertFalse(batch.cancel("https://youtu.be/b"))
+        self.assertTrue(batch.cancel("https://youtu.be/a"))
+        runner.join(5)
+        
+        self.assertEqual(bot.download.call_count, 1)
+        self.assertEqual(results, {"https://youtu.be/a": "Download cancelled",
+                                   "https://youtu.be/b": "Download cancelled"})
+    
+    def test_resolver_stage(self):
+        """Test that URLs are resolved concurrently and downloaded with their resolved info."""
+        # Every resolver must be inside resolve() at once for the barrier to open
+        barrier = threading.Barrier(4, timeout=5)
+        bot = MagicMock()
+        
+        def resolve(url):
+            barrier.wait()
+            return {'url': url, 'duration': 60}
+        
+        bot.resolve.side_effect = resolve
+        bot.estimate_size.return_value = 1000
+        downloaded = {}
+        
+        def download(url, info=None):
+            downloaded[url] = info
+            return True, url
+        
+        bot.download.side_effect = download
+        results = {}
+        batch = BatchDownloader(lambda: bot, workers=2, resolvers=4,
+                                on_result=lambda url, ok, res: results.update({url: ok}))
+        
+        urls = [f"https://youtu.be/{i}" for i in range(8)]
+        self.assertEqual(batch.run(iter(urls)), (8, 0))
+        self.assertEqual(bot.resolve.call_count, 8)
+        self.assertEqual(downloaded, {url: {'url': url, 'duration': 60} for url in urls})
+    
+    def test_resolver_failures_are_recorded(self):
+        """Test that a URL that fails to resolve is reported and never downloaded."""
+        bot = MagicMock()
+        
+        def resolve(url):
+            if url.endswith("bad"):
+                raise ValueError("Video unavailable")
+            return {'url': url}
+        
+        bot.resolve.side_effect = resolve
+        bot.estimate_size.return_value = None
+        bot.download.side_effect = lambda url, info=None: (True, url)
+        results = {}
+        batch = BatchDownloader(lambda: bot, workers=2, resolvers=3,
+                                on_result=lambda url, ok, res: results.update({url: (ok, res)}))
+        
+        self.assertEqual(batch.run(["https://youtu.be/a", "https://youtu.be/bad"]), (1, 1))
+        self.assertEqual(results["https://youtu.be/bad"], (False, "Download failed: Video unavailable"))
+        bot.download.assert_called_once_with("https://youtu.be/a", info={'url': "https://youtu.be/a"})
+
+class TestDiskSpaceAdmission(unittest.TestCase):
+    """Test cases for DiskSpaceGuard and admission control in BatchDownloader."""
+    
+    def make_guard(self, free, min_free=10):
+        guard = DiskSpaceGuard("/", min_free=min_free)
+        patcher = patch('batch.shutil.disk_usage', return_value=MagicMock(free=free))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return guard
+    
+    def test_reservations_reduce_available_space(self):
+        """Test that in-flight reservations count against free space."""
+        guard = self.make_guard(110)
+        token = guard.try_reserve(60)
+        self.assertIsNotNone(token)
+        self.assertIsNone(guard.try_reserve(60))
+        guard.release(token)
+        self.assertIsNotNone(guard.try_reserve(60))
+    
+    def test_written_bytes_are_not_counted_twice(self):
+        """Test that only the unwritten remainder of a running download is reserved."""
+        guard = self.make_guard(110)
+        written = [0]
+        guard.try_reserve(60, lambda: written[0])
+        self.assertEqual(guard.reserved, 60)
+        self.assertIsNone(guard.try_reserve(60))
+        
+        # Free space reported by the filesystem already reflects written bytes
+        written[0] = 50
+        self.assertEqual(guard.reserved, 10)
+        self.assertIsNotNone(guard.try_reserve(60))
+    
+    def test_large_job_is_deferred_until_space_is_released(self):
+        """Test that a job that does not fit waits for running jobs to finish."""
+        # 90 bytes can be reserved: small (50) and big (80) only fit one at a time
+        guard = self.make_guard(130, min_free=40)
+        sizes = {"https://youtu.be/small": 50, "https://youtu.be/big": 80,
+                 "https://youtu.be/huge": 1000}
+        started = []
+        small_running = threading.Event()
+        release_small = threading.Event()
+        self.addCleanup(release_small.set)
+        
+        def download(url, info=None):
+            started.append(url)
+            if url.endswith("small"):
+                small_running.set()
+                release_small.wait(5)
+            return True, url
+        
+        bot = MagicMock()
+        bot.job_downloaded_bytes = 0
+        def resolve(url):
+            # Make sure small is admitted first, whichever worker picks it up
+            if not url.endswith("small"):
+                small_running.wait(5)
+            return {'url': url}
+        
+        bot.resolve.side_effect = resolve
+        bot.estimate_size.side_effect = lambda info: sizes[info['url']]
+        bot.download.side_effect = download
+        results = {}
+        batch = BatchDownloader(lambda: bot, workers=2, disk_guard=guard,
+                                on_result=lambda url, ok, res: results.update({url: (ok, res)}))
+        
+        runner = threading.Thread(target=batch.run, args=(list(sizes),), daemon=True)
+        runner.start()
+        self.assertTrue(small_running.wait(5))
+        # The big job cannot start while the small one holds its reservation
+        self.assertNotIn("https://youtu.be/big", started)
+        release_small.set()
+        runner.join(5)
+        
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(sorted(started), ["https://youtu.be/big", "https://youtu.be/small"])
+        self.assertEqual(results["https://youtu.be/big"], (True, "https://youtu.be/big"))
+        self.assertEqual(results["https://youtu.be/huge"], (False, "Not enough disk space"))
+        self.assertEqual(guard.in_flight, 0)
+
+class TestStreamMetadata(unittest.TestCase):
+    """Test cases for bounded_map and stream_metadata."""
+    
+    def test_bounded_map_returns_errors(self):
+        """Test that exceptions are yielded in place of results."""
+        def func(x):
+            if x == 2:
+                raise ValueError("boom")
+            return x * 10
+        
+        results = dict(bounded_map(func, range(5), workers=2))
+        self.assertEqual(results[4], 40)
+        self.assertIsInstance(results[2], ValueError)
+    
+    def test_stream_metadata_writes_json_lines(self):
+        """Test that every video and every error becomes one JSON line."""
+        def extract_metadata(url):
+            if url.endswith("bad"):
+                raise ValueError("Invalid")
+            yield {'id': url[-1]}
+            yield {'id': url[-1] + "2"}
+        
+        bot = MagicMock()
+        bot.extract_metadata.side_effect = extract_metadata
+        out = io.StringIO()
+        
+        counts = stream_metadata(["https://youtu.be/a", "https://youtu.be/bad"], bot, out, workers=2)
+        
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(counts, (1, 1))
+        self.assertEqual(sorted(r.get('id', '') for r in lines), ['', 'a', 'a2'])
+        self.assertIn({'url': "https://youtu.be/bad", 'error': "Invalid"}, lines)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive concurrency controller.
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch import BatchDownloader
+from concurrency import AdaptiveConcurrency, is_throttling_error
+
+
+class FakeClock:
+    """Clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    """Test cases for AdaptiveConcurrency."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def make(self, **kwargs):
+        options = dict(min_jobs=1, max_jobs=4, max_fragments=3, interval=5, hold_intervals=2, clock=self.clock)
+        options.update(kwargs)
+        return AdaptiveConcurrency(**options)
+
+    def step(self, controller, throughput, failures=0, successes=0):
+        """Advance one interval with the given observations and return the decision."""
+        controller.record_speed(throughput)
+        for _ in range(failures):
+            controller.record_result(False)
+        for _ in range(successes):
+            controller.record_result(True)
+        self.clock.now += controller.interval
+        return controller.update()
+
+    def test_only_throttling_failures_count(self):
+        """Test that cancelled and unavailable videos do not cut concurrency, while 429s do."""
+        controller = self.make(initial_jobs=4)
+        for error in ("Download cancelled", "Download failed: ERROR: [youtube] x: Video unavailable",
+                      "Download failed: ERROR: [youtube] x: Private video"):
+            controller.record_result(False, error)
+        controller.record_speed(100)
+        self.clock.now += controller.interval
+        self.assertNotEqual(controller.update().action, "decrease")
+
+        for _ in range(3):
+            controller.record_result(False, "Download failed: ERROR: unable to download video data: "
+                                            "HTTP Error 429: Too Many Requests")
+        controller.record_speed(100)
+        self.clock.now += controller.interval
+        self.assertEqual(controller.update().action, "decrease")
+
+    def test_is_throttling_error(self):
+        """Test the classification of job errors."""
+        self.assertTrue(is_throttling_error("HTTP Error 403: Forbidden"))
+        self.assertTrue(is_throttling_error("Download failed: The read operation timed out"))
+        self.assertFalse(is_throttling_error("Download cancelled"))
+        self.assertFalse(is_throttling_error("Video unavailable. This video has been removed"))
+
+    def test_no_update_before_interval(self):
+        """Test that update() waits for a full interval."""
+        controller = self.make()
+        controller.record_speed(100)
+        self.clock.now += 1
+        self.assertIsNone(controller.update())
+
+    def test_additive_increase_jobs_then_fragments(self):
+        """Test that growing throughput adds jobs up to the bound, then fragments."""
+        controller = self.make()
+        controller.acquire()
+        throughput = 100.0
+        for _ in range(5):
+            self.assertEqual(self.step(controller, throughput).action, "increase")
+            throughput *= 1.5
+        self.assertEqual((controller.jobs, controller.fragments), (4, 3))
+        self.assertEqual(self.step(controller, throughput).reason, "at maximum")
+
+    def test_revert_step_without_gain(self):
+        """Test that a step that brings no throughput is taken back, then probing pauses."""
+        controller = self.make()
+        controller.acquire()
+        self.step(controller, 100)
+        self.assertEqual(controller.jobs, 2)
+
+        decision = self.step(controller, 101)
+        self.assertEqual(decision.action, "revert")
+        self.assertEqual(controller.jobs, 1)
+        self.assertEqual([self.step(controller, 100).action for _ in range(3)], ["hold", "hold", "increase"])
+
+    def test_multiplicative_decrease_on_errors(self):
+        """Test that a high failure rate halves jobs and fragments, within the minimum."""
+        controller = self.make(max_jobs=8, initial_jobs=8, max_fragments=4)
+        controller.fragments = 4
+
+        decision = self.step(controller, 1000, failures=3, successes=2)
+        self.assertEqual(decision.action, "decrease")
+        self.assertEqual((controller.jobs, controller.fragments), (4, 2))
+        self.assertAlmostEqual(decision.error_rate, 0.6)
+        for _ in range(3):
+            self.step(controller, 1000, failures=1)
+        self.assertEqual((controller.jobs, controller.fragments), (1, 1))
+
+    def test_idle_controller_holds(self):
+        """Test that nothing is probed while no job runs."""
+        controller = self.make()
+        self.assertEqual(self.step(controller, 0).reason, "idle")
+        self.assertEqual(controller.jobs, 1)
+
+    def test_metrics(self):
+        """Test that metrics report limits, observations and decision counts."""
+        controller = self.make()
+        controller.acquire()
+        controller.record_speed(100)
+        controller.record_speed(300)
+        self.clock.now += 5
+        controller.update()
+
+        metrics = controller.metrics()
+        self.assertEqual(metrics["jobs"], 2)
+        self.assertEqual(metrics["active"], 1)
+        self.assertEqual(metrics["throughput"], 200)
+        self.assertEqual(metrics["decisions"]["increase"], 1)
+        self.assertEqual(len(controller.history()), 1)
+
+    def test_acquire_respects_limit(self):
+        """Test that slots beyond the job limit wait until one is released or the limit rises."""
+        controller = self.make(initial_jobs=1)
+        self.assertTrue(controller.acquire())
+        self.assertFalse(controller.acquire(timeout=0.05))
+
+        waiter = threading.Thread(target=controller.acquire)
+        waiter.start()
+        controller.release()
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(controller.active, 1)
+
+    def test_invalid_bounds(self):
+        """Test that inconsistent bounds are rejected."""
+        with self.assertRaises(ValueError):
+            AdaptiveConcurrency(min_jobs=3, max_jobs=2)
+
+
+class TestBatchWithController(unittest.TestCase):
+    """Test cases for BatchDownloader driven by a controller."""
+
+    def test_running_jobs_follow_limit_and_fragments(self):
+        """Test that no more jobs run than the controller allows and jobs get its fragment count."""
+        controller = AdaptiveConcurrency(min_jobs=1, max_jobs=4, initial_jobs=2, max_fragments=3, interval=60)
+        controller.fragments = 3
+        lock = threading.Lock()
+        running = []
+        peak = []
+        fragments = []
+
+        def make_bot():
+            bot = MagicMock()
+            bot.download_speed = 1000
+
+            def download(url, info=None):
+                with lock:
+                    running.append(url)
+                    peak.append(len(running))
+                    fragments.append(bot.concurrent_fragments)
+                time.sleep(0.02)
+                with lock:
+                    running.remove(url)
+                return True, url
+
+            bot.download.side_effect = download
+            return bot
+
+        batch = BatchDownloader(make_bot, controller=controller)
+        self.assertEqual(batch.run([f"https://youtu.be/{i}" for i in range(12)]), (12, 0))
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(set(fragments), {3})
+        self.assertEqual(controller.active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
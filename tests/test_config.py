@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Tests for the logging pipeline set up by config.setup_logging.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from config import JsonFormatter, RotatingLogFileHandler, load_config, setup_logging
+
+class TestSetupLogging(unittest.TestCase):
+    """Test cases for setup_logging and its handlers."""
+
+    def setUp(self):
+        """Keep the root logger's handlers so each test can replace them."""
+        self.test_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_dir, "ytd.log")
+        root = logging.getLogger()
+        self.saved = (root.handlers[:], root.level)
+
+    def tearDown(self):
+        """Stop the pipeline and restore the root logger."""
+        config._stop_listener()
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.handlers[:], level = self.saved
+        root.setLevel(level)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def make_config(self, **overrides):
+        settings = {"LOG_LEVEL": "INFO", "LOG_FILE": self.log_file, "CONSOLE_OUTPUT": False,
+                    "LOG_FORMAT": "text", "LOG_MAX_BYTES": 0, "LOG_ROTATE_HOURS": 0, "LOG_BACKUP_COUNT": 2}
+        settings.update(overrides)
+        return settings
+
+    def test_log_calls_do_not_wait_for_the_file(self):
+        """Test that logging returns while the file handler is blocked."""
+        listener = setup_logging(self.make_config())
+        file_handler = listener.handlers[1]
+        release = threading.Event()
+        original_emit = file_handler.emit
+
+        def slow_emit(record):
+            release.wait(5)
+            original_emit(record)
+
+        with patch.object(file_handler, "emit", side_effect=slow_emit):
+            start = time.monotonic()
+            for i in range(100):
+                logging.getLogger("test").info("message %d", i)
+            self.assertLess(time.monotonic() - start, 1)
+            release.set()
+            config._stop_listener()
+
+        with open(self.log_file, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 100)
+        self.assertTrue(lines[-1].endswith("test - INFO - message 99"))
+
+    def test_json_format(self):
+        """Test that LOG_FORMAT=json writes one JSON object per line with extra fields."""
+        setup_logging(self.make_config(LOG_FORMAT="json"))
+        logging.getLogger("ytd").warning("slow download of %s", "abc", extra={"speed": 12.5})
+        config._stop_listener()
+
+        with open(self.log_file, encoding="utf-8") as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry["level"], "WARNING")
+        self.assertEqual(entry["logger"], "ytd")
+        self.assertEqual(entry["message"], "slow download of abc")
+        self.assertEqual(entry["speed"], 12.5)
+
+    def test_json_formatter_includes_exception(self):
+        """Test that tracebacks are kept in their own field."""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.getLogger("ytd").makeRecord("ytd", logging.ERROR, __file__, 1, "failed", (),
+                                                        sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertIn("ValueError: boom", entry["exception"])
+
+    def test_setup_twice_replaces_pipeline(self):
+        """Test that a second call does not duplicate handlers."""
+        setup_logging(self.make_config())
+        setup_logging(self.make_config())
+        logging.getLogger("test").info("once")
+        config._stop_listener()
+
+        self.assertEqual(len(logging.getLogger().handlers), 1)
+        with open(self.log_file, encoding="utf-8") as f:
+            self.assertEqual(f.read().count("once"), 1)
+
+class TestRotatingLogFileHandler(unittest.TestCase):
+    """Test cases for size- and time-based rotation."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_dir, "ytd.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def emit(self, handler, message):
+        handler.emit(logging.makeLogRecord({"msg": message}))
+
+    def test_rotates_by_size(self):
+        """Test that the file rolls over once it would exceed max_bytes."""
+        handler = RotatingLogFileHandler(self.log_file, max_bytes=100, backup_count=2)
+        try:
+            for i in range(10):
+                self.emit(handler, f"{i:02d}" + "x" * 30)
+        finally:
+            handler.close()
+
+        self.assertTrue(os.path.exists(self.log_file + ".1"))
+        self.assertTrue(os.path.exists(self.log_file + ".2"))
+        self.assertFalse(os.path.exists(self.log_file + ".3"))
+        self.assertLessEqual(os.path.getsize(self.log_file), 100)
+
+    def test_rotates_by_age(self):
+        """Test that the file rolls over once rotate_seconds have passed."""
+        handler = RotatingLogFileHandler(self.log_file, backup_count=1, rotate_seconds=3600)
+        try:
+            self.emit(handler, "old")
+            with patch("config.time.time", return_value=time.time() + 3601):
+                self.emit(handler, "new")
+        finally:
+            handler.close()
+
+        with open(self.log_file + ".1", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old\n")
+        with open(self.log_file, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "new\n")
+
+    def test_age_counts_from_existing_file(self):
+        """Test that a new handler on an old file rotates it instead of restarting the clock."""
+        with open(self.log_file, "w", encoding="utf-8") as f:
+            f.write("old\n")
+        started = time.time() - 7200
+        os.utime(self.log_file, (started, started))
+        handler = RotatingLogFileHandler(self.log_file, backup_count=1, rotate_seconds=3600)
+        try:
+            self.emit(handler, "new")
+        finally:
+            handler.close()
+
+        with open(self.log_file + ".1", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old\n")
+
+    def test_fractional_rotate_hours(self):
+        """Test that LOG_ROTATE_HOURS accepts fractions of an hour."""
+        with patch.dict(os.environ, {"LOG_ROTATE_HOURS": "0.5", "LOG_FILE": ""}):
+            self.assertEqual(load_config()["LOG_ROTATE_HOURS"], 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,8 @@ Tests for YouTube Downloader Bot.
 
 import os
 import sys
+import shutil
+import threading
 import unittest
 import tempfile
 from unittest.mock import patch, MagicMock
@@ -12,7 +14,8 @@ from unittest.mock import patch, MagicMock
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from youtube_downloader_bot import YouTubeDownloaderBot
+from youtube_downloader_bot import JobCancelled, YouTubeDownloaderBot, audio_output_path, build_audio_options, parse_time_range
+from youtube_downloader_bot import SharedCache, open_youtube_dl
 
 class TestYouTubeDownloaderBot(unittest.TestCase):
     """Test cases for YouTubeDownloaderBot class."""
@@ -26,9 +29,7 @@ class TestYouTubeDownloaderBot(unittest.TestCase):
     def tearDown(self):
         """Clean up after tests."""
         # Clean up the temporary directory
-        for file in os.listdir(self.test_dir):
-            os.remove(os.path.join(self.test_dir, file))
-        os.rmdir(self.test_dir)
+        shutil.rmtree(self.test_dir)
     
     def test_initialization(self):
         """Test that the downloader initializes with correct defaults."""
@@ -159,6 +160,345 @@ class TestYouTubeDownloaderBot(unittest.TestCase):
         }
         mock_youtube_dl.assert_called_once()
 
+    @patch('yt_dlp.YoutubeDL')
+    def test_extract_metadata_video(self, mock_youtube_dl):
+        """Test metadata extraction for a single video without downloading."""
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {
+            'id': 'dQw4w9WgXcQ', 'title': 'Test Video', 'duration': 212,
+            'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+            'filesize_approx': 1000,
+            'formats': [{'format_id': '18', 'ext': 'mp4', 'filesize': 1000}],
+        }
+        
+        records = list(self.downloader.extract_metadata("https://www.youtube.com/watch?v=dQw4w9WgXcQ"))
+        
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['id'], 'dQw4w9WgXcQ')
+        self.assertEqual(records[0]['filesize'], 1000)
+        self.assertEqual(records[0]['formats'][0]['format_id'], '18')
+        mock_instance.extract_info.assert_called_once_with(
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ", download=False)
+        called_opts = mock_youtube_dl.call_args[0][0]
+        self.assertEqual(called_opts['extract_flat'], 'in_playlist')
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_extract_metadata_playlist(self, mock_youtube_dl):
+        """Test that playlists are listed flat, one record per entry."""
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {
+            '_type': 'playlist', 'id': 'PL1', 'title': 'List',
+            'entries': [{'id': 'a', 'title': 'A'}, {'id': 'b', 'title': 'B', 'duration': 10}],
+        }
+        
+        records = list(self.downloader.extract_metadata("https://www.youtube.com/playlist?list=PL1"))
+        
+        self.assertEqual([r['id'] for r in records], ['a', 'b'])
+        self.assertEqual(records[1]['duration'], 10)
+        self.assertEqual(records[0]['playlist_id'], 'PL1')
+        self.assertNotIn('formats', records[0])
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_download_with_side_artifacts(self, mock_youtube_dl):
+        """Test that side artifacts are fetched alongside the media download."""
+        self.downloader.write_thumbnail = True
+        self.downloader.write_info_json = True
+        
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_info = {'id': 'x', 'title': 'Test Video', 'ext': 'mp4',
+                     'thumbnail': 'https://i.ytimg.com/vi/x/maxresdefault.jpg'}
+        mock_instance.extract_info.return_value = mock_info
+        mock_instance.process_ie_result.return_value = mock_info
+        mock_instance.prepare_filename.return_value = os.path.join(self.test_dir, 'Test Video.mp4')
+        # Side artifacts share the media download's YoutubeDL and its connections
+        mock_instance.urlopen.return_value.read.return_value = b'jpeg'
+        mock_instance.sanitize_info.return_value = {'id': 'x'}
+        
+        # An existing info JSON must not be fetched again
+        info_path = os.path.join(self.test_dir, 'Test Video.info.json')
+        with open(info_path, 'w') as f:
+            f.write('{}')
+        
+        success, _ = self.downloader.download("https://www.youtube.com/watch?v=x")
+        
+        self.assertTrue(success)
+        mock_instance.extract_info.assert_called_once_with("https://www.youtube.com/watch?v=x", download=False)
+        mock_instance.process_ie_result.assert_called_once_with(mock_info, download=True)
+        with open(os.path.join(self.test_dir, 'Test Video.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'jpeg')
+        with open(info_path) as f:
+            self.assertEqual(f.read(), '{}')
+        mock_instance.urlopen.assert_called_once_with('https://i.ytimg.com/vi/x/maxresdefault.jpg')
+        self.assertEqual(mock_youtube_dl.call_count, 1)
+        self.assertEqual(self.downloader.failed_side_artifacts, [])
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_failed_side_artifact_is_recorded(self, mock_youtube_dl):
+        """Test that a failed side artifact is recorded without failing the download."""
+        self.downloader.write_thumbnail = True
+        
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_info = {'id': 'x', 'title': 'Test Video', 'ext': 'mp4',
+                     'thumbnail': 'https://i.ytimg.com/vi/x/maxresdefault.jpg'}
+        mock_instance.extract_info.return_value = mock_info
+        mock_instance.process_ie_result.return_value = mock_info
+        mock_instance.prepare_filename.return_value = os.path.join(self.test_dir, 'Test Video.mp4')
+        mock_instance.urlopen.side_effect = OSError("HTTP Error 404")
+        
+        success, _ = self.downloader.download("https://www.youtube.com/watch?v=x")
+        
+        self.assertTrue(success)
+        self.assertEqual(self.downloader.failed_side_artifacts, [('x', 'thumbnail', 'HTTP Error 404')])
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_download_atomic_writes(self, mock_youtube_dl):
+        """Test that atomic writes stage into a directory inside save_directory."""
+        downloader = YouTubeDownloaderBot(save_directory=self.test_dir, atomic_writes=True)
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {'title': 'Test Video', 'ext': 'mp4'}
+        mock_instance.prepare_filename.return_value = os.path.join(self.test_dir, 'Test Video.mp4')
+        
+        success, _ = downloader.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        
+        self.assertTrue(success)
+        called_opts = mock_youtube_dl.call_args[0][0]
+        self.assertEqual(called_opts['paths'], {'home': self.test_dir, 'temp': downloader.staging_directory})
+        self.assertEqual(called_opts['outtmpl'], '%(title)s.%(ext)s')
+        self.assertEqual(os.path.dirname(downloader.staging_directory), self.test_dir)
+        self.assertTrue(os.path.isdir(downloader.staging_directory))
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_side_artifacts_staged_with_atomic_writes(self, mock_youtube_dl):
+        """Test that side artifacts are written via the staging directory."""
+        downloader = YouTubeDownloaderBot(save_directory=self.test_dir, atomic_writes=True,
+                                          write_thumbnail=True)
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_info = {'id': 'x', 'title': 'Test Video', 'ext': 'mp4',
+                     'thumbnail': 'https://i.ytimg.com/vi/x/maxresdefault.jpg'}
+        mock_instance.extract_info.return_value = mock_info
+        mock_instance.process_ie_result.return_value = mock_info
+        mock_instance.prepare_filename.return_value = os.path.join(self.test_dir, 'Test Video.mp4')
+        mock_instance.urlopen.return_value.read.return_value = b'jpeg'
+        
+        written = []
+        real_open = open
+        
+        def tracking_open(path, *args, **kwargs):
+            written.append(path)
+            return real_open(path, *args, **kwargs)
+        
+        with patch('builtins.open', side_effect=tracking_open):
+            success, _ = downloader.download("https://www.youtube.com/watch?v=x")
+        
+        self.assertTrue(success)
+        self.assertEqual(written, [os.path.join(downloader.staging_directory, 'Test Video.jpg.part')])
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'Test Video.jpg')))
+    
+    @patch('youtube_downloader_bot._preallocate')
+    def test_progress_hook_preallocates_once(self, mock_preallocate):
+        """Test that the partial file is preallocated once its size is known."""
+        self.downloader.atomic_writes = True
+        event = {'status': 'downloading', 'downloaded_bytes': 1, 'total_bytes': 100,
+                 'tmpfilename': 'video.mp4.part'}
+        
+        self.downloader.download_progress_hook(event)
+        self.downloader.download_progress_hook(dict(event, downloaded_bytes=2))
+        
+        mock_preallocate.assert_called_once_with('video.mp4.part', 100)
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_extract_metadata_channel_tabs(self, mock_youtube_dl):
+        """Test that a bare channel URL reports the videos of its tabs, not the tabs."""
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        tabs = {
+            '_type': 'playlist', 'id': 'UC1', 'title': 'Channel',
+            'entries': [
+                {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': 'https://www.youtube.com/@name/videos'},
+                {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': 'https://www.youtube.com/@name/shorts'},
+            ],
+        }
+        videos = {'_type': 'playlist', 'id': 'UC1', 'title': 'Channel - Videos',
+                  'entries': [{'_type': 'url', 'ie_key': 'Youtube', 'id': 'a', 'duration': 10}]}
+        shorts = {'_type': 'playlist', 'id': 'UC1', 'title': 'Channel - Shorts',
+                  'entries': [{'_type': 'url', 'ie_key': 'Youtube', 'id': 'b', 'duration': 5}]}
+        mock_instance.extract_info.side_effect = [tabs, videos, shorts]
+        
+        records = list(self.downloader.extract_metadata("https://www.youtube.com/@name"))
+        
+        self.assertEqual([(r['id'], r['duration']) for r in records], [('a', 10), ('b', 5)])
+        self.assertEqual(records[0]['playlist_title'], 'Channel - Videos')
+    
+    def test_cancel_from_progress_hook(self):
+        """Test that a cancelled download stops at the next chunk."""
+        event = {'status': 'downloading', 'downloaded_bytes': 1, 'total_bytes': 100}
+        self.downloader.download_progress_hook(event)
+        
+        self.downloader.cancel()
+        with self.assertRaises(JobCancelled):
+            self.downloader.download_progress_hook(event)
+    
+    def test_pause_blocks_progress_hook_until_resume(self):
+        """Test that a paused download waits in the progress hook."""
+        event = {'status': 'downloading', 'downloaded_bytes': 1, 'total_bytes': 100}
+        self.downloader.pause()
+        hook = threading.Thread(target=self.downloader.download_progress_hook, args=(event,))
+        hook.start()
+        hook.join(0.1)
+        self.assertTrue(hook.is_alive())
+        
+        self.downloader.resume()
+        hook.join(5)
+        self.assertFalse(hook.is_alive())
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_cancelled_download_result(self, mock_youtube_dl):
+        """Test that a cancelled download reports it and resets the control."""
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_instance.extract_info.side_effect = JobCancelled()
+        self.downloader.cancel()
+        
+        success, result = self.downloader.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        
+        self.assertFalse(success)
+        self.assertEqual(result, "Download cancelled")
+        self.assertFalse(self.downloader.control.cancelled)
+    
+    @patch('engine.shutil.which', return_value='/usr/bin/ffmpeg')
+    @patch('yt_dlp.YoutubeDL')
+    def test_download_audio_native_stream_copy(self, mock_youtube_dl, mock_which):
+        """Test that native audio mode stream-copies the best audio stream."""
+        downloader = YouTubeDownloaderBot(save_directory=self.test_dir, format_type="MP3",
+                                          audio_codec="native")
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {'title': 'Test Audio', 'ext': 'webm', 'acodec': 'opus'}
+        mock_instance.prepare_filename.return_value = os.path.join(self.test_dir, 'Test Audio.webm')
+        
+        success, result = downloader.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        
+        self.assertTrue(success)
+        self.assertEqual(result, os.path.join(self.test_dir, 'Test Audio.opus'))
+        called_opts = mock_youtube_dl.call_args[0][0]
+        self.assertEqual(called_opts['format'], 'bestaudio/best')
+        self.assertEqual(called_opts['postprocessors'][0]['preferredcodec'], 'best')
+    
+    @patch('engine.shutil.which', return_value=None)
+    @patch('yt_dlp.YoutubeDL')
+    def test_download_audio_native_without_ffmpeg(self, mock_youtube_dl, mock_which):
+        """Test that native audio mode keeps the stream as-is when ffmpeg is missing."""
+        downloader = YouTubeDownloaderBot(save_directory=self.test_dir, format_type="MP3",
+                                          audio_codec="native")
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {'title': 'Test Audio', 'ext': 'm4a', 'acodec': 'mp4a.40.2'}
+        mock_instance.prepare_filename.return_value = os.path.join(self.test_dir, 'Test Audio.m4a')
+        
+        success, result = downloader.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        
+        self.assertTrue(success)
+        self.assertEqual(result, os.path.join(self.test_dir, 'Test Audio.m4a'))
+        self.assertNotIn('postprocessors', mock_youtube_dl.call_args[0][0])
+    
+    def test_build_audio_options(self):
+        """Test format and postprocessor choice for each audio codec."""
+        self.assertEqual(build_audio_options("mp3")['postprocessors'][0]['preferredcodec'], 'mp3')
+        self.assertEqual(build_audio_options("m4a")['format'], 'bestaudio[ext=m4a]/bestaudio/best')
+        self.assertEqual(build_audio_options("opus")['format'], 'bestaudio[acodec=opus]/bestaudio/best')
+        with self.assertRaises(ValueError):
+            build_audio_options("wav")
+        self.assertEqual(audio_output_path('a.m4a', {'acodec': 'mp4a.40.2'}, "native"), 'a.m4a')
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_download_section(self, mock_youtube_dl):
+        """Test that start and end times download only that section."""
+        mock_instance = MagicMock()
+        mock_youtube_dl.return_value.__enter__.return_value = mock_instance
+        section_info = {'title': 'Test Video', 'ext': 'mp4', 'section_start': 90.0, 'section_end': 120.0}
+        mock_instance.extract_info.return_value = {'title': 'Test Video', 'ext': 'mp4',
+                                                   'requested_downloads': [section_info]}
+        mock_instance.prepare_filename.side_effect = lambda info: os.path.join(
+            self.test_dir, f"Test Video [{info.get('section_start')}-{info.get('section_end')}].mp4")
+        
+        success, result = self.downloader.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                                                   start_time="1:30", end_time=120)
+        
+        self.assertTrue(success)
+        self.assertEqual(result, os.path.join(self.test_dir, "Test Video [90.0-120.0].mp4"))
+        called_opts = mock_youtube_dl.call_args[0][0]
+        self.assertTrue(called_opts['force_keyframes_at_cuts'])
+        self.assertIn('[%(section_start)s-%(section_end)s]', called_opts['outtmpl'])
+        ranges = list(called_opts['download_ranges']({'duration': 3600}, None))
+        self.assertEqual([(r['start_time'], r['end_time']) for r in ranges], [(90.0, 120.0)])
+    
+    def test_parse_time_range(self):
+        """Test parsing and validation of section bounds."""
+        self.assertIsNone(parse_time_range())
+        self.assertEqual(parse_time_range("1:00:05"), (3605.0, None))
+        self.assertEqual(parse_time_range(end_time="30"), (0.0, 30.0))
+        with self.assertRaises(ValueError):
+            parse_time_range("2:00", "1:00")
+        with self.assertRaises(ValueError):
+            parse_time_range("soon")
+        success, result = self.downloader.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                                                   start_time="soon")
+        self.assertFalse(success)
+        self.assertEqual(result, "Invalid start time: soon")
+    
+    def test_shared_cache_round_trip(self):
+        """Test that cache entries written under a lock are read back by another instance."""
+        cache_dir = os.path.join(self.test_dir, "cache")
+        writer = open_youtube_dl({'cachedir': cache_dir, 'quiet': True})
+        reader = open_youtube_dl({'cachedir': cache_dir, 'quiet': True})
+        self.assertIsInstance(writer.cache, SharedCache)
+        
+        self.assertIsNone(reader.cache.load('youtube-sigfuncs', 'js_abc'))
+        writer.cache.store('youtube-sigfuncs', 'js_abc', [3, 2, 1])
+        self.assertEqual(reader.cache.load('youtube-sigfuncs', 'js_abc'), [3, 2, 1])
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, 'youtube-sigfuncs', 'js_abc.json.lock')))
+    
+    def test_shared_cache_concurrent_writers(self):
+        """Test that readers never see a corrupt entry while writers replace it."""
+        cache_dir = os.path.join(self.test_dir, "cache")
+        data = list(range(20000))
+        errors = []
+        
+        def write():
+            ydl = open_youtube_dl({'cachedir': cache_dir, 'quiet': True})
+            for _ in range(20):
+                ydl.cache.store('youtube-nsig', 'player', data)
+        
+        def read():
+            ydl = open_youtube_dl({'cachedir': cache_dir, 'quiet': True})
+            ydl.report_warning = errors.append
+            for _ in range(50):
+                value = ydl.cache.load('youtube-nsig', 'player')
+                if value not in (None, data):
+                    errors.append(value)
+        
+        threads = [threading.Thread(target=write) for _ in range(3)] + [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+    
+    @patch('yt_dlp.YoutubeDL')
+    def test_cache_directory_is_passed_to_yt_dlp(self, mock_youtube_dl):
+        """Test that the configured cache directory reaches every YoutubeDL instance."""
+        downloader = YouTubeDownloaderBot(save_directory=self.test_dir, cache_directory="/shared/cache")
+        mock_youtube_dl.return_value.__enter__.return_value.extract_info.return_value = {'title': 'T', 'ext': 'mp4'}
+        
+        downloader.resolve("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        self.assertEqual(mock_youtube_dl.call_args[0][0]['cachedir'], "/shared/cache")
+    
     def test_invalid_url(self):
         """Test that invalid URLs return the expected error."""
         # Test with empty URL
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared download engine.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine import DownloadJob, JobCancelled, JobControl, run_download
+
+class TestRunDownload(unittest.TestCase):
+    """Test cases for DownloadJob and run_download."""
+    
+    def setUp(self):
+        """Set up a mocked YoutubeDL."""
+        patcher = patch('yt_dlp.YoutubeDL')
+        self.mock_youtube_dl = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ydl = MagicMock()
+        self.mock_youtube_dl.return_value.__enter__.return_value = self.ydl
+        self.ydl.prepare_filename.return_value = '/videos/Test Video.mp4'
+    
+    def installed_hook(self):
+        return self.mock_youtube_dl.call_args[0][0]['progress_hooks'][0]
+    
+    def test_sinks_receive_progress_events(self):
+        """Test that every sink sees each event, in order."""
+        seen = []
+        event = {'status': 'downloading', 'downloaded_bytes': 1, 'total_bytes': 2}
+        self.ydl.extract_info.side_effect = lambda url, download: (
+            self.installed_hook()(event) or {'title': 'Test Video', 'ext': 'mp4'})
+        
+        result = run_download(DownloadJob("https://youtu.be/a", save_directory="/videos"),
+                              sinks=[lambda d: seen.append(("first", d)), lambda d: seen.append(("second", d))])
+        
+        self.assertEqual(result.path, '/videos/Test Video.mp4')
+        self.assertEqual(seen, [("first", event), ("second", event)])
+    
+    def test_cancel_is_reported_in_result(self):
+        """Test that cancelling through the job's control ends the download as cancelled."""
+        control = JobControl()
+        control.cancel()
+        sink = MagicMock()
+        
+        def extract_info(url, download):
+            self.installed_hook()({'status': 'downloading'})
+        
+        self.ydl.extract_info.side_effect = extract_info
+        result = run_download(DownloadJob("https://youtu.be/a", control=control), sinks=[sink])
+        
+        self.assertTrue(result.cancelled)
+        self.assertEqual(result.error, JobCancelled.msg)
+        sink.assert_not_called()
+    
+    def test_errors_are_returned(self):
+        """Test that extraction errors become failed results instead of exceptions."""
+        self.ydl.extract_info.side_effect = Exception("Video unavailable")
+        result = run_download(DownloadJob("https://youtu.be/a"))
+        self.assertFalse(result.success)
+        self.assertEqual(result.error, "Video unavailable")
+    
+    def test_resolved_info_and_custom_process(self):
+        """Test that resolved info is not extracted again and process replaces the default step."""
+        info = {'title': 'Test Video', 'ext': 'mp4'}
+        self.ydl.process_ie_result.return_value = info
+        run_download(DownloadJob("https://youtu.be/a", info=info))
+        self.ydl.process_ie_result.assert_called_once_with(info, download=True)
+        self.ydl.extract_info.assert_not_called()
+        
+        process = MagicMock(return_value=info)
+        job = DownloadJob("https://youtu.be/a")
+        self.assertTrue(run_download(job, process=process).success)
+        self.assertIs(process.call_args[0][1], job)
+    
+    def test_job_options(self):
+        """Test the yt-dlp options built for staging and the shared cache."""
+        job = DownloadJob("https://youtu.be/a", save_directory="/videos", staging_directory="/videos/.stage",
+                          cache_directory="/cache", quiet=True)
+        opts = job.ydl_options([])
+        self.assertEqual(opts['paths'], {'home': "/videos", 'temp': "/videos/.stage"})
+        self.assertEqual(opts['outtmpl'], '%(title)s.%(ext)s')
+        self.assertEqual(opts['cachedir'], "/cache")
+        self.assertTrue(opts['quiet'])
+
+    def test_sharded_layout(self):
+        """Test that sharded layouts name files by ID inside subdirectories."""
+        opts = DownloadJob("https://youtu.be/a", save_directory="/videos", output_layout="id").ydl_options([])
+        self.assertEqual(opts['outtmpl'], os.path.join("/videos", "%(id).2s", "%(id)s.%(ext)s"))
+        with self.assertRaises(ValueError):
+            DownloadJob("https://youtu.be/a", output_layout="by-title")
+
+if __name__ == "__main__":
+    unittest.main()
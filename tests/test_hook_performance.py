@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Performance regression tests for the progress hooks.
+
+yt-dlp calls the progress hook for every chunk it writes, so the cost of the
+hook bounds download throughput on fast links. These tests drive each hook
+with synthetic events and fail when the mean cost per event exceeds a budget.
+The budget can be raised on slow machines with YTD_HOOK_BUDGET_US.
+
+Run this module directly to print per-event timings instead.
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import shutil
+import unittest
+from contextlib import redirect_stdout
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from youtube_downloader_bot import JobControl, YouTubeDownloaderBot
+
+try:
+    from youtube_downloader import ModernYouTubeDownloader
+except ImportError:  # tkinter is not installed
+    ModernYouTubeDownloader = None
+
+# Synthetic events per measurement (a 10 GB file in 64 KiB chunks is ~160k events)
+EVENT_COUNT = 200_000
+
+# Mean cost allowed per event, in microseconds
+HOOK_BUDGET_US = float(os.environ.get("YTD_HOOK_BUDGET_US", "5"))
+
+
+def synthetic_events(count=EVENT_COUNT, chunk=64 * 1024):
+    """Build the progress events of one download of count chunks."""
+    total = count * chunk
+    events = [
+        {'status': 'downloading', 'downloaded_bytes': (i + 1) * chunk, 'total_bytes': total,
+         'speed': 1.25e9, 'tmpfilename': 'video.mp4.part', 'filename': 'video.mp4'}
+        for i in range(count)
+    ]
+    events.append({'status': 'finished', 'total_bytes': total, 'filename': 'video.mp4'})
+    return events
+
+
+def time_per_event(hook, events):
+    """Run every event through hook and return the mean cost in microseconds."""
+    start = time.perf_counter()
+    for event in events:
+        hook(event)
+    return (time.perf_counter() - start) / len(events) * 1e6
+
+
+class _FakeRoot:
+    """Stands in for the Tk root, counting the callbacks the hook schedules."""
+
+    def __init__(self):
+        self.scheduled = 0
+
+    def after(self, delay, callback, *args):
+        self.scheduled += 1
+
+
+class TestHookPerformance(unittest.TestCase):
+    """Per-event cost budgets for the progress hooks."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.events = synthetic_events()
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_bot_hook_cost(self):
+        """Test the cost and output volume of YouTubeDownloaderBot.download_progress_hook."""
+        bot = YouTubeDownloaderBot(save_directory=self.test_dir)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            cost = time_per_event(bot.download_progress_hook, self.events)
+
+        self.assertLess(cost, HOOK_BUDGET_US, f"bot hook costs {cost:.2f} us/event")
+        # One line per 10% step plus the completion line, however many chunks there are
+        self.assertLessEqual(len(out.getvalue().splitlines()), 12)
+        self.assertEqual(bot.job_downloaded_bytes, self.events[-1]['total_bytes'])
+
+    @unittest.skipIf(ModernYouTubeDownloader is None, "tkinter is not available")
+    def test_gui_hook_cost(self):
+        """Test the cost and redraw rate of ModernYouTubeDownloader.download_progress_hook."""
+        # Build the instance without a display; the hook only needs these attributes
+        app = ModernYouTubeDownloader.__new__(ModernYouTubeDownloader)
+        app.root = _FakeRoot()
+        app.job_control = JobControl()
+        app._last_ui_update = 0.0
+
+        start = time.monotonic()
+        cost = time_per_event(app.download_progress_hook, self.events)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(cost, HOOK_BUDGET_US, f"GUI hook costs {cost:.2f} us/event")
+        # Redraws are throttled to the UI interval, not scheduled per chunk
+        self.assertLessEqual(app.root.scheduled, elapsed / 0.1 + 2)
+
+
+if __name__ == "__main__":
+    events = synthetic_events()
+    directory = tempfile.mkdtemp()
+    try:
+        bot = YouTubeDownloaderBot(save_directory=directory)
+        # The bot prints its own progress lines; keep them out of the report
+        with redirect_stdout(io.StringIO()):
+            cost = time_per_event(bot.download_progress_hook, events)
+        print(f"bot hook: {cost:.3f} us/event")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if ModernYouTubeDownloader is not None:
+        app = ModernYouTubeDownloader.__new__(ModernYouTubeDownloader)
+        app.root = _FakeRoot()
+        app.job_control = JobControl()
+        app._last_ui_update = 0.0
+        print(f"GUI hook: {time_per_event(app.download_progress_hook, events):.3f} us/event")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared lease-based job queue.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine import JobControl
+from job_queue import JobQueue, run_worker
+
+class TestJobQueue(unittest.TestCase):
+    """Test cases for JobQueue."""
+    
+    def setUp(self):
+        """Set up a queue with a controllable clock."""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "jobs.db")
+        self.now = [1000.0]
+        self.queue = self.open_queue()
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def open_queue(self, **kwargs):
+        # Each JobQueue stands in for a separate node sharing the database
+        job_queue = JobQueue(self.path, lease_seconds=60, clock=lambda: self.now[0], **kwargs)
+        self.addCleanup(job_queue.close)
+        return job_queue
+    
+    def test_add_skips_duplicates(self):
+        """Test that a URL is only queued once."""
+        self.assertEqual(self.queue.add(["https://youtu.be/a", "https://youtu.be/b"]), 2)
+        self.assertEqual(self.queue.add(["https://youtu.be/b", "https://youtu.be/c"]), 1)
+        self.assertEqual(self.queue.counts()['pending'], 3)
+    
+    def test_claim_is_exclusive(self):
+        """Test that a leased job is not handed to another node."""
+        other = self.open_queue()
+        self.queue.add(["https://youtu.be/a"])
+        
+        lease = self.queue.claim("node-1")
+        self.assertEqual(lease.url, "https://youtu.be/a")
+        self.assertIsNone(other.claim("node-2"))
+        
+        self.assertTrue(self.queue.complete(lease, True, "/tmp/a.mp4"))
+        self.assertEqual(self.queue.counts()['done'], 1)
+    
+    def test_expired_lease_is_reclaimed_and_old_owner_is_fenced(self):
+        """Test that a crashed node's job moves on and its late result is rejected."""
+        other = self.open_queue()
+        self.queue.add(["https://youtu.be/a"])
+        stale = self.queue.claim("node-1")
+        
+        self.now[0] += 61
+        self.assertIsNone(self.queue.renew(stale))
+        lease = other.claim("node-2")
+        self.assertEqual(lease.job_id, stale.job_id)
+        
+        self.assertFalse(self.queue.complete(stale, True, "late"))
+        self.assertTrue(other.complete(lease, True, "/tmp/a.mp4"))
+    
+    def test_renew_extends_lease(self):
+        """Test that a renewed lease survives past its original expiry."""
+        other = self.open_queue()
+        self.queue.add(["https://youtu.be/a"])
+        lease = self.queue.claim("node-1")
+        
+        self.now[0] += 50
+        lease = self.queue.renew(lease)
+        self.now[0] += 50
+        self.assertIsNone(other.claim("node-2"))
+        self.assertTrue(self.queue.complete(lease, False, "Download failed"))
+        self.assertEqual(self.queue.counts()['failed'], 1)
+    
+    def test_job_fails_after_max_attempts(self):
+        """Test that a job that keeps crashing its workers is given up on."""
+        job_queue = self.open_queue(max_attempts=2)
+        job_queue.add(["https://youtu.be/a"])
+        for _ in range(2):
+            self.assertIsNotNone(job_queue.claim("node"))
+            self.now[0] += 61
+        
+        self.assertIsNone(job_queue.claim("node"))
+        self.assertEqual(job_queue.counts()['failed'], 1)
+    
+    def test_release_returns_job(self):
+        """Test that a released job can be claimed again right away."""
+        self.queue.add(["https://youtu.be/a"])
+        self.assertTrue(self.queue.release(self.queue.claim("node-1")))
+        self.assertIsNotNone(self.queue.claim("node-2"))
+    
+    def test_concurrent_workers_never_share_a_job(self):
+        """Test that workers on several queues download every job exactly once."""
+        urls = [f"https://youtu.be/{i}" for i in range(40)]
+        self.queue.add(urls)
+        downloaded = []
+        lock = threading.Lock()
+        
+        def make_bot():
+            bot = MagicMock()
+            def download(url):
+                with lock:
+                    downloaded.append(url)
+                return True, url
+            bot.download.side_effect = download
+            return bot
+        
+        workers = [
+            threading.Thread(target=run_worker, args=(JobQueue(self.path), make_bot(), f"node-{i}"))
+            for i in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        
+        self.assertEqual(sorted(downloaded), sorted(urls))
+        self.assertEqual(self.queue.counts()['done'], 40)
+    
+    def test_worker_cancels_download_when_lease_is_lost(self):
+        """Test that a worker stops downloading a job another node took over."""
+        job_queue = JobQueue(self.path, lease_seconds=0.06)
+        self.addCleanup(job_queue.close)
+        job_queue.add(["https://youtu.be/a"])
+        cancelled = threading.Event()
+        bot = MagicMock()
+        bot.cancel.side_effect = cancelled.set
+        
+        def download(url):
+            # Simulate another node taking over the job
+            job_queue.renew = lambda lease: None
+            cancelled.wait(5)
+            return False, "Download cancelled"
+        
+        bot.download.side_effect = download
+        self.assertEqual(run_worker(job_queue, bot, "node-1"), 1)
+        self.assertTrue(cancelled.is_set())
+    
+    def test_late_lease_loss_does_not_cancel_next_job(self):
+        """Test that a cancel landing after the bot reset its control does not carry over to the next job."""
+        job_queue = JobQueue(self.path, lease_seconds=0.06)
+        self.addCleanup(job_queue.close)
+        job_queue.add(["https://youtu.be/a", "https://youtu.be/b"])
+        renew = job_queue.renew
+        cancelled = threading.Event()
+        bot = MagicMock()
+        bot.control = JobControl()
+        bot.cancel.side_effect = lambda: (bot.control.cancel(), cancelled.set())
+        seen = {}
+        
+        def download(url):
+            seen[url] = bot.control.cancelled
+            if url.endswith("a"):
+                # The bot's own reset has run; the lease is lost before download() returns
+                job_queue.renew = lambda lease: None
+                cancelled.wait(5)
+                job_queue.renew = renew
+            return True, "ok"
+        
+        bot.download.side_effect = download
+        run_worker(job_queue, bot, "node-1")
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(seen, {"https://youtu.be/a": False, "https://youtu.be/b": False})
+
+if __name__ == "__main__":
+    unittest.main()
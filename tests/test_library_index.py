@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental library index.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import library_index
+from library_index import LibraryIndex, file_sha256
+from youtube_downloader_bot import YouTubeDownloaderBot
+from engine import DownloadResult
+
+class TestLibraryIndex(unittest.TestCase):
+    """Test cases for LibraryIndex."""
+
+    def setUp(self):
+        """Create a download directory with an id-layout video and a flat one."""
+        self.test_dir = tempfile.mkdtemp()
+        self.write("dQ/dQw4w9WgXcQ.mp4", "video")
+        self.write("dQ/dQw4w9WgXcQ.info.json", json.dumps({'id': "dQw4w9WgXcQ"}))
+        self.write("Some Title.webm", "flat video")
+        self.write("Some Title.info.json", json.dumps({'id': "abcdefghijk"}))
+        self.write(".ytd-staging/dQw4w9WgXcQ.mp4.part", "partial")
+        self.index = LibraryIndex(self.test_dir)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.index.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.test_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_update_indexes_ids_from_names_and_info_json(self):
+        """Test that IDs come from ID-named files and from info JSON sidecars."""
+        counts = self.index.update()
+
+        self.assertEqual(counts["added"], 4)
+        entries = self.index.lookup("dQw4w9WgXcQ")
+        self.assertEqual([entry.path for entry in entries],
+                         [os.path.join("dQ", "dQw4w9WgXcQ.info.json"), os.path.join("dQ", "dQw4w9WgXcQ.mp4")])
+        video = entries[1]
+        self.assertEqual(video.size, 5)
+        self.assertEqual(video.sha256, file_sha256(os.path.join(self.test_dir, video.path)))
+        self.assertEqual(sorted(entry.path for entry in self.index.lookup("abcdefghijk")),
+                         ["Some Title.info.json", "Some Title.webm"])
+        # Staging files and the index itself are not part of the library
+        self.assertEqual(self.index.by_hash(file_sha256(os.path.join(self.test_dir, ".ytd-staging",
+                                                                     "dQw4w9WgXcQ.mp4.part"))), [])
+
+    def test_id_shaped_title_uses_info_json(self):
+        """Test that an 11-character title outside a layout shard is not taken for an ID."""
+        self.write("Programming.mp4", "flat video")
+        self.write("Programming.info.json", json.dumps({'id': "abcdefghij2"}))
+        self.write("2024/05/xyzxyzxyz12.mp4", "dated video")
+        self.index.update()
+
+        self.assertEqual(sorted(entry.path for entry in self.index.lookup("abcdefghij2")),
+                         ["Programming.info.json", "Programming.mp4"])
+        self.assertEqual(self.index.lookup("Programming"), [])
+        self.assertEqual([entry.path for entry in self.index.lookup("xyzxyzxyz12")],
+                         [os.path.join("2024", "05", "xyzxyzxyz12.mp4")])
+
+    def test_update_skips_unchanged_directories(self):
+        """Test that a second update neither rescans directories nor rehashes files."""
+        self.index.update()
+        with patch.object(library_index, "file_sha256") as sha256:
+            counts = self.index.update()
+
+        self.assertEqual(counts, {"scanned": 0, "added": 0, "changed": 0, "removed": 0})
+        sha256.assert_not_called()
+
+    def test_update_picks_up_added_changed_and_removed_files(self):
+        """Test that only the changed directory is rescanned and only changed files rehashed."""
+        self.index.update()
+        self.write("ab/abcdefghijk.mp4", "moved")
+        os.remove(os.path.join(self.test_dir, "dQ", "dQw4w9WgXcQ.info.json"))
+        path = os.path.join(self.test_dir, "Some Title.webm")
+        self.write("Some Title.webm", "flat video, re-downloaded")
+
+        with patch.object(library_index, "file_sha256", wraps=file_sha256) as sha256:
+            counts = self.index.update()
+
+        self.assertEqual(counts, {"scanned": 3, "added": 1, "changed": 1, "removed": 1})
+        self.assertEqual(sha256.call_count, 2)
+        self.assertEqual(len(self.index.lookup("abcdefghijk")), 3)
+        self.assertEqual([entry.path for entry in self.index.lookup("dQw4w9WgXcQ")],
+                         [os.path.join("dQ", "dQw4w9WgXcQ.mp4")])
+        self.assertEqual(self.index.refresh(path).size, os.path.getsize(path))
+
+    def test_update_full_catches_in_place_changes(self):
+        """Test that full=True notices a file rewritten without a rename."""
+        self.index.update()
+        path = os.path.join(self.test_dir, "dQ", "dQw4w9WgXcQ.mp4")
+        stat = os.stat(os.path.join(self.test_dir, "dQ"))
+        with open(path, "a") as f:
+            f.write(" and more")
+        # Appending does not touch the directory; make sure no rename did either
+        os.utime(os.path.join(self.test_dir, "dQ"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertEqual(self.index.update()["changed"], 0)
+        self.assertEqual(self.index.update(full=True)["changed"], 1)
+        self.assertEqual(self.index.lookup("dQw4w9WgXcQ")[1].size, os.path.getsize(path))
+
+    def test_removed_directory_is_forgotten(self):
+        """Test that deleting a whole shard drops its files."""
+        self.index.update()
+        shutil.rmtree(os.path.join(self.test_dir, "dQ"))
+
+        self.assertEqual(self.index.update()["removed"], 2)
+        self.assertEqual(self.index.lookup("dQw4w9WgXcQ"), [])
+
+    def test_refresh_keeps_given_id(self):
+        """Test that an ID passed to refresh() survives later rescans."""
+        path = self.write("Untitled.mp4", "video")
+        self.index.refresh(path, video_id="zyxwvutsrqp")
+        self.write("Untitled.mp4", "video, changed")
+        self.index.update()
+
+        self.assertEqual([entry.path for entry in self.index.lookup("zyxwvutsrqp")], ["Untitled.mp4"])
+
+    def test_index_persists(self):
+        """Test that a new LibraryIndex on the same directory sees earlier updates."""
+        self.index.update()
+        reopened = LibraryIndex(self.test_dir)
+        try:
+            self.assertEqual(len(reopened.lookup("abcdefghijk")), 2)
+            self.assertEqual(reopened.update()["scanned"], 0)
+        finally:
+            reopened.close()
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+    def test_watch_follows_changes(self):
+        """Test that watch() indexes files and new directories as they appear."""
+        stop = threading.Event()
+        watcher = threading.Thread(target=self.index.watch, args=(stop, 0.05))
+        watcher.start()
+        try:
+            # Wait for the initial update
+            deadline = time.monotonic() + 5
+            while not self.index.lookup("abcdefghijk") and time.monotonic() < deadline:
+                time.sleep(0.02)
+            self.write("zy/zyxwvutsrqp.mp4", "new video")
+            os.remove(os.path.join(self.test_dir, "Some Title.webm"))
+
+            while time.monotonic() < deadline:
+                if self.index.lookup("zyxwvutsrqp") and len(self.index.lookup("abcdefghijk")) == 1:
+                    break
+                time.sleep(0.02)
+        finally:
+            stop.set()
+            watcher.join()
+
+        self.assertEqual([entry.path for entry in self.index.lookup("zyxwvutsrqp")],
+                         [os.path.join("zy", "zyxwvutsrqp.mp4")])
+        self.assertEqual([entry.path for entry in self.index.lookup("abcdefghijk")], ["Some Title.info.json"])
+
+class TestBotLibraryIndex(unittest.TestCase):
+    """Test cases for the bot's use of the library index."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    @patch('youtube_downloader_bot.run_download')
+    def test_download_records_file(self, mock_run_download):
+        """Test that downloads are indexed under their video ID and found again."""
+        path = os.path.join(self.test_dir, "A Title.mp4")
+        with open(path, "w") as f:
+            f.write("video")
+        mock_run_download.return_value = DownloadResult(True, path, None, {'id': "dQw4w9WgXcQ"}, False)
+
+        bot = YouTubeDownloaderBot(save_directory=self.test_dir, index_library=True)
+        success, _ = bot.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+        self.assertTrue(success)
+        self.assertEqual(bot.find_downloaded("dQw4w9WgXcQ"), [path])
+        self.assertEqual(bot.find_downloaded("abcdefghijk"), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for migrating flat download directories to sharded layouts.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from library_layout import migrate, plan_migration
+
+class TestLibraryLayout(unittest.TestCase):
+    """Test cases for plan_migration and migrate."""
+    
+    def setUp(self):
+        """Create a flat directory with two videos and their sidecars."""
+        self.test_dir = tempfile.mkdtemp()
+        self.add_video("Song", "dQw4w9WgXcQ", "20091025", [".mp3", ".webp", ".en.vtt"])
+        self.add_video("Song.Live", "abcdefghijk", "20200101", [".mp4"])
+        self.touch("No Metadata.mp4")
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def touch(self, name):
+        with open(os.path.join(self.test_dir, name), "w") as f:
+            f.write(name)
+    
+    def add_video(self, title, video_id, upload_date, suffixes):
+        with open(os.path.join(self.test_dir, f"{title}.info.json"), "w") as f:
+            json.dump({'id': video_id, 'title': title, 'ext': 'webm', 'upload_date': upload_date}, f)
+        for suffix in suffixes:
+            self.touch(title + suffix)
+    
+    def test_migrate_by_id(self):
+        """Test that every file of a video moves to the ID-based name in its shard."""
+        moved, skipped = migrate(self.test_dir, "id")
+        
+        self.assertEqual(moved, 6)
+        self.assertEqual(skipped, ["No Metadata.mp4"])
+        for name in ("dQw4w9WgXcQ.mp3", "dQw4w9WgXcQ.webp", "dQw4w9WgXcQ.en.vtt", "dQw4w9WgXcQ.info.json"):
+            self.assertTrue(os.path.exists(os.path.join(self.test_dir, "dQ", name)), name)
+        # "Song.Live.mp4" belongs to "Song.Live", not to "Song"
+        with open(os.path.join(self.test_dir, "ab", "abcdefghijk.mp4")) as f:
+            self.assertEqual(f.read(), "Song.Live.mp4")
+    
+    def test_migrate_by_date(self):
+        """Test that the date layout shards by upload year and month."""
+        migrate(self.test_dir, "date")
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "2009", "10", "dQw4w9WgXcQ.mp3")))
+    
+    def test_dry_run_moves_nothing(self):
+        """Test that a dry run only plans."""
+        before = sorted(os.listdir(self.test_dir))
+        self.assertEqual(migrate(self.test_dir, "id", dry_run=True)[0], 0)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), before)
+    
+    def test_existing_target_is_not_overwritten(self):
+        """Test that a video whose target exists is left in place entirely."""
+        os.makedirs(os.path.join(self.test_dir, "dQ"))
+        with open(os.path.join(self.test_dir, "dQ", "dQw4w9WgXcQ.mp3"), "w") as f:
+            f.write("already there")
+        
+        renames, skipped = plan_migration(self.test_dir, "id")
+        
+        self.assertIn("Song.mp3", skipped)
+        self.assertIn("Song.webp", skipped)
+        self.assertEqual(sorted(os.path.basename(source) for source, _ in renames),
+                         ["Song.Live.info.json", "Song.Live.mp4"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for live stream recording.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from live_recorder import LiveRecorder
+
+class TestLiveRecorder(unittest.TestCase):
+    """Test cases for LiveRecorder."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.test_dir = tempfile.mkdtemp()
+        self.info = {'id': 'abc', 'title': 'Live', 'is_live': True, 'protocol': 'm3u8_native',
+                     'url': 'https://example.com/live.m3u8', 'http_headers': {'User-Agent': 'UA'}}
+    
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def write_segment(self, name, size):
+        with open(os.path.join(self.test_dir, name), 'wb') as f:
+            f.write(b'x' * size)
+    
+    def test_build_command(self):
+        """Test that ffmpeg copies the stream into fixed-duration segments from the live edge."""
+        recorder = LiveRecorder("https://youtu.be/live", self.test_dir, segment_seconds=60, duration=3600)
+        recorder.prefix = "abc-"
+        command = recorder.build_command(self.info)
+        
+        self.assertEqual(command[command.index("-live_start_index") + 1], "-1")
+        self.assertEqual(command[command.index("-t") + 1], "3600")
+        self.assertEqual(command[command.index("-segment_time") + 1], "60")
+        self.assertEqual(command[command.index("-c") + 1], "copy")
+        self.assertIn("User-Agent: UA\r\n", command)
+        self.assertTrue(command[-1].startswith(os.path.join(self.test_dir, "abc-%Y")))
+    
+    def test_prune_keeps_newest_segments_under_cap(self):
+        """Test that the oldest segments are deleted once the cap is exceeded."""
+        recorder = LiveRecorder("https://youtu.be/live", self.test_dir, max_total_bytes=250)
+        recorder.prefix = "abc-"
+        for minute in range(4):
+            self.write_segment(f"abc-20240101-00{minute}000.ts", 100)
+        self.write_segment("other-20240101-000000.ts", 1000)
+        
+        removed = recorder.prune()
+        
+        self.assertEqual([os.path.basename(path) for path in removed],
+                         ["abc-20240101-000000.ts", "abc-20240101-001000.ts"])
+        self.assertEqual(len(recorder.segments()), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "other-20240101-000000.ts")))
+    
+    def test_prune_never_deletes_segment_being_written(self):
+        """Test that the newest segment survives even when it alone exceeds the cap."""
+        recorder = LiveRecorder("https://youtu.be/live", self.test_dir, max_total_bytes=10)
+        recorder.prefix = "abc-"
+        self.write_segment("abc-20240101-000000.ts", 100)
+        
+        self.assertEqual(recorder.prune(), [])
+    
+    @patch('live_recorder.shutil.which', return_value='/usr/bin/ffmpeg')
+    @patch('live_recorder.subprocess.Popen')
+    def test_record_prunes_until_ffmpeg_exits(self, mock_popen, mock_which):
+        """Test that recording polls ffmpeg and applies the cap while it runs."""
+        process = MagicMock()
+        process.poll.side_effect = [None, None, 0]
+        process.returncode = 0
+        mock_popen.return_value = process
+        recorder = LiveRecorder("https://youtu.be/live", self.test_dir, poll_interval=0)
+        
+        with patch.object(recorder, 'prune') as mock_prune:
+            self.assertEqual(recorder.record(self.info), [])
+        
+        self.assertEqual(mock_prune.call_count, 3)
+        self.assertEqual(mock_popen.call_args[0][0][0], "ffmpeg")
+    
+    def test_resolve_rejects_videos_that_are_not_live(self):
+        """Test that recording a regular video is refused."""
+        recorder = LiveRecorder("https://youtu.be/vod", self.test_dir)
+        with patch('yt_dlp.YoutubeDL') as mock_youtube_dl:
+            mock_youtube_dl.return_value.__enter__.return_value.extract_info.return_value = {'is_live': False}
+            with self.assertRaises(ValueError):
+                recorder.resolve()
+
+if __name__ == "__main__":
+    unittest.main()
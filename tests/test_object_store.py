@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Tests for multipart uploads to S3-compatible object storage.
+
+The tests run against FakeS3, an in-memory stand-in with the multipart
+subset of the S3 API that the uploader uses.
+"""
+
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from object_store import MIN_PART_SIZE, MultipartUpload, ObjectStore, ObjectStoreSink
+from youtube_downloader_bot import YouTubeDownloaderBot
+from engine import DownloadResult
+
+PART = MIN_PART_SIZE
+
+
+class FakeS3:
+    """In-memory multipart upload API that records what happened."""
+
+    def __init__(self, fail_part=None, part_delay=0.0):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_part = fail_part
+        self.part_delay = part_delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = (Bucket, Key, {})
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.part_delay)
+            if PartNumber == self.fail_part:
+                raise IOError("connection reset")
+            self.uploads[UploadId][2][PartNumber] = bytes(Body)
+            return {'ETag': f'"etag-{PartNumber}"'}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)[2]
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        assert numbers == sorted(parts), numbers
+        assert all(len(parts[n]) >= MIN_PART_SIZE for n in numbers[:-1])
+        self.objects[(Bucket, Key)] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(Key)
+
+
+def payload(size):
+    return bytes(i % 251 for i in range(size))
+
+
+class TestMultipartUpload(unittest.TestCase):
+    """Test cases for MultipartUpload."""
+
+    def test_parts_are_uploaded_in_parallel_and_reassembled(self):
+        """Test that writes of any size end up as one object made of full parts."""
+        client = FakeS3(part_delay=0.05)
+        upload = MultipartUpload(client, "bucket", "key", part_size=PART, workers=3)
+        data = payload(PART * 4 + 123)
+        for offset in range(0, len(data), 1024 * 1024):
+            upload.write(data[offset:offset + 1024 * 1024])
+        upload.complete()
+
+        self.assertEqual(client.objects[("bucket", "key")], data)
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLessEqual(client.max_in_flight, 3)
+
+    def test_buffered_parts_are_bounded(self):
+        """Test that write() blocks once max_buffered_parts are held."""
+        client = FakeS3()
+        release = threading.Event()
+        original = client.upload_part
+        client.upload_part = lambda **kwargs: release.wait(5) and original(**kwargs)
+        upload = MultipartUpload(client, "bucket", "key", part_size=PART, workers=1, max_buffered_parts=2)
+
+        writer = threading.Thread(target=upload.write, args=(payload(PART * 3),), daemon=True)
+        writer.start()
+        writer.join(0.2)
+        # The third part waits for a free buffer
+        self.assertTrue(writer.is_alive())
+        self.assertEqual(len(upload._futures), 2)
+
+        release.set()
+        writer.join(5)
+        upload.complete()
+        self.assertEqual(len(client.objects[("bucket", "key")]), PART * 3)
+
+    def test_failed_part_aborts_upload(self):
+        """Test that a failed part aborts the upload and is raised."""
+        client = FakeS3(fail_part=2)
+        upload = MultipartUpload(client, "bucket", "key", part_size=PART)
+        upload.write(payload(PART * 2 + 10))
+
+        with self.assertRaises(IOError):
+            upload.complete()
+        self.assertEqual(client.aborted, ["key"])
+        self.assertEqual(client.objects, {})
+
+    def test_empty_upload(self):
+        """Test that an empty file still completes with one empty part."""
+        client = FakeS3()
+        upload = MultipartUpload(client, "bucket", "empty", part_size=PART)
+        upload.complete()
+        self.assertEqual(client.objects[("bucket", "empty")], b"")
+
+    def test_small_parts_rejected(self):
+        """Test that parts below the S3 minimum are refused."""
+        with self.assertRaises(ValueError):
+            MultipartUpload(FakeS3(), "bucket", "key", part_size=1024)
+
+
+class TestObjectStore(unittest.TestCase):
+    """Test cases for ObjectStore."""
+
+    def test_from_url_and_keys(self):
+        """Test that s3:// URLs are parsed and keys keep the directory structure."""
+        store = ObjectStore.from_url("s3://media/videos/")
+        self.assertEqual((store.bucket, store.prefix), ("media", "videos/"))
+        root = os.path.join("data", "downloads")
+        self.assertEqual(store.key_for(os.path.join(root, "dQ", "dQw4w9WgXcQ.mp4"), root),
+                         "videos/dQ/dQw4w9WgXcQ.mp4")
+        self.assertEqual(ObjectStore("media").key_for(os.path.join(root, "a.mp4"), root), "a.mp4")
+        with self.assertRaises(ValueError):
+            ObjectStore.from_url("https://media/videos")
+
+    def test_pickle_drops_client(self):
+        """Test that a store can be sent to worker processes without its client."""
+        store = pickle.loads(pickle.dumps(ObjectStore("media", client=threading.Lock())))
+        self.assertIsNone(store._client)
+        self.assertEqual(store.bucket, "media")
+
+
+class TestObjectStoreSink(unittest.TestCase):
+    """Test cases for streaming uploads of files while they are downloaded."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.client = FakeS3()
+        self.store = ObjectStore("media", "videos", part_size=PART, client=self.client)
+        self.final = os.path.join(self.test_dir, "video.mp4")
+        self.part = self.final + ".part"
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def simulate_download(self, sink, data, info_dict=None):
+        """Write data the way yt-dlp does, sending progress events to the sink."""
+        with open(self.part, "wb") as f:
+            for offset in range(0, len(data), 1024 * 1024):
+                f.write(data[offset:offset + 1024 * 1024])
+                f.flush()
+                sink({'status': 'downloading', 'tmpfilename': self.part, 'filename': self.final,
+                      'downloaded_bytes': offset, 'info_dict': info_dict or {}})
+        os.rename(self.part, self.final)
+        sink({'status': 'finished', 'filename': self.final, 'total_bytes': len(data)})
+
+    @unittest.skipUnless(os.name == "posix", "streaming needs POSIX rename semantics")
+    def test_streams_while_downloading(self):
+        """Test that parts are uploaded before the download finishes and the object matches."""
+        sink = ObjectStoreSink(self.store, self.test_dir, poll_interval=0.01)
+        data = payload(PART * 2 + 4096)
+        uploaded_before_finish = []
+        original = self.client.upload_part
+
+        def upload_part(**kwargs):
+            uploaded_before_finish.append(os.path.exists(self.part))
+            return original(**kwargs)
+
+        self.client.upload_part = upload_part
+        with open(self.part, "wb") as f:
+            f.write(data[:PART * 2])
+            f.flush()
+            sink({'status': 'downloading', 'tmpfilename': self.part, 'filename': self.final, 'info_dict': {}})
+            # Wait until the follower has uploaded the complete parts
+            deadline = time.monotonic() + 5
+            while len(uploaded_before_finish) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            f.write(data[PART * 2:])
+        os.rename(self.part, self.final)
+        sink({'status': 'finished', 'filename': self.final})
+
+        url = sink.finish(self.final)
+
+        self.assertEqual(url, "s3://media/videos/video.mp4")
+        self.assertEqual(self.client.objects[("media", "videos/video.mp4")], data)
+        self.assertEqual(uploaded_before_finish[:2], [True, True])
+        self.assertEqual(len(self.client.uploads), 0)
+
+    @unittest.skipUnless(os.name == "posix", "streaming needs POSIX rename semantics")
+    def test_staged_download_keeps_final_key(self):
+        """Test that a file downloaded into the staging directory is keyed by its final place."""
+        staging = os.path.join(self.test_dir, ".ytd-staging")
+        os.makedirs(staging)
+        sink = ObjectStoreSink(self.store, self.test_dir, staging_directory=staging, poll_interval=0.01)
+        staged = os.path.join(staging, "video.mp4")
+        self.part = staged + ".part"
+        data = payload(1000)
+        with open(self.part, "wb") as f:
+            f.write(data)
+        sink({'status': 'downloading', 'tmpfilename': self.part, 'filename': staged, 'info_dict': {}})
+        os.rename(self.part, self.final)
+        sink({'status': 'finished', 'filename': staged})
+
+        self.assertEqual(sink.finish(self.final), "s3://media/videos/video.mp4")
+        self.assertEqual(self.client.objects[("media", "videos/video.mp4")], data)
+        self.assertEqual(self.client.aborted, [])
+
+    def test_merged_formats_upload_final_file(self):
+        """Test that intermediate files of merged formats are not streamed."""
+        sink = ObjectStoreSink(self.store, self.test_dir, poll_interval=0.01)
+        data = payload(3000)
+        self.simulate_download(sink, data, info_dict={'requested_formats': [{}, {}]})
+
+        self.assertEqual(self.client.uploads, {})
+        sink.finish(self.final)
+        self.assertEqual(self.client.objects[("media", "videos/video.mp4")], data)
+
+    @unittest.skipUnless(os.name == "posix", "streaming needs POSIX rename semantics")
+    def test_changed_file_is_uploaded_again(self):
+        """Test that a streamed upload is dropped when postprocessing changed the file."""
+        sink = ObjectStoreSink(self.store, self.test_dir, poll_interval=0.01)
+        self.simulate_download(sink, payload(3000))
+        # Postprocessors write a new file and move it over the download
+        with open(self.final + ".temp", "wb") as f:
+            f.write(payload(3000) + b"remuxed")
+        os.replace(self.final + ".temp", self.final)
+
+        sink.finish(self.final)
+        self.assertEqual(self.client.aborted, ["videos/video.mp4"])
+        self.assertEqual(self.client.objects[("media", "videos/video.mp4")], payload(3000) + b"remuxed")
+
+    @unittest.skipUnless(os.name == "posix", "streaming needs POSIX rename semantics")
+    def test_failed_download_aborts(self):
+        """Test that finish(None) abandons streamed uploads and uploads nothing."""
+        sink = ObjectStoreSink(self.store, self.test_dir, poll_interval=0.01)
+        with open(self.part, "wb") as f:
+            f.write(b"partial")
+        sink({'status': 'downloading', 'tmpfilename': self.part, 'filename': self.final, 'info_dict': {}})
+        sink({'status': 'error', 'filename': self.final})
+
+        self.assertIsNone(sink.finish(None))
+        self.assertEqual(self.client.objects, {})
+        self.assertEqual(self.client.aborted, ["videos/video.mp4"])
+
+
+class TestBotUpload(unittest.TestCase):
+    """Test cases for uploads from YouTubeDownloaderBot."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "video.mp4")
+        with open(self.path, "wb") as f:
+            f.write(b"video")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    @patch('youtube_downloader_bot.run_download')
+    def test_upload_and_delete_local(self, mock_run_download):
+        """Test that the bot uploads a finished download and can drop the local copy."""
+        mock_run_download.return_value = DownloadResult(True, self.path, info={'id': "dQw4w9WgXcQ"})
+        client = FakeS3()
+        store = ObjectStore("media", "videos", client=client, keep_local=False)
+        bot = YouTubeDownloaderBot(save_directory=self.test_dir, object_store=store)
+
+        success, result = bot.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+        self.assertTrue(success)
+        self.assertEqual(result, "s3://media/videos/video.mp4")
+        self.assertEqual(client.objects[("media", "videos/video.mp4")], b"video")
+        self.assertFalse(os.path.exists(self.path))
+
+    @patch('youtube_downloader_bot.run_download')
+    def test_upload_failure_fails_download(self, mock_run_download):
+        """Test that a failed upload is reported and the local file kept."""
+        mock_run_download.return_value = DownloadResult(True, self.path, info={'id': "dQw4w9WgXcQ"})
+        store = ObjectStore("media", client=FakeS3(fail_part=1), keep_local=False)
+        bot = YouTubeDownloaderBot(save_directory=self.test_dir, object_store=store)
+
+        success, result = bot.download("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+        self.assertFalse(success)
+        self.assertIn("upload failed", result)
+        self.assertTrue(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
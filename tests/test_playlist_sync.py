@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental playlist and channel sync.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch import BatchDownloader
+from playlist_sync import SYNC_FILENAME, PlaylistSync, SyncState
+
+CHANNEL = "https://www.youtube.com/@channel/videos"
+
+
+def video(video_id):
+    return {'_type': 'url', 'ie_key': 'Youtube', 'id': video_id,
+            'url': f"https://www.youtube.com/watch?v={video_id}"}
+
+
+class FakeYoutubeDL:
+    """Serves unprocessed listings whose entries are generators that count what is consumed."""
+
+    def __init__(self, listings):
+        self.listings = listings
+        self.consumed = []
+
+    def __call__(self, ydl_opts):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _entries(self, entries):
+        for entry in entries:
+            self.consumed.append(entry.get('id'))
+            yield entry
+
+    def extract_info(self, url, download=True, process=True):
+        listing = dict(self.listings[url])
+        if 'entries' in listing:
+            listing['entries'] = self._entries(listing['entries'])
+        return listing
+
+
+class TestPlaylistSync(unittest.TestCase):
+    """Test cases for PlaylistSync."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.archived = set()
+        self.bot = MagicMock()
+        self.bot.save_directory = self.test_dir
+        self.bot.cache_directory = None
+        self.bot.find_downloaded.side_effect = lambda video_id: ["x"] if video_id in self.archived else []
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def channel(self, ids):
+        return {CHANNEL: {'_type': 'playlist', 'title': "Channel", 'webpage_url': CHANNEL,
+                          'entries': [video(i) for i in ids]}}
+
+    def scan(self, sync, listings):
+        ydl = FakeYoutubeDL(listings)
+        with patch("playlist_sync.open_youtube_dl", ydl):
+            return sync.scan(CHANNEL), ydl.consumed
+
+    def test_first_sync_stops_at_archived(self):
+        """Test that without state the walk stops at the first video in the library."""
+        self.archived = {"v3"}
+        sync = PlaylistSync(self.bot)
+        (listing,), consumed = self.scan(sync, self.channel(["v5", "v4", "v3", "v2", "v1"]))
+
+        self.assertEqual(listing.walked, ["v5", "v4"])
+        self.assertEqual([e['id'] for e in listing.new], ["v5", "v4"])
+        self.assertEqual(consumed, ["v5", "v4", "v3"])
+
+    def test_later_sync_stops_at_last_seen(self):
+        """Test that a recorded listing is only walked down to its last seen entry."""
+        sync = PlaylistSync(self.bot)
+        (listing,), _ = self.scan(sync, self.channel(["v3", "v2", "v1"]))
+        self.assertEqual(sync.state.update(listing), "v3")
+        self.archived = {"v1", "v2", "v3"}
+
+        (listing,), consumed = self.scan(sync, self.channel(["v5", "v4", "v3", "v2", "v1"]))
+        self.assertEqual([e['id'] for e in listing.new], ["v5", "v4"])
+        self.assertEqual(consumed, ["v5", "v4", "v3"])
+
+    def test_failure_is_walked_again(self):
+        """Test that the mark stays below a failed entry, and archived entries above it are skipped."""
+        sync = PlaylistSync(self.bot)
+        sync.state.listings[CHANNEL] = {'last_seen': "v1", 'known': [], 'synced_at': 0}
+        (listing,), _ = self.scan(sync, self.channel(["v3", "v2", "v1"]))
+        self.assertEqual(sync.state.update(listing, failed={"v2"}), "v1")
+
+        self.archived = {"v1", "v3"}
+        (listing,), consumed = self.scan(sync, self.channel(["v3", "v2", "v1"]))
+        self.assertEqual([e['id'] for e in listing.new], ["v2"])
+        self.assertEqual(sync.state.update(listing), "v3")
+
+    def test_known_ids_cover_removed_last_seen(self):
+        """Test that the walk still stops early when the last seen video was removed."""
+        sync = PlaylistSync(self.bot)
+        sync.state.listings[CHANNEL] = {'last_seen': "gone", 'known': ["v2", "v1"], 'synced_at': 0}
+        (listing,), consumed = self.scan(sync, self.channel(["v4", "v3", "v2", "v1"]))
+        self.assertEqual(listing.walked, ["v4", "v3"])
+        self.assertEqual(consumed, ["v4", "v3", "v2"])
+
+    def test_full_walk(self):
+        """Test that a full walk reads every entry and skips archived ones."""
+        self.archived = {"v2"}
+        sync = PlaylistSync(self.bot, full=True)
+        sync.state.listings[CHANNEL] = {'last_seen': "v3", 'known': [], 'synced_at': 0}
+        (listing,), consumed = self.scan(sync, self.channel(["v1", "v2", "v3", "v4"]))
+        self.assertEqual(consumed, ["v1", "v2", "v3", "v4"])
+        self.assertEqual([e['id'] for e in listing.new], ["v1", "v3", "v4"])
+
+    def test_channel_tabs_are_separate_listings(self):
+        """Test that each tab of a channel is walked and recorded on its own."""
+        home = "https://www.youtube.com/@channel"
+        shorts = "https://www.youtube.com/@channel/shorts"
+        listings = self.channel(["v2", "v1"])
+        listings[home] = {'_type': 'playlist', 'title': "Channel", 'entries': [
+            {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': CHANNEL},
+            {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': shorts},
+        ]}
+        listings[shorts] = {'_type': 'playlist', 'title': "Shorts", 'entries': [video("s1")]}
+        ydl = FakeYoutubeDL(listings)
+        with patch("playlist_sync.open_youtube_dl", ydl):
+            scanned = PlaylistSync(self.bot).scan(home)
+        self.assertEqual([(l.key, l.walked) for l in scanned], [(CHANNEL, ["v2", "v1"]), (shorts, ["s1"])])
+
+    def test_sync_downloads_new_entries_and_saves_state(self):
+        """Test that sync downloads new entries oldest first and records the mark in the state file."""
+        downloaded = []
+        bot = MagicMock()
+        bot.download.side_effect = lambda url, info=None: (downloaded.append(url) or not url.endswith("v2"), url)
+        batch = BatchDownloader(lambda: bot, workers=1)
+
+        sync = PlaylistSync(self.bot)
+        with patch("playlist_sync.open_youtube_dl", FakeYoutubeDL(self.channel(["v3", "v2", "v1"]))):
+            self.assertEqual(sync.sync([CHANNEL], batch), (2, 1))
+
+        self.assertEqual(downloaded, [video(i)['url'] for i in ("v1", "v2", "v3")])
+        self.bot.library.update.assert_called_once()
+        with open(os.path.join(self.test_dir, SYNC_FILENAME), encoding="utf-8") as f:
+            state = json.load(f)['listings'][CHANNEL]
+        self.assertEqual(state['last_seen'], "v1")
+        self.assertIsNone(batch.on_result)
+
+    def test_sync_counts_scan_failures(self):
+        """Test that a URL that cannot be scanned is counted as failed."""
+        batch = BatchDownloader(lambda: MagicMock(), workers=1)
+        sync = PlaylistSync(self.bot)
+        self.assertEqual(sync.sync(["https://example.com/list"], batch), (0, 1))
+
+
+class TestSyncState(unittest.TestCase):
+    """Test cases for SyncState."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, SYNC_FILENAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_round_trip(self):
+        """Test that saved state is loaded back."""
+        state = SyncState(self.path)
+        state.listings[CHANNEL] = {'last_seen': "v1", 'known': ["v1"], 'synced_at': 1}
+        state.save()
+        self.assertEqual(SyncState(self.path).get(CHANNEL)['last_seen'], "v1")
+
+    def test_rejects_other_files(self):
+        """Test that a file that is not sync state is refused."""
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("[]")
+        with self.assertRaises(ValueError):
+            SyncState(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the process-isolated worker pool.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from process_pool import ProcessWorkerPool, ProgressSummary, _WorkerHandle, _rss_bytes
+
+class FakeBot:
+    """Bot stand-in that reports progress and returns the worker PID."""
+    
+    def __init__(self, crash_on=None):
+        self.crash_on = crash_on
+    
+    def download_progress_hook(self, d):
+        pass
+    
+    def download(self, url):
+        if url == self.crash_on:
+            os._exit(3)
+        for done in (50, 100):
+            self.download_progress_hook({'status': 'downloading', 'downloaded_bytes': done, 'total_bytes': 100})
+        return not url.endswith("bad"), str(os.getpid())
+
+class TestProcessWorkerPool(unittest.TestCase):
+    """Test cases for ProcessWorkerPool."""
+    
+    def make_pool(self, **kwargs):
+        self.results = {}
+        self.progress = []
+        return ProcessWorkerPool(
+            bot_class=FakeBot, start_method="fork",
+            on_result=lambda url, ok, res: self.results.update({url: (ok, res)}),
+            on_progress=lambda url, done, total: self.progress.append((url, done, total)),
+            **kwargs)
+    
+    def test_results_and_progress_reach_the_parent(self):
+        """Test that every job's result and progress are forwarded."""
+        pool = self.make_pool(workers=2)
+        urls = [f"https://youtu.be/{i}" for i in range(6)] + ["https://youtu.be/bad"]
+        
+        self.assertEqual(pool.run(iter(urls)), (6, 1))
+        self.assertEqual(sorted(self.results), sorted(urls))
+        self.assertNotIn(str(os.getpid()), {res for _, res in self.results.values()})
+        self.assertIn(("https://youtu.be/0", 100, 100), self.progress)
+    
+    def test_workers_are_recycled_after_job_limit(self):
+        """Test that no worker process runs more than max_jobs_per_worker jobs."""
+        pool = self.make_pool(workers=2, max_jobs_per_worker=2)
+        urls = [f"https://youtu.be/{i}" for i in range(8)]
+        
+        self.assertEqual(pool.run(urls), (8, 0))
+        pids = [res for _, res in self.results.values()]
+        self.assertTrue(all(pids.count(pid) <= 2 for pid in pids))
+        self.assertGreaterEqual(pool.recycled, 3)
+    
+    def test_workers_are_recycled_above_memory_limit(self):
+        """Test that a worker above the memory threshold is replaced after its job."""
+        pool = self.make_pool(workers=1, max_memory_bytes=1)
+        
+        self.assertEqual(pool.run(["https://youtu.be/a", "https://youtu.be/b"]), (2, 0))
+        self.assertNotEqual(self.results["https://youtu.be/a"][1], self.results["https://youtu.be/b"][1])
+    
+    def test_crashed_worker_fails_its_job_only(self):
+        """Test that a worker dying mid-job fails that job and is replaced."""
+        pool = self.make_pool(workers=1, bot_options={'crash_on': "https://youtu.be/crash"})
+        
+        self.assertEqual(pool.run(["https://youtu.be/a", "https://youtu.be/crash", "https://youtu.be/b"]), (2, 1))
+        self.assertEqual(self.results["https://youtu.be/crash"],
+                         (False, "Worker process exited with code 3"))
+    
+    def test_reaping_fails_only_jobs_still_held(self):
+        """Test that a dead worker whose result was already handled is not failed again."""
+        pool = self.make_pool()
+        process = type("Process", (), {"exitcode": 0})()
+        done, holding = _WorkerHandle(process, open(os.devnull, "w")), _WorkerHandle(process, open(os.devnull, "w"))
+        holding.url = "https://youtu.be/held"
+        workers = {1: done, 2: holding}
+        pool._reap_dead(workers, [1, 2])
+        self.assertEqual(workers, {})
+        self.assertEqual(self.results, {"https://youtu.be/held": (False, "Worker process exited with code 0")})
+        self.assertEqual(pool.failed, 1)
+    
+    def test_progress_summary(self):
+        """Test that the summary adds up the running jobs and forgets finished ones."""
+        summary = ProgressSummary(interval=0)
+        with patch("builtins.print") as mock_print:
+            summary.on_progress("a", 50, 100)
+            summary.on_progress("b", 25, 100)
+        self.assertIn("2 downloads running", mock_print.call_args[0][0])
+        summary.on_result("a", True, "")
+        self.assertEqual(summary.jobs, {"b": (25, 100)})
+    
+    def test_rss_is_measured(self):
+        """Test that the current process memory can be read."""
+        self.assertGreater(_rss_bytes(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for batch scheduling policies.
+"""
+
+import math
+import os
+import sys
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scheduler import (AgingPriorityQueue, ShortestJobFirstQueue, estimate_cost,
+                       make_queue, simulate, synthetic_workload)
+
+class Job:
+    def __init__(self, name, cost):
+        self.name = name
+        self.cost = cost
+
+
+class TestQueues(unittest.TestCase):
+    """Test cases for the scheduling queues."""
+
+    def test_estimate_cost(self):
+        """Test that size wins over duration and unknown jobs go last."""
+        self.assertEqual(estimate_cost(1000, 60), 1000)
+        self.assertGreater(estimate_cost(None, 60), 0)
+        self.assertTrue(math.isinf(estimate_cost(None, None)))
+
+    def test_shortest_job_first(self):
+        """Test that the cheapest job is handed out first, ties in arrival order."""
+        jobs = ShortestJobFirstQueue()
+        for job in [Job("long", 100), Job("short", 1), Job("mid-a", 10), Job("mid-b", 10)]:
+            jobs.put(job)
+        stop = object()
+        jobs.put(stop)
+
+        order = [jobs.get() for _ in range(5)]
+        self.assertEqual([j.name for j in order[:4]], ["short", "mid-a", "mid-b", "long"])
+        self.assertIs(order[4], stop)
+
+    def test_aging_prevents_starvation(self):
+        """Test that a long job overtakes new short jobs once it has waited long enough."""
+        now = [0.0]
+        jobs = AgingPriorityQueue(aging_rate=1.0, clock=lambda: now[0])
+        jobs.put(Job("long", 100))
+        jobs.put(Job("short", 5))
+        self.assertEqual(jobs.get().name, "short")
+
+        now[0] = 99.0
+        jobs.put(Job("new-short", 5))
+        self.assertEqual(jobs.get().name, "long")
+
+    def test_unknown_policy(self):
+        """Test that an unknown policy is rejected."""
+        with self.assertRaises(ValueError):
+            make_queue("random")
+
+
+class TestSimulation(unittest.TestCase):
+    """Test cases for the scheduling simulation."""
+
+    def test_sjf_improves_mean_completion(self):
+        """Test that shortest-first beats FIFO on mean and p95 for a mixed workload."""
+        workload = synthetic_workload(200)
+        fifo = simulate("fifo", workload, workers=4)
+        sjf = simulate("sjf", workload, workers=4)
+        aging = simulate("aging", workload, workers=4)
+
+        self.assertLess(sjf["mean"], fifo["mean"])
+        self.assertLess(sjf["p95"], fifo["p95"])
+        self.assertLess(aging["mean"], fifo["mean"])
+
+    def test_simulate_single_worker(self):
+        """Test completion times on a tiny hand-checked workload."""
+        stats = simulate("sjf", [3, 1, 2], workers=1)
+        # Runs 1, 2, 3 -> completes at 1, 3, 6
+        self.assertEqual(stats["mean"], 10 / 3)
+        self.assertEqual(stats["makespan"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
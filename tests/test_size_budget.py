@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Tests for size-budgeted format selection.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import yt_dlp
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine import DownloadJob
+from size_budget import FitToSizePP, SizeBudgetSelector, estimate_format_size, infer_duration
+
+MB = 1024 * 1024
+DURATION = 600
+
+
+def fmt(format_id, ext, vcodec='none', acodec='none', tbr=None, height=None, size=True, **extra):
+    """A format whose size follows from its bitrate over DURATION, unless size is False."""
+    f = {'format_id': format_id, 'ext': ext, 'vcodec': vcodec, 'acodec': acodec, 'tbr': tbr,
+         'height': height, 'protocol': 'https', 'url': f"https://example.com/{format_id}"}
+    if size and tbr:
+        f['filesize'] = int(tbr * 1000 / 8 * DURATION)
+    f.update(extra)
+    return f
+
+
+# 10 minutes: 1080p ~ 150 MB, 720p ~ 75 MB, 360p ~ 30 MB, combined 360p ~ 37 MB, audio ~ 9.6 / 4.8 MB
+FORMATS = [
+    fmt('139', 'm4a', acodec='mp4a.40.5', tbr=64, abr=64),
+    fmt('140', 'm4a', acodec='mp4a.40.2', tbr=128, abr=128),
+    fmt('251', 'webm', acodec='opus', tbr=130, abr=130),
+    fmt('18', 'mp4', vcodec='avc1', acodec='mp4a.40.2', tbr=500, height=360),
+    fmt('134', 'mp4', vcodec='avc1', tbr=400, height=360),
+    fmt('136', 'mp4', vcodec='avc1', tbr=1000, height=720),
+    # Fragmented format: bitrate only, sized from the inferred duration
+    fmt('137', 'mp4', vcodec='avc1', tbr=2000, height=1080, size=False),
+]
+
+
+def select(selector, formats=FORMATS):
+    return list(selector({'formats': formats}))
+
+
+class TestEstimates(unittest.TestCase):
+    """Test cases for the size estimates."""
+
+    def test_estimate_from_bitrate(self):
+        """Test that formats without a size are estimated from bitrate and duration."""
+        self.assertEqual(estimate_format_size({'tbr': 800}, 100), 10_000_000)
+        self.assertEqual(estimate_format_size({'filesize_approx': 5}, 100), 5)
+        self.assertIsNone(estimate_format_size({'tbr': 800}))
+
+    def test_infer_duration(self):
+        """Test that the duration is recovered from formats with size and bitrate."""
+        self.assertAlmostEqual(infer_duration(FORMATS), DURATION, places=0)
+        self.assertIsNone(infer_duration([{'tbr': 100}]))
+
+
+class TestSizeBudgetSelector(unittest.TestCase):
+    """Test cases for SizeBudgetSelector."""
+
+    def test_best_fitting_merge(self):
+        """Test that the highest resolution fitting with the best audio alongside is chosen."""
+        selector = SizeBudgetSelector(100 * MB, can_merge=True)
+        (chosen,) = select(selector)
+        self.assertEqual(chosen['format_id'], "136+140")
+        self.assertEqual([f['format_id'] for f in chosen['requested_formats']], ["136", "140"])
+        self.assertEqual(chosen['ext'], "mp4")
+        self.assertEqual(selector.outcome, "fits")
+
+    def test_bitrate_only_format_is_sized(self):
+        """Test that a large budget picks the format sized from its bitrate."""
+        (chosen,) = select(SizeBudgetSelector(500 * MB, can_merge=True))
+        self.assertEqual(chosen['format_id'], "137+140")
+
+    def test_lower_resolution_and_smaller_audio(self):
+        """Test that a tight budget drops resolution, and audio quality to make video fit."""
+        (chosen,) = select(SizeBudgetSelector(36 * MB, can_merge=True))
+        self.assertEqual(chosen['format_id'], "134+139")
+
+    def test_without_merging_uses_combined_formats(self):
+        """Test that without ffmpeg only formats with both streams are considered."""
+        (chosen,) = select(SizeBudgetSelector(100 * MB, can_merge=False))
+        self.assertEqual(chosen['format_id'], "18")
+
+    def test_audio_only_fallback(self):
+        """Test that audio only is chosen when no video fits."""
+        selector = SizeBudgetSelector(10 * MB, can_merge=True)
+        (chosen,) = select(selector)
+        self.assertEqual(chosen['format_id'], "251")
+        self.assertEqual(selector.outcome, "audio only")
+
+    def test_audio_preference(self):
+        """Test that the preferred audio container wins over a slightly higher bitrate."""
+        (chosen,) = select(SizeBudgetSelector(25 * MB, audio_only=True, audio_ext="m4a"))
+        self.assertEqual(chosen['format_id'], "140")
+
+    def test_over_budget_picks_smallest(self):
+        """Test that the smallest video is chosen for a re-encode when nothing fits."""
+        selector = SizeBudgetSelector(1 * MB, can_merge=True)
+        (chosen,) = select(selector)
+        self.assertEqual(chosen['format_id'], "134+139")
+        self.assertEqual(selector.outcome, "over budget")
+
+    def test_selector_in_yt_dlp(self):
+        """Test that yt-dlp accepts the selector and the merged format it describes."""
+        info = {'id': 'abcdefghijk', 'title': 'Test', 'duration': DURATION, 'extractor': 'test',
+                'extractor_key': 'Test', 'webpage_url': 'https://example.com/watch',
+                'formats': [dict(f) for f in FORMATS]}
+        opts = {'format': SizeBudgetSelector(100 * MB, can_merge=True), 'quiet': True, 'simulate': True}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            result = ydl.process_ie_result(info, download=False)
+        self.assertEqual(result['format_id'], "136+140")
+        self.assertEqual(len(result['requested_formats']), 2)
+
+
+class TestFitToSizePP(unittest.TestCase):
+    """Test cases for FitToSizePP."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "video.mp4")
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_within_budget_is_untouched(self):
+        """Test that a file within budget is left alone."""
+        pp = FitToSizePP(None, max_bytes=2000)
+        pp.run_ffmpeg = MagicMock()
+        self.assertEqual(pp.run({'filepath': self.path, 'duration': 10}), ([], {'filepath': self.path, 'duration': 10}))
+        pp.run_ffmpeg.assert_not_called()
+
+    def test_over_budget_is_reencoded_to_bitrate(self):
+        """Test that a file over budget is re-encoded in place at a bitrate that fits."""
+        pp = FitToSizePP(None, max_bytes=500, margin=1.0)
+        pp.run_ffmpeg = MagicMock(side_effect=lambda src, dst, opts: open(dst, "wb").close())
+        with patch.object(FitToSizePP, 'available', True):
+            pp.run({'filepath': self.path, 'duration': 1, 'vcodec': 'none'})
+
+        _, _, options = pp.run_ffmpeg.call_args[0]
+        self.assertEqual(options, ['-vn', '-c:a', 'aac', '-b:a', '8k'])
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+
+class TestDownloadJobBudget(unittest.TestCase):
+    """Test cases for size budgets in DownloadJob."""
+
+    def test_budget_replaces_format(self):
+        """Test that a budget installs the selector, with the codec's audio preference."""
+        opts = DownloadJob("https://youtu.be/x", format_type="MP3", audio_codec="opus",
+                           max_filesize=25 * MB).ydl_options([])
+        self.assertIsInstance(opts['format'], SizeBudgetSelector)
+        self.assertTrue(opts['format'].audio_only)
+        self.assertEqual(opts['format'].audio_codec, "opus")
+        self.assertEqual(DownloadJob("https://youtu.be/x").ydl_options([])['format'], 'best')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the slim build helpers.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from slim_build import (_PRELOAD_CODE, excluded_extractor_modules, required_extractor_modules,
+                        trim_lazy_extractors, write_lazy_extractors)
+
+LAZY_SOURCE = '''import re
+
+from ..utils import classproperty
+
+
+class LazyLoadMetaClass(type):
+    pass
+
+
+class LazyLoadExtractor(metaclass=LazyLoadMetaClass):
+    _module = None
+
+
+class YoutubeBaseInfoExtractor(LazyLoadExtractor):
+    _module = 'yt_dlp.extractor.youtube'
+
+
+class SearchInfoExtractor(LazyLoadExtractor):
+    _module = 'yt_dlp.extractor.common'
+
+
+class YoutubeIE(YoutubeBaseInfoExtractor):
+    _module = 'yt_dlp.extractor.youtube'
+
+
+class YoutubeSearchIE(YoutubeBaseInfoExtractor, SearchInfoExtractor):
+    _module = 'yt_dlp.extractor.youtube'
+
+
+class VimeoIE(LazyLoadExtractor):
+    _module = 'yt_dlp.extractor.vimeo'
+
+
+_CLASS_LOOKUP = {'YoutubeIE': YoutubeIE, 'YoutubeSearchIE': YoutubeSearchIE, 'VimeoIE': VimeoIE}
+'''
+
+
+class TestTrimLazyExtractors(unittest.TestCase):
+    """Test cases for trim_lazy_extractors."""
+
+    def test_keeps_extractors_and_their_bases(self):
+        """Test that only the wanted extractors, their bases and module code remain."""
+        trimmed = trim_lazy_extractors(LAZY_SOURCE, ('yt_dlp.extractor.youtube',))
+        self.assertIn("from ..utils import classproperty", trimmed)
+        for name in ("LazyLoadMetaClass", "LazyLoadExtractor", "YoutubeBaseInfoExtractor",
+                     "SearchInfoExtractor", "YoutubeIE", "YoutubeSearchIE"):
+            self.assertIn(f"class {name}", trimmed)
+        self.assertNotIn("VimeoIE", trimmed)
+
+        namespace = {}
+        exec(trimmed.replace("from ..utils import classproperty", ""), namespace)
+        self.assertEqual(list(namespace['_CLASS_LOOKUP']), ['YoutubeIE', 'YoutubeSearchIE'])
+
+    def test_rejects_unknown_modules(self):
+        """Test that a trim leaving no extractor is refused."""
+        with self.assertRaises(ValueError):
+            trim_lazy_extractors(LAZY_SOURCE, ('yt_dlp.extractor.nothing',))
+        with self.assertRaises(ValueError):
+            trim_lazy_extractors("x = 1\n")
+
+
+class TestInstalledYtDlp(unittest.TestCase):
+    """Test cases run against the installed yt-dlp."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_excluded_modules(self):
+        """Test that the YouTube and core extractor modules are kept and the rest left out."""
+        required = required_extractor_modules()
+        self.assertIn('yt_dlp.extractor.youtube', required)
+        self.assertIn('yt_dlp.extractor.common', required)
+
+        excluded = excluded_extractor_modules()
+        self.assertIn('yt_dlp.extractor._extractors', excluded)
+        self.assertIn('yt_dlp.extractor.vimeo', excluded)
+        self.assertFalse(required & set(excluded))
+
+    def test_trimmed_lookup_loads_youtube_only(self):
+        """Test that yt-dlp started with the trimmed lookup has only lazy YouTube extractors."""
+        try:
+            path = write_lazy_extractors(os.path.join(self.test_dir, 'lazy_extractors.py'))
+        except FileNotFoundError:
+            self.skipTest("installed yt-dlp has no lazy_extractors")
+        code = _PRELOAD_CODE.format(path=path) + (
+            "import yt_dlp\n"
+            "ydl = yt_dlp.YoutubeDL({'quiet': True})\n"
+            "assert ydl._ies and all(key.startswith('Youtube') for key in ydl._ies), list(ydl._ies)\n"
+            "assert 'yt_dlp.extractor.youtube' not in sys.modules\n"
+            "assert ydl.get_info_extractor('Youtube').ie_key() == 'Youtube'\n"
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
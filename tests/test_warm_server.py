@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the warm command-line server.
+
+A real server is started in a subprocess; clients are run as subprocesses
+too, so that the descriptors they pass to the server are pipes the tests
+can read.
+"""
+
+import os
+import sys
+import time
+import signal
+import shutil
+import tempfile
+import subprocess
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from warm_server import _forwarded_environment, _make_private_directory, is_serving, run_client
+
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main.py'))
+
+
+@unittest.skipUnless(os.name == "posix", "the warm server uses Unix sockets and fork")
+class TestWarmServer(unittest.TestCase):
+    """Test cases for serve() and run_client() through main.py."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.test_dir, "ytd.sock")
+        cls.server = subprocess.Popen(
+            [sys.executable, MAIN, "--server", "--server-socket", cls.socket_path, "--server-idle-timeout", "60"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=cls.test_dir,
+        )
+        deadline = time.monotonic() + 30
+        while not is_serving(cls.socket_path):
+            if time.monotonic() > deadline or cls.server.poll() is not None:
+                cls.server.kill()
+                raise RuntimeError("warm server did not start")
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.send_signal(signal.SIGINT)
+        cls.server.wait(10)
+        shutil.rmtree(cls.test_dir, ignore_errors=True)
+
+    def run_cli(self, *args):
+        # Run from the test directory so the log directory is created there
+        return subprocess.run([sys.executable, MAIN, "--server-socket", self.socket_path, *args],
+                              capture_output=True, text=True, timeout=30, cwd=self.test_dir)
+
+    def test_output_goes_to_client(self):
+        """Test that the command's output reaches the client's own stdout."""
+        result = self.run_cli("--version")
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "YouTube Downloader v1.0.0\n")
+        # Forwarded runs skip the local dependency check
+        self.assertNotIn("yt-dlp found", result.stdout)
+
+    def test_exit_status_and_stderr(self):
+        """Test that exit statuses and error output are passed through."""
+        result = self.run_cli("--jobs", "not-a-number")
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("invalid int value", result.stderr)
+
+    def test_runs_in_client_directory(self):
+        """Test that relative paths are resolved against the client's working directory."""
+        result = self.run_cli("-a", "missing-urls.txt")
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("batch file not found: missing-urls.txt", result.stderr)
+
+    def test_no_server(self):
+        """Test that run_client() leaves the command to the caller when nothing listens."""
+        self.assertIsNone(run_client(["--version"], os.path.join(self.test_dir, "absent.sock")))
+        result = subprocess.run([sys.executable, MAIN, "--no-server", "--version"],
+                                capture_output=True, text=True, timeout=60, cwd=self.test_dir)
+        self.assertIn("yt-dlp found", result.stdout)
+
+    def test_other_users_socket_is_ignored(self):
+        """Test that the client sends nothing to a socket owned by another user."""
+        with patch("warm_server.os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(run_client(["--version"], self.socket_path))
+
+
+@unittest.skipUnless(os.name == "posix", "the warm server uses Unix sockets and fork")
+class TestServerPrivacy(unittest.TestCase):
+    """Test cases for what the client shares and where the default socket lives."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_forwarded_environment(self):
+        """Test that only the variables the command reads are sent to the server."""
+        env = {"AWS_SECRET_ACCESS_KEY": "s", "HTTPS_PROXY": "p", "LOG_LEVEL": "DEBUG",
+               "GITHUB_TOKEN": "t", "SSH_AUTH_SOCK": "/a"}
+        with patch.dict(os.environ, env, clear=True):
+            self.assertEqual(_forwarded_environment(),
+                             {"AWS_SECRET_ACCESS_KEY": "s", "HTTPS_PROXY": "p", "LOG_LEVEL": "DEBUG"})
+
+    def test_private_directory(self):
+        """Test that the socket directory is created private and a shared one is refused."""
+        path = os.path.join(self.test_dir, "private")
+        _make_private_directory(path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+        _make_private_directory(path)
+
+        shared = os.path.join(self.test_dir, "shared")
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        with self.assertRaises(RuntimeError):
+            _make_private_directory(shared)
+
+
+if __name__ == "__main__":
+    unittest.main()
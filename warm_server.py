@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Warm command-line server for YouTube Downloader.
+
+A short-lived CLI run spends most of its time importing yt-dlp and setting
+up extractors. The server pays that once: it imports everything, warms
+the YouTube extractor and then waits on a Unix domain socket. A client
+sends its arguments, working directory and environment, and passes its
+stdin, stdout and stderr file descriptors over the socket (SCM_RIGHTS).
+The server forks a child per request, which starts with everything
+already imported, attaches the client's descriptors and runs the normal
+command line. Output and progress therefore go straight to the client's
+terminal, and the client only waits for the exit status. Ctrl-C in the
+client is forwarded to the child.
+
+Both ends only talk to the same user: the client checks who owns and
+listens on the socket before sending anything, the server checks who
+connected, and only the environment variables the command reads are
+sent along.
+
+This module itself imports nothing heavy, so the client starts in a few
+milliseconds. POSIX only.
+"""
+
+import os
+import sys
+import json
+import stat
+import array
+import errno
+import time
+import signal
+import socket
+import struct
+import tempfile
+import selectors
+from typing import Dict, List, Optional, Tuple
+
+# Seconds without requests after which the server exits
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+# Upper bound on the JSON request (arguments, cwd and environment)
+_MAX_REQUEST = 1024 * 1024
+
+# Environment variables sent to the server: the settings load_config()
+# reads, and what yt-dlp, boto3, ffmpeg and the terminal look at
+_FORWARDED_ENV = {
+    "DEFAULT_DOWNLOAD_DIRECTORY", "DEFAULT_FORMAT", "CONSOLE_OUTPUT", "MAX_CONCURRENT_DOWNLOADS",
+    "VIDEO_QUALITY", "AUDIO_QUALITY", "LOG_LEVEL", "LOG_FILE", "LOG_FORMAT", "LOG_MAX_BYTES",
+    "LOG_ROTATE_HOURS", "LOG_BACKUP_COUNT", "AUTO_CHECK_UPDATES",
+    "HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "NO_PROXY", "http_proxy", "https_proxy", "all_proxy", "no_proxy",
+    "SSL_CERT_FILE", "SSL_CERT_DIR", "REQUESTS_CA_BUNDLE",
+    "PATH", "HOME", "TMPDIR", "TZ", "LANG", "LANGUAGE", "TERM", "COLUMNS", "LINES", "NO_COLOR",
+}
+_FORWARDED_ENV_PREFIXES = ("AWS_", "LC_", "XDG_", "YTD_", "YTDLP_")
+
+
+def default_socket_path() -> str:
+    """
+    Socket path used when none is given.
+
+    Returns:
+        YTD_SERVER_SOCKET if set, otherwise a socket in XDG_RUNTIME_DIR or,
+        without one, in a per-user directory in the temporary directory.
+    """
+    if os.environ.get("YTD_SERVER_SOCKET"):
+        return os.environ["YTD_SERVER_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], f"ytd-{os.getuid()}.sock")
+    return os.path.join(_private_directory(), "server.sock")
+
+
+def _private_directory() -> str:
+    """Per-user directory for the socket when there is no XDG_RUNTIME_DIR, e.g. under cron."""
+    return os.path.join(tempfile.gettempdir(), f"ytd-{os.getuid()}")
+
+
+def _make_private_directory(path: str) -> None:
+    """
+    Create a directory only the current user can enter, or check an existing one.
+
+    Raises:
+        RuntimeError: If the path exists but is not such a directory, for
+                      example because another user created it first.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path} is not a private directory of the current user")
+
+
+def _peer_uid(sock: socket.socket) -> Optional[int]:
+    """User ID of the process at the other end of a Unix socket, or None where the OS does not tell."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid
+
+
+def _forwarded_environment() -> Dict[str, str]:
+    """The part of the environment the command reads; everything else stays with the client."""
+    return {key: value for key, value in os.environ.items()
+            if key in _FORWARDED_ENV or key.startswith(_FORWARDED_ENV_PREFIXES)}
+
+
+def run_client(argv: List[str], socket_path: Optional[str] = None) -> Optional[int]:
+    """
+    Run a command line in the warm server.
+
+    Args:
+        argv: Command-line arguments, without the program name.
+        socket_path: Server socket. Defaults to default_socket_path().
+
+    Returns:
+        Exit status of the command, or None if no server is listening, in
+        which case the caller should run the command itself.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = socket_path or default_socket_path()
+    try:
+        owner = os.stat(socket_path).st_uid
+    except OSError:
+        return None
+    if owner != os.getuid():
+        print(f"Ignoring {socket_path}: it belongs to another user", file=sys.stderr)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        peer = _peer_uid(sock)
+    except OSError:
+        sock.close()
+        return None
+    if peer is not None and peer != os.getuid():
+        # The path was replaced after the check above
+        print(f"Ignoring {socket_path}: another user is listening on it", file=sys.stderr)
+        sock.close()
+        return None
+
+    request = json.dumps({'argv': argv, 'cwd': os.getcwd(), 'env': _forwarded_environment()}).encode() + b"\n"
+    with sock:
+        try:
+            fds = array.array("i", [sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()])
+        except (AttributeError, ValueError, OSError):
+            # Closed or replaced standard streams cannot be passed on
+            return None
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sock.sendmsg([request], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+
+        response = b""
+        while not response.endswith(b"\n"):
+            try:
+                chunk = sock.recv(4096)
+            except KeyboardInterrupt:
+                # Forward Ctrl-C; the command decides how to stop
+                sock.sendall(b"SIGINT\n")
+                continue
+            if not chunk:
+                return 1
+            response += chunk
+    return json.loads(response)['exit']
+
+
+def _recv_request(conn: socket.socket) -> Tuple[Dict, List[int]]:
+    """Read a request line and the descriptors sent with it."""
+    data = b""
+    fds: List[int] = []
+    while not data.endswith(b"\n"):
+        if len(data) > _MAX_REQUEST:
+            raise ValueError("request too large")
+        message, ancdata, _, _ = conn.recvmsg(65536, socket.CMSG_SPACE(3 * array.array("i").itemsize))
+        if not message:
+            raise ConnectionError("client closed the connection")
+        data += message
+        for level, kind, payload in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                received = array.array("i")
+                received.frombytes(payload[:len(payload) - len(payload) % received.itemsize])
+                fds.extend(received)
+    return json.loads(data), fds
+
+
+def _run_request(request: Dict, fds: List[int]) -> None:
+    """Run one command line in a forked child. Never returns."""
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for target, fd in zip((0, 1, 2), fds):
+            os.dup2(fd, target)
+        for fd in fds:
+            os.close(fd)
+        # Line buffered, like a fresh process writing to a terminal
+        sys.stdin = open(0, closefd=False)
+        sys.stdout = open(1, "w", buffering=1, closefd=False)
+        sys.stderr = open(2, "w", buffering=1, closefd=False)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = ["main.py"] + request['argv']
+
+        from config import load_config, setup_logging
+        import main
+
+        config = load_config()
+        config["CONSOLE_OUTPUT"] = False
+        listener = setup_logging(config)
+        try:
+            main.cli_mode(request['argv'])
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except KeyboardInterrupt:
+            code = 130
+        finally:
+            listener.stop()
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _warm_up() -> None:
+    """Import the downloader and build the YouTube extractor ahead of the first request."""
+    import main  # noqa: F401  (imports the bot, engine and yt-dlp)
+    import batch  # noqa: F401
+    from engine import open_youtube_dl
+
+    with open_youtube_dl({'quiet': True, 'no_warnings': True}) as ydl:
+        ydl.get_info_extractor("Youtube")
+
+
+def serve(socket_path: Optional[str] = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> None:
+    """
+    Serve command lines on a Unix socket until idle for idle_timeout seconds.
+
+    Args:
+        socket_path: Socket to listen on. Defaults to default_socket_path().
+        idle_timeout: Seconds without running or new requests before exiting.
+
+    Raises:
+        RuntimeError: If another server is already listening on the socket,
+                      or the default socket directory is not private.
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+        if os.path.dirname(socket_path) == _private_directory():
+            _make_private_directory(_private_directory())
+    if is_serving(socket_path):
+        raise RuntimeError(f"A server is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        # Left behind by a server that did not shut down cleanly
+        os.unlink(socket_path)
+
+    _warm_up()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # Only the owner may connect
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(16)
+    listener.setblocking(False)
+    print(f"Serving on {socket_path} (idle timeout {idle_timeout:.0f}s)", flush=True)
+
+    # SIGCHLD wakes the selector through this pair, so exit statuses are sent without polling delay
+    wakeup, wakeup_writer = socket.socketpair()
+    wakeup.setblocking(False)
+    wakeup_writer.setblocking(False)
+    signal.set_wakeup_fd(wakeup_writer.fileno())
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup, selectors.EVENT_READ)
+    children: Dict[int, socket.socket] = {}
+    idle_since = time.monotonic()
+    try:
+        while children or time.monotonic() - idle_since < idle_timeout:
+            for key, _ in selector.select(timeout=1.0):
+                if key.fileobj is listener:
+                    _accept(listener, selector, children)
+                    idle_since = time.monotonic()
+                elif key.fileobj is wakeup:
+                    while True:
+                        try:
+                            wakeup.recv(4096)
+                        except BlockingIOError:
+                            break
+                else:
+                    _forward_signal(key.fileobj, key.data, selector)
+            for conn in _reap(children, selector):
+                conn.close()
+            if children:
+                idle_since = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        selector.close()
+        wakeup.close()
+        wakeup_writer.close()
+        listener.close()
+        for pid in children:
+            _kill(pid, signal.SIGTERM)
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def is_serving(socket_path: str) -> bool:
+    """
+    Check whether a server is listening.
+
+    Args:
+        socket_path: Server socket.
+
+    Returns:
+        Boolean indicating if a connection succeeded.
+    """
+    if not os.path.exists(socket_path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def _accept(listener: socket.socket, selector: selectors.BaseSelector, children: Dict[int, socket.socket]) -> None:
+    try:
+        conn, _ = listener.accept()
+    except BlockingIOError:
+        return
+    conn.setblocking(True)
+    fds: List[int] = []
+    try:
+        peer = _peer_uid(conn)
+        if peer is not None and peer != os.getuid():
+            raise PermissionError(f"connection from user {peer}")
+        conn.settimeout(5)
+        request, fds = _recv_request(conn)
+        if len(fds) != 3:
+            raise ValueError("expected stdin, stdout and stderr descriptors")
+    except (OSError, ValueError) as e:
+        # Probes connect and close without sending anything
+        if not isinstance(e, ConnectionError):
+            print(f"Rejected request: {e}", file=sys.stderr, flush=True)
+        for fd in fds:
+            os.close(fd)
+        conn.close()
+        return
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        listener.close()
+        conn.close()
+        _run_request(request, fds)
+    for fd in fds:
+        os.close(fd)
+    conn.settimeout(None)
+    children[pid] = conn
+    selector.register(conn, selectors.EVENT_READ, pid)
+
+
+def _forward_signal(conn: socket.socket, pid: int, selector: selectors.BaseSelector) -> None:
+    try:
+        data = conn.recv(64)
+    except OSError:
+        data = b""
+    if not data:
+        # The client went away: stop its command the way Ctrl-C would
+        selector.unregister(conn)
+        _kill(pid, signal.SIGINT)
+    elif b"SIGINT" in data:
+        _kill(pid, signal.SIGINT)
+
+
+def _reap(children: Dict[int, socket.socket], selector: selectors.BaseSelector) -> List[socket.socket]:
+    finished = []
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        conn = children.pop(pid, None)
+        if conn is None:
+            continue
+        code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 128 + os.WTERMSIG(status)
+        try:
+            selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        try:
+            conn.sendall(json.dumps({'exit': code}).encode() + b"\n")
+        except OSError:
+            pass
+        finished.append(conn)
+    return finished
+
+
+def _kill(pid: int, sig: int) -> None:
+    try:
+        os.kill(pid, sig)
+    except OSError as e:
+        if e.errno != errno.ESRCH:
+            raise
+
+
+if __name__ == "__main__":
+    serve()
@@ -2,12 +2,82 @@
 import yt_dlp
 import os
 import sys
-from typing import Optional, Dict, Any, Tuple
+import json
+import logging
+import ctypes
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+# Shared engine pieces, also re-exported for existing imports from this module
+from engine import (
+    AUDIO_FORMATS, DEFAULT_SAVE_DIRECTORY, INVALID_URL_MESSAGE, OUTPUT_LAYOUTS, DownloadJob,
+    JobCancelled, JobControl, SharedCache, audio_output_path, build_audio_options, format_size, is_valid_youtube_url,
+    open_youtube_dl, parse_time_range, run_download,
+)
+
+logger = logging.getLogger(__name__)
+
+# Staging directory for in-progress files, created inside save_directory so
+# finished files can be moved into place with an atomic rename
+STAGING_DIRNAME = ".ytd-staging"
+
+# fallocate(2) mode that reserves blocks without changing the apparent file size
+FALLOC_FL_KEEP_SIZE = 0x01
+
+_fallocate = None
+
+def _preallocate(path: str, size: int) -> bool:
+    """
+    Reserve disk space for a partially downloaded file.
+    
+    The apparent size of the file is left unchanged so that resuming an
+    interrupted download still appends at the right offset. Only supported
+    on Linux; elsewhere this is a no-op.
+    
+    Args:
+        path: Path of the partial file.
+        size: Expected final size in bytes.
+        
+    Returns:
+        Boolean indicating if the space was reserved.
+    """
+    global _fallocate
+    if _fallocate is None:
+        _fallocate = False
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+                _fallocate = getattr(libc, "fallocate64", None) or libc.fallocate
+                _fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+            except (OSError, AttributeError):
+                _fallocate = False
+    if not _fallocate:
+        return False
+    
+    try:
+        fd = os.open(path, os.O_WRONLY)
+    except OSError:
+        return False
+    try:
+        # Fails harmlessly (EOPNOTSUPP) on filesystems without fallocate support
+        return _fallocate(fd, FALLOC_FL_KEEP_SIZE, 0, size) == 0
+    finally:
+        os.close(fd)
 
 class YouTubeDownloaderBot:
     """A command-line YouTube downloader that can be called programmatically."""
     
-    def __init__(self, save_directory: Optional[str] = None, format_type: str = "MP4"):
+    # Number of side artifacts (thumbnail, subtitles, info JSON) fetched at once
+    SIDE_ARTIFACT_WORKERS = 3
+    
+    def __init__(self, save_directory: Optional[str] = None, format_type: str = "MP4",
+                 write_thumbnail: bool = False, write_subtitles: bool = False,
+                 write_info_json: bool = False, subtitle_langs: Optional[List[str]] = None,
+                 atomic_writes: bool = False, audio_codec: str = "mp3", audio_quality: str = "192",
+                 precise_cuts: bool = True, cache_directory: Optional[str] = None,
+                 output_layout: str = "flat", index_library: bool = False,
+                 object_store: Optional[Any] = None, max_filesize: Optional[int] = None):
         """
         Initialize the YouTube downloader bot.
         
@@ -15,19 +85,88 @@ class YouTubeDownloaderBot:
             save_directory: Directory to save downloaded files.
                             Defaults to ~/Downloads if not specified.
             format_type: Format to download. Either "MP4" or "MP3". Defaults to "MP4".
+            write_thumbnail: Also save the video thumbnail next to the media file.
+            write_subtitles: Also save subtitles for the languages in subtitle_langs.
+            write_info_json: Also save the video metadata as a .info.json file.
+            subtitle_langs: Subtitle languages to save. Defaults to ["en"].
+            atomic_writes: Download into a staging directory on the same filesystem,
+                           preallocating space when the size is known, and rename
+                           finished files into save_directory.
+            audio_codec: Target codec for "MP3" downloads: "mp3" (transcoded), or
+                         "m4a", "opus" and "native", which stream-copy the best
+                         audio-only stream without re-encoding when possible.
+            audio_quality: Bitrate in kbit/s used when transcoding audio.
+            precise_cuts: Re-encode around the cut points of section downloads so
+                          they start and end exactly on the requested times. When
+                          False, streams are copied and cuts snap to keyframes.
+            cache_directory: Directory for yt-dlp's player and signature cache,
+                             shared by every bot and process pointing at it.
+                             Defaults to yt-dlp's per-user cache directory.
+            output_layout: "flat" (title-named files in save_directory), "id"
+                           (sharded by ID prefix) or "date" (by upload
+                           year/month), see OUTPUT_LAYOUTS.
+            index_library: Record each finished download in the library index
+                           of save_directory (see library_index.py), so
+                           find_downloaded() sees it without a rescan.
+            object_store: object_store.ObjectStore to upload finished downloads
+                          to. Single-stream downloads are uploaded while they
+                          are written.
+            max_filesize: Size budget in bytes, e.g. the upload limit of the
+                          destination. The best formats whose estimated size
+                          fits are downloaded, falling back to a lower
+                          resolution, then audio only, then a re-encode.
         """
-        self.save_directory = save_directory or os.path.join(os.path.expanduser("~"), "Downloads")
+        self.save_directory = save_directory or DEFAULT_SAVE_DIRECTORY
         self.format_type = format_type
+        self.write_thumbnail = write_thumbnail
+        self.write_subtitles = write_subtitles
+        self.write_info_json = write_info_json
+        self.subtitle_langs = subtitle_langs or ["en"]
+        self.atomic_writes = atomic_writes
+        if audio_codec not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio codec: {audio_codec}")
+        self.audio_codec = audio_codec
+        self.audio_quality = audio_quality
+        self.precise_cuts = precise_cuts
+        self.cache_directory = cache_directory
+        if output_layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"Unknown output layout: {output_layout}")
+        self.output_layout = output_layout
+        self.staging_directory = os.path.join(self.save_directory, STAGING_DIRNAME)
+        self.index_library = index_library
+        self._library = None
+        self.object_store = object_store
+        self.max_filesize = max_filesize
+        # s3:// URL of the last uploaded download
+        self.uploaded_url = None
+        # Fragments downloaded in parallel, adjusted between jobs by adaptive batches
+        self.concurrent_fragments = 1
         
         # Ensure save directory exists
         os.makedirs(self.save_directory, exist_ok=True)
+        if self.atomic_writes:
+            os.makedirs(self.staging_directory, exist_ok=True)
+        
+        # Partial files already preallocated during the current download
+        self._preallocated = set()
         
         # Download progress stats
         self.download_progress = 0
+        self._printed_step = -1
         self.total_bytes = 0
         self.downloaded_bytes = 0
         self.download_speed = 0
         self.downloaded_file_path = ""
+        
+        # Bytes written by the current download() call across all of its files
+        self.job_downloaded_bytes = 0
+        self._finished_files_bytes = 0
+        
+        # (video_id, artifact_name, error) for side artifacts the last download could not fetch
+        self.failed_side_artifacts = []
+        
+        # Cancel/pause switches for the current download
+        self.control = JobControl()
     
     def download_progress_hook(self, d: Dict[str, Any]) -> None:
         """
@@ -37,16 +176,27 @@ class YouTubeDownloaderBot:
             d: Dictionary containing download status and progress information.
         """
         if d['status'] == 'downloading':
+            self.control.checkpoint()
+            
             # Update progress information
             self.downloaded_bytes = d.get('downloaded_bytes', 0)
             self.total_bytes = d.get('total_bytes', 0)
-            self.download_speed = d.get('speed', 0)
+            self.download_speed = d.get('speed') or 0
+            self.job_downloaded_bytes = self._finished_files_bytes + (self.downloaded_bytes or 0)
+            
+            if self.atomic_writes and self.total_bytes:
+                tmpfilename = d.get('tmpfilename')
+                if tmpfilename and tmpfilename not in self._preallocated:
+                    self._preallocated.add(tmpfilename)
+                    _preallocate(tmpfilename, self.total_bytes)
             
             if self.total_bytes > 0:
                 self.download_progress = (self.downloaded_bytes / self.total_bytes) * 100
                 
                 # Print progress (for Discord integration, we'll just update internal state)
-                if self.download_progress % 10 < 1:  # Print every ~10%
+                step = int(self.download_progress // 10)
+                if step != self._printed_step:  # Print once per 10%
+                    self._printed_step = step
                     progress_str = f"Downloading: {self.format_size(self.downloaded_bytes)} of "
                     progress_str += f"{self.format_size(self.total_bytes)} "
                     progress_str += f"({self.format_size(self.download_speed)}/s) "
@@ -54,30 +204,30 @@ class YouTubeDownloaderBot:
                     print(progress_str, flush=True)
         
         elif d['status'] == 'finished':
+            self._finished_files_bytes += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            self.job_downloaded_bytes = self._finished_files_bytes
+            self.download_speed = 0
+            self._printed_step = -1
             print("Download completed, processing file...", flush=True)
     
-    def format_size(self, bytes_size: int) -> str:
-        """
-        Convert bytes to a human-readable format.
-        
-        Args:
-            bytes_size: Size in bytes.
-            
-        Returns:
-            Human-readable size string (e.g., "10.5 MB").
-        """
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes_size < 1024.0:
-                return f"{bytes_size:.2f} {unit}"
-            bytes_size /= 1024.0
-        return f"{bytes_size:.2f} TB"
+    # Human-readable sizes, e.g. "10.50 MB"
+    format_size = staticmethod(format_size)
     
-    def download(self, url: str) -> Tuple[bool, str]:
+    def download(self, url: str, info: Optional[Dict[str, Any]] = None,
+                 start_time: Optional[Any] = None, end_time: Optional[Any] = None) -> Tuple[bool, str]:
         """
         Download a video or audio from a YouTube URL.
         
+        With start_time or end_time, only that section is fetched: ffmpeg seeks
+        into the stream and requests just the bytes or fragments it needs.
+        
         Args:
             url: YouTube URL to download.
+            info: Info dictionary previously returned by resolve() for this URL.
+                  When given, the URL is not extracted a second time.
+            start_time: Start of the section to download, as seconds or a
+                        string such as "1:30". See parse_time_range().
+            end_time: End of the section to download, in the same forms.
             
         Returns:
             Tuple containing (success_status, file_path_or_error_message).
@@ -87,66 +237,479 @@ class YouTubeDownloaderBot:
         
         # Basic URL validation
         if not self._is_valid_youtube_url(url):
-            return False, "Invalid YouTube URL. URL must contain 'youtube.com' or 'youtu.be'"
+            return False, INVALID_URL_MESSAGE
         
         try:
-            # For Discord integration, we'll optimize for smaller file sizes
-            if self.format_type == "MP4":
-                ydl_opts = {
-                    'format': 'best',
-                    'outtmpl': os.path.join(self.save_directory, '%(title)s.%(ext)s'),
-                    'progress_hooks': [self.download_progress_hook],
-                    'quiet': True,  # Only show our custom progress
-                    'no_warnings': True,
-                }
-            else:  # MP3 - but actually just download audio in its native format
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'outtmpl': os.path.join(self.save_directory, '%(title)s.%(ext)s'),
-                    'progress_hooks': [self.download_progress_hook],
-                }
+            section = parse_time_range(start_time, end_time)
+        except ValueError as e:
+            return False, str(e)
+        
+        logger.info("Downloading %s as %s", url, self.format_type)
+        self._preallocated.clear()
+        self.failed_side_artifacts = []
+        self.job_downloaded_bytes = self._finished_files_bytes = 0
+        sinks = [self.download_progress_hook]
+        upload_sink = None
+        if self.object_store is not None:
+            # Imported here so boto3 and friends are only loaded when uploading
+            from object_store import ObjectStoreSink
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Extract info and download
-                info = ydl.extract_info(url, download=True)
-                
-                # Get the downloaded file path
-                if 'entries' in info:  # Playlist
-                    video = info['entries'][0]
-                    print(f"Note: Downloading only the first video from the playlist.")
-                else:
-                    video = info
-                
-                # Get the actual filepath where the video was saved
-                filename = ydl.prepare_filename(video)
-                
-                # For MP3 format, yt-dlp will convert the file to MP3
-                if self.format_type == "MP3":
-                    # Get base filename without extension
-                    base, _ = os.path.splitext(filename)
-                    filename = f"{base}.mp3"
-                
-                # Store the downloaded file path
-                self.downloaded_file_path = filename
-                
-                print(f"Download completed: {os.path.basename(filename)}")
-                print(f"Saved to: {filename}")
-                
-                return True, filename
-                
-        except Exception as e:
-            error_message = f"Download failed: {str(e)}"
+            # Converted audio ends up in a different file than the one downloaded
+            upload_sink = ObjectStoreSink(self.object_store, self.save_directory,
+                                          staging_directory=self.staging_directory if self.atomic_writes else None,
+                                          # A download over budget is re-encoded after it is written
+                                          stream=self.format_type == "MP4" and not section and not self.max_filesize)
+            sinks.append(upload_sink)
+        self.uploaded_url = None
+        try:
+            result = run_download(
+                self._make_job(url, info, section),
+                sinks=sinks,
+                process=self._download_with_side_artifacts if self._side_artifact_fetchers() else None,
+            )
+            if upload_sink is not None:
+                try:
+                    self.uploaded_url = upload_sink.finish(result.path if result.success else None)
+                except Exception as e:
+                    logger.error("Upload of %s failed: %s", result.path, e)
+                    result = result._replace(success=False, error=f"upload failed: {str(e)}")
+        finally:
+            # Nothing is being written for this bot until the next download() call
+            self.job_downloaded_bytes = self._finished_files_bytes = 0
+            self.control.reset()
+        
+        if result.cancelled:
+            logger.info("Download of %s cancelled", url)
+            print("Download cancelled, partial data kept for resume")
+            return False, result.error
+        if not result.success:
+            error_message = f"Download failed: {result.error}"
+            logger.error("Download of %s failed: %s", url, result.error)
             print(f"{error_message}")
             return False, error_message
+        
+        if 'entries' in result.info:  # Playlist
+            print(f"Note: Downloading only the first video from the playlist.")
+        elif self.max_filesize and self.format_type == "MP4" and result.info.get('vcodec') == 'none':
+            print(f"Note: No video format fits in {self.format_size(self.max_filesize)}, saved audio only.")
+        
+        # Store the downloaded file path
+        self.downloaded_file_path = result.path
+        
+        if self.index_library:
+            video_id = None if 'entries' in result.info else result.info.get('id')
+            self.library.refresh(result.path, video_id=video_id)
+        
+        logger.info("Downloaded %s to %s", url, result.path)
+        print(f"Download completed: {os.path.basename(result.path)}")
+        print(f"Saved to: {result.path}")
+        
+        if self.uploaded_url:
+            print(f"Uploaded to: {self.uploaded_url}")
+            if not self.object_store.keep_local:
+                os.remove(result.path)
+                if self.index_library:
+                    self.library.refresh(result.path)
+                return True, self.uploaded_url
+        
+        return True, result.path
+    
+    @property
+    def library(self) -> "LibraryIndex":
+        """The library index of save_directory, opened on first use."""
+        if self._library is None:
+            # Imported here because library_index imports this module
+            from library_index import LibraryIndex
+            self._library = LibraryIndex(self.save_directory)
+        return self._library
     
-    def _is_valid_youtube_url(self, url: str) -> bool:
+    def find_downloaded(self, video_id: str) -> List[str]:
         """
-        Basic validation for YouTube URLs.
+        Look up the files already saved for a video in the library index.
+        
+        This is a single indexed query; call library.update() first to pick
+        up files added outside this bot.
         
         Args:
-            url: URL to validate.
+            video_id: YouTube video ID.
             
         Returns:
-            Boolean indicating if URL appears to be a valid YouTube URL.
+            Absolute paths of the indexed files (media and sidecars).
         """
-        return ("youtube.com" in url or "youtu.be" in url) and "://" in url
\ No newline at end of file
+        return [os.path.join(self.library.directory, entry.path) for entry in self.library.lookup(video_id)]
+    
+    def cancel(self) -> None:
+        """Cancel the running download within one chunk. Its partial file is kept."""
+        self.control.cancel()
+    
+    def pause(self) -> None:
+        """Pause the running download at its next chunk."""
+        self.control.pause()
+    
+    def resume(self) -> None:
+        """Resume a paused download."""
+        self.control.resume()
+    
+    def resolve(self, url: str) -> Dict[str, Any]:
+        """
+        Extract info and select formats for a URL without downloading.
+        
+        The result can be passed back to download() and to estimate_size().
+        
+        Args:
+            url: YouTube URL to resolve.
+            
+        Returns:
+            The processed info dictionary.
+            
+        Raises:
+            ValueError: If the URL is empty or not a YouTube URL.
+        """
+        if not url:
+            raise ValueError("URL cannot be empty")
+        if not self._is_valid_youtube_url(url):
+            raise ValueError(INVALID_URL_MESSAGE)
+        
+        ydl_opts = self._make_job(url).ydl_options([self.download_progress_hook])
+        ydl_opts['quiet'] = True
+        ydl_opts['no_warnings'] = True
+        with open_youtube_dl(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+    
+    def estimate_size(self, info: Dict[str, Any]) -> Optional[int]:
+        """
+        Estimate how many bytes downloading a resolved URL will write.
+        
+        Args:
+            info: Info dictionary returned by resolve().
+            
+        Returns:
+            Size in bytes, or None if any part of the download has no size metadata.
+        """
+        if 'entries' in info:
+            sizes = [self._estimate_filesize(entry) for entry in info['entries'] or [] if entry]
+            return None if None in sizes else sum(sizes)
+        return self._estimate_filesize(info)
+    
+    def _make_job(self, url: str, info: Optional[Dict[str, Any]] = None,
+                  section: Optional[Tuple[float, Optional[float]]] = None) -> DownloadJob:
+        """
+        Describe a download of this bot as an engine job.
+        
+        Args:
+            url: YouTube URL to download.
+            info: Info dictionary already resolved for the URL, if any.
+            section: (start, end) seconds from parse_time_range() to download
+                     only part of the video, or None for the whole video.
+        
+        Returns:
+            The job, sharing this bot's cancel/pause switches.
+        """
+        return DownloadJob(
+            url,
+            save_directory=self.save_directory,
+            format_type=self.format_type,
+            audio_codec=self.audio_codec,
+            audio_quality=self.audio_quality,
+            section=section,
+            precise_cuts=self.precise_cuts,
+            staging_directory=self.staging_directory if self.atomic_writes else None,
+            cache_directory=self.cache_directory,
+            info=info,
+            control=self.control,
+            # Only show our custom progress for video downloads
+            quiet=self.format_type == "MP4",
+            output_layout=self.output_layout,
+            fragments=self.concurrent_fragments,
+            max_filesize=self.max_filesize,
+        )
+    
+    def _side_artifact_fetchers(self) -> List[Tuple[str, Any]]:
+        """
+        List the side artifact fetchers enabled on this bot.
+        
+        Returns:
+            (artifact_name, fetcher) pairs, where each fetcher is a bound method
+            taking (ydl, video_info, base_path).
+        """
+        fetchers = []
+        if self.write_thumbnail:
+            fetchers.append(("thumbnail", self._fetch_thumbnail))
+        if self.write_subtitles:
+            fetchers.append(("subtitles", self._fetch_subtitles))
+        if self.write_info_json:
+            fetchers.append(("info JSON", self._fetch_info_json))
+        return fetchers
+    
+    def _download_with_side_artifacts(self, ydl: yt_dlp.YoutubeDL, job: DownloadJob,
+                                      ydl_opts: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Download media while fetching side artifacts concurrently.
+        
+        The info is extracted once, then thumbnails, subtitles and info JSON
+        are fetched on a small thread pool while the media downloads. The
+        fetchers share the media YoutubeDL's request handlers, and so its
+        connection pool, cookies and proxy: they only call its urlopen(),
+        which dispatches to a handler whose session is safe to use from
+        several threads, and the static sanitize_info(). Everything else
+        on the YoutubeDL stays on this thread. Failures are recorded in
+        failed_side_artifacts and do not fail the download.
+        
+        Args:
+            ydl: YoutubeDL instance used for the media download.
+            job: The download job; its info is used when already resolved.
+            ydl_opts: Options the media YoutubeDL was built with.
+            
+        Returns:
+            The processed info dictionary.
+        """
+        info = job.info
+        if info is None:
+            info = ydl.extract_info(job.url, download=False)
+        videos = [entry for entry in info.get('entries') or [info] if entry]
+        # Output paths are computed here so the media YoutubeDL is only used by this thread
+        bases = [os.path.splitext(ydl.prepare_filename(video))[0] for video in videos]
+        
+        # Build the request handlers before the threads first need them
+        ydl._request_director
+        
+        with ThreadPoolExecutor(max_workers=self.SIDE_ARTIFACT_WORKERS) as executor:
+            futures = [
+                (name, video, executor.submit(fetch, ydl, video, base))
+                for video, base in zip(videos, bases)
+                for name, fetch in self._side_artifact_fetchers()
+            ]
+            info = ydl.process_ie_result(info, download=True)
+            
+            for name, video, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    # A missing thumbnail or subtitle should not fail the download
+                    self.failed_side_artifacts.append((video.get('id'), name, str(e)))
+                    logger.warning("Could not fetch %s of %s: %s", name, video.get('id'), e)
+                    print(f"Warning: could not fetch {name}: {str(e)}")
+        
+        return info
+    
+    def _fetch_thumbnail(self, ydl: yt_dlp.YoutubeDL, video: Dict[str, Any], base: str) -> Optional[str]:
+        """
+        Save the best thumbnail of a video next to its media file.
+        
+        Args:
+            ydl: YoutubeDL instance used for the request.
+            video: Info dictionary of the video.
+            base: Media file path without its extension.
+            
+        Returns:
+            Path of the thumbnail, or None if the video has none.
+        """
+        thumbnail_url = video.get('thumbnail')
+        if not thumbnail_url:
+            return None
+        ext = yt_dlp.utils.determine_ext(thumbnail_url, 'jpg')
+        return self._fetch_to_file(ydl, thumbnail_url, f"{base}.{ext}")
+    
+    def _fetch_subtitles(self, ydl: yt_dlp.YoutubeDL, video: Dict[str, Any], base: str) -> List[str]:
+        """
+        Save subtitles of a video for the configured languages.
+        
+        Args:
+            ydl: YoutubeDL instance used for the requests.
+            video: Info dictionary of the video.
+            base: Media file path without its extension.
+            
+        Returns:
+            Paths of the saved subtitle files.
+        """
+        subtitles = video.get('subtitles') or {}
+        paths = []
+        for lang in self.subtitle_langs:
+            tracks = [t for t in subtitles.get(lang) or [] if t.get('url')]
+            if not tracks:
+                continue
+            # Prefer WebVTT, which every player understands
+            track = next((t for t in tracks if t.get('ext') == 'vtt'), tracks[0])
+            ext = track.get('ext') or 'vtt'
+            paths.append(self._fetch_to_file(ydl, track['url'], f"{base}.{lang}.{ext}"))
+        return paths
+    
+    def _fetch_info_json(self, ydl: yt_dlp.YoutubeDL, video: Dict[str, Any], base: str) -> str:
+        """
+        Save the metadata of a video as a .info.json file.
+        
+        Args:
+            ydl: YoutubeDL instance used to sanitize the info.
+            video: Info dictionary of the video.
+            base: Media file path without its extension.
+            
+        Returns:
+            Path of the info JSON file.
+        """
+        path = f"{base}.info.json"
+        if os.path.exists(path):
+            return path
+        data = json.dumps(ydl.sanitize_info(video), ensure_ascii=False).encode("utf-8")
+        return self._write_file(path, data)
+    
+    def _fetch_to_file(self, ydl: yt_dlp.YoutubeDL, url: str, path: str) -> str:
+        """
+        Fetch a small resource into a file, skipping it if the file exists.
+        
+        Args:
+            ydl: YoutubeDL instance used for the request.
+            url: URL of the resource.
+            path: Destination path.
+            
+        Returns:
+            The destination path.
+        """
+        if os.path.exists(path):
+            return path
+        response = ydl.urlopen(url)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+        return self._write_file(path, data)
+    
+    def _write_file(self, path: str, data: bytes) -> str:
+        """
+        Write a file so that readers never see it half-written.
+        
+        With atomic_writes the temporary file lives in the staging directory,
+        so nothing partial ever appears in save_directory.
+        
+        Args:
+            path: Destination path.
+            data: File contents.
+            
+        Returns:
+            The destination path.
+        """
+        if self.atomic_writes:
+            temp_path = os.path.join(self.staging_directory, os.path.basename(path) + ".part")
+        else:
+            temp_path = path + ".part"
+        # Sharded output layouts put files in subdirectories
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return path
+    
+    def extract_metadata(self, url: str) -> Iterator[Dict[str, Any]]:
+        """
+        Resolve video metadata without downloading any media.
+        
+        Playlists and channels are listed flat, so each entry costs nothing
+        beyond the listing itself and only carries the fields the listing
+        exposes (no formats or sizes).
+        
+        Args:
+            url: YouTube video, playlist or channel URL.
+            
+        Yields:
+            One summary dictionary per video.
+            
+        Raises:
+            ValueError: If the URL is empty or not a YouTube URL.
+        """
+        if not url:
+            raise ValueError("URL cannot be empty")
+        if not self._is_valid_youtube_url(url):
+            raise ValueError(INVALID_URL_MESSAGE)
+        
+        ydl_opts = {
+            'format': 'best' if self.format_type == "MP4" else AUDIO_FORMATS.get(self.audio_codec, 'bestaudio/best'),
+            'extract_flat': 'in_playlist',
+            'skip_download': True,
+            'quiet': True,
+            'no_warnings': True,
+        }
+        if self.cache_directory:
+            ydl_opts['cachedir'] = self.cache_directory
+        
+        with open_youtube_dl(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            yield from self._iter_flat_videos(ydl, info)
+    
+    def _iter_flat_videos(self, ydl: yt_dlp.YoutubeDL, info: Dict[str, Any],
+                          playlist: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield a summary per video, descending into nested playlists.
+        
+        A bare channel URL lists its tabs (Videos, Shorts, Live) as flat
+        entries; those are extracted in turn so that only videos are reported.
+        
+        Args:
+            ydl: YoutubeDL instance configured for flat extraction.
+            info: Info dictionary of a video, playlist or flat entry.
+            playlist: Info dictionary of the containing playlist, if any.
+            
+        Yields:
+            One summary dictionary per video.
+        """
+        if info.get('_type') == 'playlist' or 'entries' in info:
+            for entry in info.get('entries') or []:
+                if entry:
+                    yield from self._iter_flat_videos(ydl, entry, playlist=info)
+        elif info.get('_type') == 'url' and info.get('ie_key') == 'YoutubeTab':
+            yield from self._iter_flat_videos(ydl, ydl.extract_info(info['url'], download=False))
+        else:
+            yield self._summarize_info(info, playlist=playlist)
+    
+    def _summarize_info(self, info: Dict[str, Any], playlist: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Reduce a yt-dlp info dictionary to the fields worth reporting.
+        
+        Args:
+            info: Info dictionary of a video or a flat playlist entry.
+            playlist: Info dictionary of the containing playlist, if any.
+            
+        Returns:
+            Dictionary with id, title, url, duration, size estimate and formats.
+        """
+        summary = {
+            'id': info.get('id'),
+            'title': info.get('title'),
+            'url': info.get('webpage_url') or info.get('url'),
+            'duration': info.get('duration'),
+            'filesize': self._estimate_filesize(info),
+        }
+        if playlist is not None:
+            summary['playlist_id'] = playlist.get('id')
+            summary['playlist_title'] = playlist.get('title')
+        if info.get('formats'):
+            summary['formats'] = [
+                {
+                    'format_id': f.get('format_id'),
+                    'ext': f.get('ext'),
+                    'resolution': f.get('resolution'),
+                    'vcodec': f.get('vcodec'),
+                    'acodec': f.get('acodec'),
+                    'tbr': f.get('tbr'),
+                    'filesize': f.get('filesize') or f.get('filesize_approx'),
+                }
+                for f in info['formats']
+            ]
+        return summary
+    
+    def _estimate_filesize(self, info: Dict[str, Any]) -> Optional[int]:
+        """
+        Estimate the size of the selected download from its metadata.
+        
+        Args:
+            info: Info dictionary, after format selection if available.
+            
+        Returns:
+            Size in bytes, or None if the metadata carries no size.
+        """
+        formats: List[Dict[str, Any]] = info.get('requested_formats') or [info]
+        sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+        if not all(sizes):
+            return None
+        return int(sum(sizes))
+    
+    # Basic validation for YouTube URLs
+    _is_valid_youtube_url = staticmethod(is_valid_youtube_url)
@@ -0,0 +1,60 @@
+# youtube_downloader_slim.spec
+# -*- mode: python ; coding: utf-8 -*-
+#
+# Slim build: only the YouTube extractors, loaded lazily, in a one-folder
+# build without UPX, so nothing is unpacked or decompressed at startup.
+# See slim_build.py, which also compares startup times with the default build.
+
+import os
+import sys
+
+sys.path.insert(0, SPECPATH)
+from slim_build import excluded_extractor_modules, write_lazy_extractors
+
+block_cipher = None
+
+lazy_extractors = write_lazy_extractors(os.path.join(workpath, 'slim_lazy_extractors.py'))
+
+a = Analysis(['youtube_downloader.py'],
+             pathex=[],
+             binaries=[],
+             datas=[],
+             hiddenimports=['yt_dlp.extractor.youtube'],
+             hookspath=[],
+             hooksconfig={},
+             runtime_hooks=[],
+             excludes=excluded_extractor_modules() + ['yt_dlp.extractor.lazy_extractors'],
+             win_no_prefer_redirects=False,
+             win_private_assemblies=False,
+             cipher=block_cipher,
+             noarchive=False)
+
+# Bundle the trimmed extractor lookup in place of yt-dlp's full one
+a.pure.append(('yt_dlp.extractor.lazy_extractors', lazy_extractors, 'PYMODULE'))
+
+pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
+
+exe = EXE(pyz,
+          a.scripts,
+          [],
+          exclude_binaries=True,
+          name='YouTube Downloader',
+          debug=False,
+          bootloader_ignore_signals=False,
+          strip=False,
+          upx=False,
+          console=False,
+          disable_windowed_traceback=False,
+          target_arch=None,
+          codesign_identity=None,
+          entitlements_file=None,
+          icon='youtube.ico')
+
+coll = COLLECT(exe,
+               a.binaries,
+               a.zipfiles,
+               a.datas,
+               strip=False,
+               upx=False,
+               upx_exclude=[],
+               name='YouTube Downloader Slim')